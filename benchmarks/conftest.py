@@ -0,0 +1,9 @@
+from typing import Any
+
+
+def pytest_benchmark_update_json(
+    config: Any, benchmarks: Any, output_json: dict[str, Any]
+) -> None:
+    """Leave the time of every round out of the JSON file, such as the baseline"""
+    for benchmark in output_json["benchmarks"]:
+        benchmark["stats"].pop("data", None)
@@ -0,0 +1,36 @@
+"""Benchmarks for building the exons from a Mutalyzer payload"""
+
+import json
+import pytest
+
+from pathlib import Path
+from typing import Any
+
+pytest.importorskip("pytest_benchmark")
+
+from exonviz.draw import config
+from exonviz.mutalyzer import build_exons
+from exonviz.synthetic import make_hgvs, make_payload
+
+PAYLOADS = Path(__file__).parent / "payloads"
+
+
+@pytest.mark.parametrize("hgvs", ["NM_003002.4:c.=", "NM_003002.4:c.[274G>T;300del]"])
+def test_build_exons_recorded(benchmark: Any, hgvs: str) -> None:
+    payload = json.loads((PAYLOADS / "NM_003002.4.json").read_text())
+    benchmark(build_exons, hgvs, payload, config)
+
+
+@pytest.mark.parametrize("exons, variants", [(10, 0), (100, 0), (2000, 0), (10, 10)])
+def test_build_exons_synthetic(benchmark: Any, exons: int, variants: int) -> None:
+    payload = make_payload(exons)
+    hgvs = make_hgvs("NM_003002.4", payload, variants)
+    benchmark.pedantic(build_exons, args=(hgvs, payload, config), rounds=3)
+
+
+def test_build_exons_selection(benchmark: Any) -> None:
+    """Only a few exons of a large transcript are drawn"""
+    payload = make_payload(200)
+    hgvs = make_hgvs("NM_003002.4", payload, 10)
+    selection = config | {"firstexon": 40, "lastexon": 45}
+    benchmark.pedantic(build_exons, args=(hgvs, payload, selection), rounds=3)
@@ -0,0 +1,24 @@
+"""Benchmarks for drawing the exons, and converting the figure to SVG"""
+
+import pytest
+
+from typing import Any
+
+pytest.importorskip("pytest_benchmark")
+
+from exonviz.draw import config, draw_exons
+from exonviz.synthetic import make_exons
+
+SIZES = [(10, 0), (100, 100), (2000, 0), (2000, 10000), (2000, 100000)]
+
+
+@pytest.mark.parametrize("exons, variants", SIZES)
+def test_draw_exons(benchmark: Any, exons: int, variants: int) -> None:
+    transcript = make_exons(exons, variants)
+    benchmark.pedantic(draw_exons, args=(transcript, config), rounds=3)
+
+
+@pytest.mark.parametrize("exons, variants", SIZES)
+def test_serialise(benchmark: Any, exons: int, variants: int) -> None:
+    figure = draw_exons(make_exons(exons, variants), config)
+    benchmark.pedantic(str, args=(figure,), rounds=3)
@@ -0,0 +1,57 @@
+"""Benchmarks for the cached paths of fetching a Mutalyzer payload"""
+
+import json
+import pytest
+
+from pathlib import Path
+from typing import Any, Iterator
+
+pytest.importorskip("pytest_benchmark")
+
+from exonviz import mutalyzer, service
+from exonviz.cache import DiskCache
+from exonviz.recordings import save_fixture
+from exonviz.testing import replay
+from exonviz.synthetic import make_payload
+
+
+@pytest.fixture(params=[4, 2000])
+def payload(request: Any, monkeypatch: pytest.MonkeyPatch) -> Iterator[Any]:
+    """Serve a synthetic payload instead of calling Mutalyzer"""
+    payload = make_payload(request.param)
+    monkeypatch.setattr(mutalyzer, "fetch_exons", lambda transcript: payload)
+    service._payloads.clear()
+    yield payload
+    service._payloads.clear()
+
+
+def test_fetch_memory(benchmark: Any, payload: Any) -> None:
+    service.fetch_payload("NM_003002.4:c.=")
+    benchmark(service.fetch_payload, "NM_003002.4:c.274G>T")
+
+
+def test_fetch_disk(benchmark: Any, payload: Any, tmp_path: Path) -> None:
+    service.set_cache_dir(tmp_path)
+    try:
+        service.fetch_payload("NM_003002.4:c.=")
+
+        def fetch() -> None:
+            service._payloads.clear()
+            service.fetch_payload("NM_003002.4:c.274G>T")
+
+        benchmark(fetch)
+    finally:
+        service.set_cache_dir(None)
+
+
+def test_disk_cache_put(benchmark: Any, payload: Any, tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path)
+    data = json.dumps(payload).encode()
+    benchmark(cache.put, "NM_003002.4:c.=", data)
+
+
+def test_fetch_stub(benchmark: Any, tmp_path: Path) -> None:
+    """Fetch from the Mutalyzer stub server, without any caching"""
+    save_fixture(tmp_path, "NM_003002.4:c.=", {"selector_short": make_payload(2000)})
+    with replay(tmp_path):
+        benchmark(mutalyzer.fetch_exons, "NM_003002.4:c.=")
@@ -0,0 +1,44 @@
+"""Benchmarks for the layout of the exons over the rows of the figure"""
+
+import copy
+import pytest
+
+from typing import Any
+
+pytest.importorskip("pytest_benchmark")
+
+from exonviz.exon import Exon, group_exons
+from exonviz.synthetic import make_exons
+
+
+@pytest.mark.parametrize("exons", [10, 100, 2000])
+@pytest.mark.parametrize("variants", [0, 1000, 100000])
+def test_group_exons(benchmark: Any, exons: int, variants: int) -> None:
+    transcript = make_exons(exons, variants)
+
+    def setup() -> tuple[tuple[list[Exon], int, int, int], dict[str, Any]]:
+        # group_exons splits the exons, so every round needs a fresh copy
+        return (copy.deepcopy(transcript), 20, 0, 1024), dict()
+
+    benchmark.pedantic(group_exons, setup=setup, rounds=5)
+
+
+@pytest.mark.parametrize("variants", [0, 1000, 100000])
+def test_split(benchmark: Any, variants: int) -> None:
+    (exon,) = make_exons(1, variants)
+
+    def setup() -> tuple[tuple[Exon, int], dict[str, Any]]:
+        return (copy.deepcopy(exon), exon.size // 2), dict()
+
+    benchmark.pedantic(Exon.split, setup=setup, rounds=20)
+
+
+def test_group_exons_stress(benchmark: Any) -> None:
+    """Many tiny exons, which need a large scale, with clustered variants"""
+    transcript = make_exons(500, 20000, tiny=0.2, clusters=10)
+    scale = max(exon.min_scale(20) for exon in transcript)
+
+    def setup() -> tuple[tuple[list[Exon], int, int, int, float], dict[str, Any]]:
+        return (copy.deepcopy(transcript), 20, 0, 1024, scale), dict()
+
+    benchmark.pedantic(group_exons, setup=setup, rounds=3)
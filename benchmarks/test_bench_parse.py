@@ -0,0 +1,35 @@
+"""Benchmarks for parsing and sorting HGVS descriptions"""
+
+import pytest
+
+from typing import Any
+
+pytest.importorskip("pytest_benchmark")
+
+from exonviz.cli import check_input, sort_variants
+from exonviz.mutalyzer import variants_from_hgvs
+from exonviz.synthetic import make_hgvs, make_payload
+
+PAYLOAD = make_payload(100)
+
+
+@pytest.mark.parametrize("variants", [1, 10, 100])
+def test_sort_variants(benchmark: Any, variants: int) -> None:
+    hgvs = make_hgvs("NM_003002.4", PAYLOAD, variants)
+    benchmark(sort_variants, hgvs)
+
+
+@pytest.mark.parametrize("variants", [0, 10, 100])
+def test_check_input(benchmark: Any, variants: int) -> None:
+    hgvs = make_hgvs("NM_003002.4", PAYLOAD, variants)
+    benchmark(check_input, hgvs)
+
+
+def test_check_input_gene(benchmark: Any) -> None:
+    """Bare transcripts are parsed once, as a description without variants"""
+    benchmark(check_input, "NM_003002.4")
+
+
+def test_variants_from_hgvs(benchmark: Any) -> None:
+    hgvs = make_hgvs("NM_003002.4", PAYLOAD, 1000)
+    benchmark(variants_from_hgvs, hgvs)
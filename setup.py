@@ -40,7 +40,8 @@ setup(
     py_modules=[splitext(basename(path))[0] for path in glob("src/*.py")],
     include_package_data=True,
     package_data={
-        "exonviz": ["py.typed", "data/mane.txt.gz"] + glob("src/exonviz/templates/*") + glob("src/exonviz/static/*"),
+        # data/mane_exons.dat is only shipped once it is made with extract_mane.py
+        "exonviz": ["py.typed", "data/mane.txt.gz", "data/mane_exons.dat"] + glob("src/exonviz/templates/*") + glob("src/exonviz/static/*"),
     },
     zip_safe=False,
     classifiers=[
@@ -79,14 +80,18 @@ setup(
     ],
     extras_require={
         "website": ["flask"],
+        "asgi": ["uvicorn", "jinja2"],
+        "zstd": ["zstandard"],
+        "parquet": ["pyarrow"],
     },
     setup_requires=[
         "pytest-runner",
     ],
     entry_points={
         "console_scripts": [
-            "exonviz=exonviz.cli:main",
+            "exonviz=exonviz.daemon:client",
             "exonviz-website=exonviz.app:main",
+            "exonviz-asgi=exonviz.asgi:main",
         ]
     },
 )
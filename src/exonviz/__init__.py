@@ -1,6 +1,29 @@
-from .draw import draw_exons, config
-from .exon import Exon, Variant, Coding
-from .cli import make_exons, get_MANE
+"""
+Visualise exons and variants
+
+The attributes of the package are imported when they are first used, so
+``import exonviz`` is cheap, and drawing exons from a TSV file does not import
+the modules that are needed to talk to Mutalyzer.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .draw import draw_exons, config
+    from .exon import Exon, Variant, Coding
+    from .cli import make_exons, get_MANE
+
+# The module that defines each attribute of the package
+_attributes = {
+    "draw_exons": ".draw",
+    "config": ".draw",
+    "Exon": ".exon",
+    "Variant": ".exon",
+    "Coding": ".exon",
+    "make_exons": ".cli",
+    "get_MANE": ".cli",
+}
 
 __all__ = [
     "draw_exons",
@@ -11,3 +34,17 @@ __all__ = [
     "make_exons",
     "get_MANE",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _attributes:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_attributes[name], __name__)
+    value = getattr(module, name)
+    # Store the attribute, so the next lookup does not end up here
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
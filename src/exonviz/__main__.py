@@ -1,4 +1,4 @@
-from .cli import main
+from .daemon import client
 
 if __name__ == "__main__":
-    main()
+    client()
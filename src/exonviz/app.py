@@ -7,6 +7,7 @@ try:
         session,
         request,
         flash,
+        jsonify,
         url_for,
     )
 except ModuleNotFoundError:
@@ -14,14 +15,22 @@ except ModuleNotFoundError:
     exit(-1)
 
 
-from typing import Tuple, List, Dict, Any
+from typing import Dict, Any
 import secrets
-import functools
-import copy
 
-from exonviz import draw_exons, config, Exon
-from exonviz import mutalyzer
-from exonviz.cli import check_input, get_MANE, trim_variants
+from exonviz import batch, config, jobs, metrics
+from exonviz.genes import GeneIndex
+from exonviz.cli import get_MANE
+from exonviz.service import (
+    config_from_json,
+    config_from_query,
+    fetch_payload,
+    get_figure,
+    limit_budgets,
+    render,
+    rewrite_transcript,
+    web_config,
+)
 from werkzeug.utils import secure_filename
 
 # Set up flask
@@ -39,6 +48,16 @@ app.logger.info(f"Secret key: {app.config['SECRET_KEY']}")
 
 
 MANE = get_MANE()
+GENES = GeneIndex(MANE)
+
+# Render expensive figures in the background if FLASK_JOBS is set. Figures are
+# expensive if their estimated cost is above FLASK_JOB_THRESHOLD
+JOBS = (
+    jobs.JobQueue(processes=app.config.get("JOB_PROCESSES", 2))
+    if app.config.get("JOBS")
+    else None
+)
+JOB_THRESHOLD = app.config.get("JOB_THRESHOLD", 2000)
 
 
 def main() -> None:
@@ -54,54 +73,53 @@ def main() -> None:
     app.run(args.host, debug=args.debug)
 
 
-@functools.cache
-def cache_fetch_exons(transcript: str) -> Dict[str, Any]:
-    """Wrapper to cache calls to mutalyzer"""
-    no_variants = trim_variants(transcript)
-    app.logger.info(f"Fetching {no_variants} from mutalyzer")
-    return mutalyzer.fetch_exons(no_variants)
-
-
-def build_exons(hgvs: str, config: Dict[str, Any]) -> Tuple[List[str], List[Exon]]:
-    exons = copy.deepcopy(cache_fetch_exons(hgvs))
-
-    build_exons, dropped_variants = mutalyzer.build_exons(hgvs, exons, config)
-    return dropped_variants, build_exons
-
-
 @app.route("/", methods=["GET"])
 def index() -> str:
     # Put the default config into the session
-    for key in config:
+    for key in web_config:
         if key not in session:
-            session[key] = config[key]
+            session[key] = web_config[key]
     # Set a default transcript
     if "transcript" not in session:
         session["transcript"] = "NM_003002.4:r.[274g>u;300del]"
-    # Set the width as default
-    session["width"] = 1024
-    # Set the first and last exon
-    session["firstexon"] = 1
-    session["lastexon"] = 1000
-    # Set to show exonnumbers by default
-    session["exonnumber"] = True
+    # Set the width, first and last exon and exonnumbers to the website defaults
+    for key in ["width", "firstexon", "lastexon", "exonnumber"]:
+        session[key] = web_config[key]
 
     return render_template("index.html")
 
 
+def _submit_if_expensive(hgvs: str, config: Dict[str, Any]) -> jobs.Job | None:
+    """Submit the figure as a background job if it is expensive to render"""
+    if JOBS is None or get_figure(hgvs, config) is not None:
+        return None
+    if jobs.estimate_cost(hgvs, fetch_payload(hgvs), config) <= JOB_THRESHOLD:
+        return None
+    return JOBS.submit(hgvs, config)
+
+
+def _job_response(job: jobs.Job) -> Response:
+    """Report the status of a job, or return the figure when it is done"""
+    if job.status == "done":
+        fname = secure_filename(f"{job.hgvs}.svg")
+        return Response(
+            job.figure,
+            mimetype="text/svg",
+            headers={"Content-disposition": f"attachment; filename={fname}"},
+        )
+    url = url_for("api_job", job_id=job.id)
+    response = jsonify(job.to_dict() | {"url": url})
+    response.status_code = 500 if job.status == "failed" else 202
+    response.headers["Location"] = url
+    return response
+
+
 def _update_config(config: Dict[str, Any], session: Any) -> Dict[str, Any]:
     """Update the configuration with values from the session"""
     d = config.copy()
     for key in d:
         d[key] = session[key]
-    return d
-
-
-def rewrite_transcript(transcript: str, MANE: Dict[str, str]) -> str:
-    """Rewrite the transcript, if needed"""
-    if transcript in MANE:
-        transcript = MANE[transcript]
-    return check_input(transcript)
+    return limit_budgets(d)
 
 
 @app.route("/", methods=["POST"])
@@ -127,10 +145,15 @@ def index_post() -> str:
     try:
         # Rewrite the transcript
         session["transcript"] = rewrite_transcript(session["transcript"], MANE)
-        dropped_variants, exons = build_exons(
-            session["transcript"], config=_update_config(config, session)
-        )
-        figure = str(draw_exons(exons, config=_update_config(config, session)))
+        figure_config = _update_config(config, session)
+        job = _submit_if_expensive(session["transcript"], figure_config)
+        if job is None:
+            figure, dropped_variants = render(session["transcript"], figure_config)
+        else:
+            url = url_for("api_job", job_id=job.id)
+            flash(f"This figure is rendered in the background, see {url}")
+            figure = ""
+            dropped_variants = list()
     except Exception as e:
         flash(str(e))
         figure = ""
@@ -151,32 +174,24 @@ def index_post() -> str:
 
 @app.route("/draw", methods=["GET"])
 def draw() -> Response:
-    figure_config: dict[str, Any] = dict(request.args)
-
-    # Get the list of variant colors
-    figure_config["variantcolors"] = request.args.getlist("variantcolors")
-
-    # Rewrite the transcript, if required. This will also lookup the MANE select
-    # for gene names
-    figure_config["transcript"] = rewrite_transcript(figure_config["transcript"], MANE)
-
-    # Cast integer values to int
-    for field in ["firstexon", "lastexon", "gap", "height", "width"]:
-        figure_config[field] = int(figure_config[field])
-
-    # Cast float values to float
-    for field in ["scale"]:
-        figure_config[field] = float(figure_config[field])
+    try:
+        # Cast the values to the types used in the default configuration
+        figure_config = config_from_query(
+            request.args, request.args.getlist("variantcolors")
+        )
 
-    # Cast boolean values to boolean
-    for field in ["exonnumber", "noncoding"]:
-        figure_config[field] = figure_config[field] == "True"
+        # Rewrite the transcript, if required. This will also lookup the MANE
+        # select for gene names
+        transcript = rewrite_transcript(request.args["transcript"], MANE)
+    except ValueError as e:
+        return Response(str(e), status=400)
 
-    # Pull out the transcript name
-    transcript = figure_config.pop("transcript")
+    # Expensive figures are rendered in the background, if enabled
+    job = _submit_if_expensive(transcript, figure_config)
+    if job is not None:
+        return _job_response(job)
 
-    dropped_variants, exons = build_exons(transcript, figure_config)
-    figure = str(draw_exons(exons, figure_config))
+    figure, dropped_variants = render(transcript, figure_config)
     fname = secure_filename(f"{transcript}.svg")
 
     return Response(
@@ -186,5 +201,71 @@ def draw() -> Response:
     )
 
 
+@app.route("/api/render", methods=["POST"])
+def api_render() -> Response:
+    """Render a list of HGVS descriptions, and return a zip file of figures"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("descriptions"), list):
+        return Response("Please specify a list of 'descriptions'", status=400)
+
+    descriptions = [str(description) for description in data["descriptions"]]
+    if len(descriptions) > batch.MAX_DESCRIPTIONS:
+        msg = f"Please specify at most {batch.MAX_DESCRIPTIONS} descriptions"
+        return Response(msg, status=400)
+
+    try:
+        figure_config = config_from_json(data.get("config", dict()))
+    except (TypeError, ValueError) as e:
+        return Response(str(e), status=400)
+
+    results = batch.render_many(descriptions, figure_config, MANE)
+    return Response(
+        batch.zip_figures(results),
+        mimetype="application/zip",
+        headers={"Content-disposition": "attachment; filename=exonviz.zip"},
+    )
+
+
+@app.route("/api/jobs", methods=["POST"])
+def api_submit_job() -> Response:
+    """Render a single HGVS description in the background"""
+    if JOBS is None:
+        return Response("Background jobs are not enabled", status=404)
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("description"), str):
+        return Response("Please specify a 'description'", status=400)
+
+    try:
+        figure_config = config_from_json(data.get("config", dict()))
+        transcript = rewrite_transcript(data["description"], MANE)
+    except Exception as e:
+        return Response(str(e), status=400)
+
+    return _job_response(JOBS.submit(transcript, figure_config))
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def api_job(job_id: str) -> Response:
+    job = JOBS.get(job_id) if JOBS is not None else None
+    if job is None:
+        return Response(f"Unknown job {job_id}", status=404)
+    return _job_response(job)
+
+
+@app.route("/api/genes", methods=["GET"])
+def api_genes() -> Response:
+    """Suggest genes that start with the specified prefix"""
+    prefix = request.args.get("prefix", "")
+    limit = min(request.args.get("limit", 10, type=int), 100)
+    genes = GENES.search(prefix, limit)
+    return jsonify([{"gene": gene, "transcript": tx} for gene, tx in genes])
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint() -> Response:
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     main()
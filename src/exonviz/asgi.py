@@ -0,0 +1,533 @@
+"""
+ASGI version of the ExonViz web application
+
+The Flask application blocks a worker for every request while it waits for
+mutalyzer. This application handles the requests on an event loop instead.
+The blocking work (parsing, the caches and the calls to mutalyzer) is done in
+a thread pool of a fixed size, and the figures are rendered in a pool of
+worker processes, so a single server can handle many concurrent users.
+
+The size of the thread pool (EXONVIZ_THREADS, default 64) is the number of
+calls to mutalyzer that can be in progress at the same time. Requests that
+are answered from the caches only use a thread for a short while.
+
+Run it with any ASGI server, for example ``uvicorn exonviz.asgi:app``
+"""
+
+import asyncio
+import importlib.resources
+import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cache
+from typing import Any, Awaitable, Callable, TypeVar
+from urllib.parse import parse_qs, urlencode
+
+from . import batch, metrics, service
+from .cli import get_MANE
+from .genes import GeneIndex
+from .jobs import Job, JobQueue
+
+Scope = dict[str, Any]
+Message = dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+T = TypeVar("T")
+
+# Number of threads for blocking work, such as the calls to mutalyzer
+THREADS = int(os.environ.get("EXONVIZ_THREADS", "64"))
+# Maximum size of a request body, in bytes
+MAX_BODY = 1024 * 1024
+# The transcript that is shown on the form when it is first opened
+DEFAULT_TRANSCRIPT = "NM_003002.4:r.[274g>u;300del]"
+
+
+@dataclass()
+class Request:
+    """The parts of an HTTP request that are used by the application"""
+
+    method: str
+    path: str
+    query: dict[str, list[str]]
+    body: bytes = b""
+
+    @property
+    def args(self) -> dict[str, str]:
+        """The first value of every query argument"""
+        return {key: values[0] for key, values in self.query.items()}
+
+    def form(self) -> dict[str, str]:
+        """The first value of every field of a submitted form"""
+        fields = parse_qs(self.body.decode(), keep_blank_values=True)
+        return {key: values[0] for key, values in fields.items()}
+
+    def json(self) -> Any:
+        """The JSON body of the request, or None if it is not valid JSON"""
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+Handler = Callable[[Request, Send], Awaitable[None]]
+
+
+class App:
+    """ASGI application that renders ExonViz figures
+
+    :param processes: Number of processes used to render the figures. Use
+                      None for one process per CPU, or 0 to render the
+                      figures in the thread pool
+    :param threads: Number of threads for blocking work, such as the calls
+                    to mutalyzer
+    :param jobs: Queue for the background jobs of /api/jobs, which are
+                 disabled if this is None
+    """
+
+    def __init__(
+        self,
+        processes: int | None = None,
+        threads: int = THREADS,
+        jobs: JobQueue | None = None,
+    ) -> None:
+        self.processes = processes
+        self.threads = threads
+        self.jobs = jobs
+        self.thread_pool: ThreadPoolExecutor | None = None
+        self.executor: Executor | None = None
+        self.MANE = get_MANE()
+        self.genes = GeneIndex(self.MANE)
+        self.routes: dict[str, dict[str, Handler]] = {
+            "/": {"GET": self.index, "POST": self.index_post},
+            "/draw": {"GET": self.draw},
+            "/api/render": {"POST": self.api_render},
+            "/api/jobs": {"POST": self.api_submit_job},
+            "/api/genes": {"GET": self.api_genes},
+            "/metrics": {"GET": self.metrics},
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, receive, send)
+        else:
+            raise NotImplementedError(f"Unsupported scope type {scope['type']}")
+
+    def start(self) -> None:
+        """Start the thread pool, and the process pool used for rendering"""
+        if self.thread_pool is None:
+            self.thread_pool = ThreadPoolExecutor(
+                max_workers=self.threads, thread_name_prefix="exonviz-asgi"
+            )
+        if self.processes != 0 and self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.processes)
+
+    def stop(self) -> None:
+        """Stop the thread and process pools"""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown()
+            self.thread_pool = None
+
+    async def lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def run(self, function: Callable[..., T], *args: Any) -> T:
+        """Run a blocking function in the thread pool"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool, function, *args)
+
+    async def http(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path, method = scope["path"], scope["method"]
+        if path.startswith("/api/jobs/"):
+            methods: dict[str, Handler] = {"GET": self.api_job}
+        elif path.startswith("/static/"):
+            methods = {"GET": self.static}
+        elif path in self.routes:
+            methods = self.routes[path]
+        else:
+            await respond(send, 404, b"Not found")
+            return
+        if method not in methods:
+            await respond(send, 405, b"Method not allowed")
+            return
+
+        body = b""
+        more_body = method == "POST"
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if len(body) > MAX_BODY:
+                await respond(send, 413, b"Request body too large")
+                return
+
+        query = parse_qs(scope["query_string"].decode())
+        await methods[method](Request(method, path, query, body), send)
+
+    async def index(self, request: Request, send: Send) -> None:
+        """The form to visualise a transcript, with the default settings"""
+        session = service.web_config | {"transcript": DEFAULT_TRANSCRIPT}
+        await respond_html(send, render_template(session))
+
+    async def index_post(self, request: Request, send: Send) -> None:
+        """Visualise the transcript from the form
+
+        The form is submitted with all settings, so unlike the Flask website,
+        no session is needed
+        """
+        form = request.form()
+        session: dict[str, Any] = service.web_config | {
+            "transcript": DEFAULT_TRANSCRIPT
+        }
+        messages: list[str] = list()
+        figure = ""
+        dropped_variants: list[str] = list()
+        try:
+            session["transcript"] = form["transcript"]
+            for key in ["height", "gap", "firstexon", "lastexon", "width"]:
+                session[key] = int(form[key])
+            session["scale"] = float(form["scale"])
+            session["noncoding"] = "noncoding" in form
+            session["exonnumber"] = "exonnumber" in form
+            session["variantcolors"] = form["variantcolors"].split(" ")
+            session["variantshape"] = form["variantshape"]
+            session["color"] = form["color"] or service.web_config["color"]
+        except KeyError as e:
+            messages.append(f"Missing field {e}")
+        except ValueError as e:
+            messages.append(str(e))
+        download_url = url_for("draw", **session)
+
+        if not messages:
+            try:
+                session["transcript"] = await self.run(
+                    service.rewrite_transcript, session["transcript"], self.MANE
+                )
+                figure_config = {key: session[key] for key in service.web_config}
+                figure, dropped_variants = await self.render(
+                    session["transcript"], figure_config
+                )
+            except Exception as e:
+                messages.append(str(e))
+
+        # Report any variants we had to drop
+        if dropped_variants:
+            varstring = ", ".join(dropped_variants)
+            if len(dropped_variants) > 1:
+                messages.append(
+                    f"Dropped {len(dropped_variants)} variants which falls outside the exons: {varstring}"
+                )
+            else:
+                messages.append(
+                    f"Dropped 1 variant which falls outside the exons: {varstring}"
+                )
+
+        page = render_template(session, messages, figure, download_url)
+        await respond_html(send, page)
+
+    async def static(self, request: Request, send: Send) -> None:
+        """The static files of the website"""
+        name = request.path.removeprefix("/static/")
+        folder = importlib.resources.files("exonviz") / "static"
+        if name not in {path.name for path in folder.iterdir()}:
+            await respond(send, 404, b"Not found")
+            return
+        content_type = "text/css" if name.endswith(".css") else "text/plain"
+        await respond(send, 200, (folder / name).read_bytes(), content_type)
+
+    async def api_genes(self, request: Request, send: Send) -> None:
+        """Suggest genes that start with the specified prefix"""
+        prefix = request.args.get("prefix", "")
+        try:
+            limit = min(int(request.args.get("limit", "10")), 100)
+        except ValueError:
+            limit = 10
+        genes = [
+            {"gene": gene, "transcript": tx}
+            for gene, tx in self.genes.search(prefix, limit)
+        ]
+        await respond(
+            send, 200, json.dumps(genes).encode(), content_type="application/json"
+        )
+
+    async def metrics(self, request: Request, send: Send) -> None:
+        body = metrics.render().encode()
+        await respond(send, 200, body, content_type="text/plain; version=0.0.4")
+
+    async def draw(self, request: Request, send: Send) -> None:
+        args = request.args
+        try:
+            figure_config = service.config_from_query(
+                args, request.query.get("variantcolors", list())
+            )
+            transcript = await self.run(
+                service.rewrite_transcript, args["transcript"], self.MANE
+            )
+            figure, _ = await self.render(transcript, figure_config)
+        except KeyError as e:
+            await respond(send, 400, f"Missing argument {e}".encode())
+            return
+        except (ValueError, RuntimeError) as e:
+            await respond(send, 400, str(e).encode())
+            return
+
+        await respond_svg(send, transcript, figure)
+
+    async def api_render(self, request: Request, send: Send) -> None:
+        """Render a list of HGVS descriptions, and return a zip file of figures"""
+        data = request.json()
+        if not isinstance(data, dict) or not isinstance(data.get("descriptions"), list):
+            await respond(send, 400, b"Please specify a list of 'descriptions'")
+            return
+
+        descriptions = [str(description) for description in data["descriptions"]]
+        if len(descriptions) > batch.MAX_DESCRIPTIONS:
+            msg = f"Please specify at most {batch.MAX_DESCRIPTIONS} descriptions"
+            await respond(send, 400, msg.encode())
+            return
+
+        try:
+            figure_config = service.config_from_json(data.get("config", dict()))
+        except (TypeError, ValueError) as e:
+            await respond(send, 400, str(e).encode())
+            return
+
+        results = await asyncio.gather(
+            *(
+                self.render_one(description, figure_config)
+                for description in descriptions
+            )
+        )
+        archive = await self.run(lambda: b"".join(batch.zip_figures(results)))
+        await respond(
+            send,
+            200,
+            archive,
+            content_type="application/zip",
+            headers=[("Content-disposition", "attachment; filename=exonviz.zip")],
+        )
+
+    async def api_submit_job(self, request: Request, send: Send) -> None:
+        """Render a single HGVS description in the background"""
+        if self.jobs is None:
+            await respond(send, 404, b"Background jobs are not enabled")
+            return
+
+        data = request.json()
+        if not isinstance(data, dict) or not isinstance(data.get("description"), str):
+            await respond(send, 400, b"Please specify a 'description'")
+            return
+
+        try:
+            figure_config = service.config_from_json(data.get("config", dict()))
+            transcript = await self.run(
+                service.rewrite_transcript, data["description"], self.MANE
+            )
+        except Exception as e:
+            await respond(send, 400, str(e).encode())
+            return
+
+        job = await self.run(self.jobs.submit, transcript, figure_config)
+        await self.job_response(send, job)
+
+    async def api_job(self, request: Request, send: Send) -> None:
+        job_id = request.path.removeprefix("/api/jobs/")
+        job = await self.run(self.jobs.get, job_id) if self.jobs is not None else None
+        if job is None:
+            await respond(send, 404, f"Unknown job {job_id}".encode())
+            return
+        await self.job_response(send, job)
+
+    async def job_response(self, send: Send, job: Job) -> None:
+        """Report the status of a job, or return the figure when it is done"""
+        if job.status == "done" and job.figure is not None:
+            await respond_svg(send, job.hgvs, job.figure)
+            return
+        url = url_for("api_job", job_id=job.id)
+        body = json.dumps(job.to_dict() | {"url": url}).encode()
+        await respond(
+            send,
+            500 if job.status == "failed" else 202,
+            body,
+            content_type="application/json",
+            headers=[("Location", url)],
+        )
+
+    async def render_one(
+        self, description: str, config: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Render a single description, errors are reported in the result
+
+        See batch.render_one
+        """
+        result: dict[str, Any] = {
+            "description": description,
+            "transcript": None,
+            "figure": None,
+            "dropped": list(),
+            "error": None,
+        }
+        try:
+            result["transcript"] = await self.run(
+                service.rewrite_transcript, description, self.MANE
+            )
+            figure, dropped = await self.render(result["transcript"], config)
+        except Exception as e:
+            result["error"] = str(e)
+        else:
+            result["figure"] = figure
+            result["dropped"] = dropped
+        return result
+
+    async def render(self, hgvs: str, config: dict[str, Any]) -> tuple[str, list[str]]:
+        """Render the figure for hgvs in the process pool
+
+        The caches and the call to mutalyzer are used from the thread pool
+        """
+        cached = await self.run(service.get_figure, hgvs, config)
+        if cached is not None:
+            return cached
+
+        payload = await self.run(service.fetch_payload, hgvs)
+        loop = asyncio.get_running_loop()
+        figure, dropped_variants, truncated = await loop.run_in_executor(
+            self.executor or self.thread_pool,
+            service.render_payload,
+            hgvs,
+            payload,
+            config,
+        )
+        if not truncated:
+            await self.run(service.put_figure, hgvs, config, figure, dropped_variants)
+        return figure, dropped_variants
+
+
+def url_for(endpoint: str, **values: Any) -> str:
+    """The URL of an endpoint, like flask.url_for"""
+    if endpoint == "static":
+        return f"/static/{values['filename']}"
+    if endpoint == "api_job":
+        return f"/api/jobs/{values['job_id']}"
+    paths = {"index": "/", "draw": "/draw", "api_genes": "/api/genes"}
+    path = paths[endpoint]
+    return f"{path}?{urlencode(values, doseq=True)}" if values else path
+
+
+@cache
+def _templates() -> Any:
+    """The Jinja environment for the templates of the website"""
+    import jinja2
+
+    return jinja2.Environment(
+        loader=jinja2.PackageLoader("exonviz", "templates"),
+        autoescape=jinja2.select_autoescape(),
+    )
+
+
+def render_template(
+    session: dict[str, Any],
+    messages: list[str] | None = None,
+    figure: str = "",
+    download_url: str | None = None,
+) -> str:
+    """Render the page of the website, with the values from the session"""
+    template = _templates().get_template("index.html")
+    return str(
+        template.render(
+            session=session,
+            figure=figure,
+            download_url=download_url,
+            url_for=url_for,
+            get_flashed_messages=lambda: messages or list(),
+        )
+    )
+
+
+async def respond(
+    send: Send,
+    status: int,
+    body: bytes,
+    content_type: str = "text/plain",
+    headers: list[tuple[str, str]] | None = None,
+) -> None:
+    """Send a complete HTTP response"""
+    raw_headers = [(b"content-type", content_type.encode())]
+    for key, value in headers or list():
+        raw_headers.append((key.lower().encode(), value.encode()))
+    await send(
+        {"type": "http.response.start", "status": status, "headers": raw_headers}
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def respond_svg(send: Send, hgvs: str, figure: str) -> None:
+    """Send a figure as a download"""
+    fname = service.secure_filename(f"{hgvs}.svg")
+    await respond(
+        send,
+        200,
+        figure.encode(),
+        content_type="text/svg",
+        headers=[("Content-disposition", f"attachment; filename={fname}")],
+    )
+
+
+async def respond_html(send: Send, page: str) -> None:
+    await respond(send, 200, page.encode(), content_type="text/html; charset=utf-8")
+
+
+app = App()
+
+
+def main() -> None:
+    import argparse
+
+    try:
+        import uvicorn
+    except ModuleNotFoundError:
+        print(f"Missing modules, please install with 'pip install exonviz[asgi]'")
+        exit(-1)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost", help="Hostname to listen on")
+    parser.add_argument("--port", default=8000, type=int, help="Port to listen on")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        help="Number of processes used to render figures (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=THREADS,
+        help="Number of threads for blocking work, such as calls to Mutalyzer",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        metavar="PROCESSES",
+        help="Enable /api/jobs, with this many processes to render the jobs",
+    )
+
+    args = parser.parse_args()
+    jobs = JobQueue(processes=args.jobs) if args.jobs is not None else None
+    app = App(processes=args.processes, threads=args.threads, jobs=jobs)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
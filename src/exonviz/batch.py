@@ -0,0 +1,127 @@
+"""
+Render many figures at once, for the batch API of the website
+"""
+
+import io
+import json
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Iterator
+
+from . import service
+
+# Maximum number of descriptions in a single batch
+MAX_DESCRIPTIONS = 500
+
+
+def render_one(
+    description: str, config: dict[str, Any], MANE: dict[str, str]
+) -> dict[str, Any]:
+    """Render a single description, errors are reported in the result"""
+    result: dict[str, Any] = {
+        "description": description,
+        "transcript": None,
+        "figure": None,
+        "dropped": list(),
+        "error": None,
+    }
+    try:
+        result["transcript"] = service.rewrite_transcript(description, MANE)
+        figure, dropped = service.render(result["transcript"], config)
+    except Exception as e:
+        result["error"] = str(e)
+    else:
+        result["figure"] = figure
+        result["dropped"] = dropped
+    return result
+
+
+def render_many(
+    descriptions: Iterable[str],
+    config: dict[str, Any],
+    MANE: dict[str, str],
+    workers: int = 8,
+) -> Iterator[dict[str, Any]]:
+    """Render the descriptions concurrently, yields the results in order"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(
+            lambda description: render_one(description, config, MANE), descriptions
+        )
+
+
+def build_one(
+    description: str, config: dict[str, Any], MANE: dict[str, str]
+) -> dict[str, Any]:
+    """Build the exons for a single description, errors are reported in the result"""
+    result: dict[str, Any] = {
+        "description": description,
+        "transcript": None,
+        "exons": None,
+        "dropped": list(),
+        "error": None,
+    }
+    try:
+        result["transcript"] = service.rewrite_transcript(description, MANE)
+        exons, dropped = service.build(result["transcript"], config)
+    except Exception as e:
+        result["error"] = str(e)
+    else:
+        result["exons"] = exons
+        result["dropped"] = dropped
+    return result
+
+
+def build_many(
+    descriptions: Iterable[str],
+    config: dict[str, Any],
+    MANE: dict[str, str],
+    workers: int = 8,
+) -> Iterator[dict[str, Any]]:
+    """Build the exons for the descriptions concurrently, yields the results in order"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(
+            lambda description: build_one(description, config, MANE), descriptions
+        )
+
+
+class _Chunks(io.RawIOBase):
+    """Write-only stream that keeps the written data until it is taken"""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = list()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        """Take the data that was written since the last call"""
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def zip_figures(results: Iterable[dict[str, Any]]) -> Iterator[bytes]:
+    """Stream a zip archive of the rendered figures
+
+    Every figure is written as soon as it has been rendered. The archive ends
+    with manifest.json, which lists the file, dropped variants and error
+    for every description.
+    """
+    stream = _Chunks()
+    manifest = list()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for index, result in enumerate(results, 1):
+            entry = {key: value for key, value in result.items() if key != "figure"}
+            entry["file"] = None
+            if result["figure"] is not None:
+                fname = service.secure_filename(f"{index}-{result['transcript']}.svg")
+                archive.writestr(fname, result["figure"])
+                entry["file"] = fname
+            manifest.append(entry)
+            yield stream.take()
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    yield stream.take()
@@ -0,0 +1,49 @@
+"""
+Caches that are shared between processes
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+
+class DiskCache:
+    """Cache which stores every value as a file in a directory
+
+    Values are written atomically, so the cache can be shared between
+    processes, such as the workers of the website and ``exonviz warm-cache``
+
+    :param directory: Directory to store the values in
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def __repr__(self) -> str:
+        return f"DiskCache({str(self.directory)!r})"
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def _path(self, key: str) -> Path:
+        """Determine the path where the value for key is stored"""
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / digest[:2] / digest
+
+    def get(self, key: str) -> bytes | None:
+        """Get the value for key, or None if it is not in the cache"""
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: bytes) -> None:
+        """Store the value for key"""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so readers never see partial values
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as fout:
+            fout.write(value)
+        os.replace(tmp, path)
@@ -4,13 +4,15 @@ without executing side effects
 """
 
 import argparse
+import contextlib
+import json
 import sys
 import gzip
 import importlib
 from collections import defaultdict
 import re
 
-from functools import cmp_to_key
+from functools import cache, cmp_to_key
 
 import logging
 
@@ -18,15 +20,28 @@ logging.basicConfig()
 log = logging.getLogger(__name__)
 
 from typing import Any, cast
+from . import metrics
 from .draw import draw_exons
-from .exon import Exon, Variant, exons_from_tsv
-from .mutalyzer import fetch_exons, build_exons, less_than
+from .exon import Exon, Variant, exons_from_bytes, exons_from_tsv, exons_to_bytes
+from .mutalyzer import build_exons, less_than
+from .sources import fetch_exons
 from mutalyzer_hgvs_parser import parse, to_model
+from mutalyzer_hgvs_parser.exceptions import (
+    NestedDescriptions,
+    UnexpectedCharacter,
+    UnexpectedEnd,
+)
 
 from .draw import _config
+from .subcommands import SUBCOMMANDS
 
 
+@cache
 def get_MANE() -> dict[str, str]:
+    """Get the mapping of gene names to MANE Select transcripts
+
+    The mapping is only read once, so the same dictionary is returned every time
+    """
     mane = dict()
 
     my_resources = importlib.resources.files("exonviz") / "data"
@@ -43,21 +58,75 @@ def get_MANE() -> dict[str, str]:
     return mane
 
 
-def check_input(transcript: str) -> str:
-    """Rewrite the transcript if it is not a valid HGVS description"""
-    # Is transcript already valid HGVS
+# Bare references: RefSeq and LRG accessions such as NM_003002.4 and Ensembl
+# transcripts, with an optional selector such as NG_012337.3(NM_003002.4)
+ACCESSION = re.compile(
+    r"(?:[A-Z]+_[A-Za-z0-9]+|ENS[A-Z]*\d+)(?:\.\d+)?(?:\([A-Za-z0-9_.]+\))?"
+)
+# Gene symbols, such as SDHD or HLA-A
+GENE = re.compile(r"[A-Za-z][A-Za-z0-9_-]*")
+
+
+def classify_input(transcript: str) -> str:
+    """Classify the input without using the HGVS parser
+
+    Returns 'description', 'reference', 'gene' or 'invalid'
+
+    >>> classify_input("NM_003002.4:c.274G>T"), classify_input("NM_003002.4")
+    ('description', 'reference')
+    >>> classify_input("BRAC1"), classify_input("BRCA1 c.68_69del")
+    ('gene', 'invalid')
+    """
+    reference, colon, _ = transcript.partition(":")
+    if ACCESSION.fullmatch(reference):
+        return "description" if colon else "reference"
+    if GENE.fullmatch(transcript):
+        return "gene"
+    return "invalid"
+
+
+def parse_description(description: str) -> None:
+    """Parse an HGVS description, and raise a ValueError if it is invalid
+
+    >>> parse_description("NM_003002.4:c.274G>")  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    ...
+    ValueError: Unexpected character end of input...
+    """
     try:
-        parse(transcript)
+        parse(description)
+    except (UnexpectedCharacter, UnexpectedEnd, NestedDescriptions) as e:
+        raise ValueError(str(e)) from e
+
+
+def check_input(transcript: str) -> str:
+    """Rewrite the transcript if it is not a valid HGVS description
+
+    Input that is not an HGVS description, a transcript or a gene with a MANE
+    Select transcript is rejected before using the (slow) HGVS parser
+    """
+    kind = classify_input(transcript)
+    if kind == "description":
+        parse_description(transcript)
         # Rewrite the HGVS description with variants to put the variants in order,
         # which they might not be
         return sort_variants(transcript)
-    except Exception:
-        pass
 
-    # Maybe we got a bare transcript, we should make it a variant description
-    var_transcript = f"{transcript}:c.="
-    parse(var_transcript)
-    return var_transcript
+    # Genes, and Ensembl genes without a symbol, use the MANE Select transcript
+    MANE = get_MANE()
+    if transcript in MANE:
+        return check_input(MANE[transcript])
+
+    if kind == "reference":
+        # We got a bare transcript, we should make it a variant description
+        var_transcript = f"{transcript}:c.="
+        parse_description(var_transcript)
+        return var_transcript
+
+    if kind == "gene":
+        raise ValueError(f"'{transcript}' is not a gene with a MANE Select transcript")
+
+    raise ValueError(f"'{transcript}' is not a valid HGVS description or transcript")
 
 
 def trim_variants(transcript: str) -> str:
@@ -112,17 +181,20 @@ def sort_variants(transcript: str) -> str:
 def make_exons(hgvs: str, config: dict[str, Any]) -> list[Exon]:
     """Make or fetch the requested exons"""
     # If the transcript is actually the gene name, substitute the MANE transcript
-    MANE = get_MANE()
-    hgvs = MANE.get(hgvs, hgvs)
+    with metrics.stage("mane"):
+        MANE = get_MANE()
+        hgvs = MANE.get(hgvs, hgvs)
     # Does the transcript format make sense?
-    hgvs = check_input(hgvs)
-
-    # Make the HGVS description without variants for the normalizer
-    no_variants = trim_variants(hgvs)
+    with metrics.stage("parse"):
+        hgvs = check_input(hgvs)
+        # Make the HGVS description without variants for the normalizer
+        no_variants = trim_variants(hgvs)
 
-    exon_payload = fetch_exons(no_variants)
+    with metrics.stage("fetch"):
+        exon_payload = fetch_exons(no_variants)
 
-    exons, dropped = build_exons(hgvs, exon_payload, config)
+    with metrics.stage("build"):
+        exons, dropped = build_exons(hgvs, exon_payload, config)
 
     for variant in dropped:
         log.warning(f"Dropped variant {variant}, which falls outside the exons")
@@ -168,12 +240,45 @@ def make_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--dump-variants", type=str, help="Write variants to the specified file"
     )
+    parser.add_argument(
+        "--dump-binary",
+        type=str,
+        help="Write exons and variants to the specified file, in binary format",
+    )
 
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument("--transcript", help="Transcript (with version) to visualise")
     group.add_argument("--exon-tsv", help="TSV file containing exons")
+    group.add_argument(
+        "--exon-bin", help="Binary file containing exons (see --dump-binary)"
+    )
     parser.add_argument("--variant-tsv", help="TSV file containing variants")
 
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="table",
+        choices=["table", "json"],
+        help="Report the time spent in each stage on stderr",
+    )
+    parser.add_argument(
+        "--profile-stats",
+        help="Write cProfile statistics for the layout stage to the specified file",
+    )
+    parser.add_argument(
+        "--memprofile",
+        nargs="?",
+        const="table",
+        choices=["table", "json"],
+        help="Report the peak and retained memory of each stage on stderr",
+    )
+    parser.add_argument(
+        "--memprofile-top",
+        type=int,
+        default=5,
+        help="Number of allocation sites to report for each stage",
+    )
+
     return parser
 
 
@@ -210,11 +315,17 @@ def dump_variants(exons: list[Exon], fname: str) -> None:
                 print(variant.tsv(sep="\t"), file=fout)
 
 
+def dump_binary(exons: list[Exon], fname: str) -> None:
+    """Write the exons and variants to the specified file, in binary format"""
+    with open(fname, "wb") as fout:
+        fout.write(exons_to_bytes(exons))
+
+
 def exons_from_mutalyzer(transcript: str, config: dict[str, Any]) -> list[Exon]:
     """Attempt to create exons from mutalyzer"""
     try:
         exons = make_exons(transcript, config)
-    except RuntimeError as e:
+    except (ValueError, RuntimeError) as e:
         print(e, file=sys.stderr)
         exit(1)
     return exons
@@ -226,6 +337,12 @@ def exons_from_tsv_file(fname: str) -> list[Exon]:
         return exons_from_tsv(fin)
 
 
+def exons_from_binary_file(fname: str) -> list[Exon]:
+    """Read Exons from a binary file"""
+    with open(fname, "rb") as fin:
+        return exons_from_bytes(fin.read())
+
+
 def variants_from_tsv_file(fname: str) -> dict[int, list[Variant]]:
     """Read Variants from a tsv file"""
     variants = defaultdict(list)
@@ -238,25 +355,64 @@ def variants_from_tsv_file(fname: str) -> dict[int, list[Variant]]:
     return variants
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in SUBCOMMANDS:
+        module = importlib.import_module(SUBCOMMANDS[argv[0]])
+        module.main(argv[1:])
+        return
+
     parser = make_parser()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     # Make the configuration for the drawing
     config = dict()
     for key, *_ in _config:
         config[key] = getattr(args, key)
 
+    profiling = args.profile or args.profile_stats
+    if not profiling and not args.memprofile:
+        run(args, config)
+        return
+
+    from .profiling import Profiler, MemoryProfiler, memprofile, profile
+
+    profiler: Profiler | None = None
+    memory: MemoryProfiler | None = None
+    with contextlib.ExitStack() as stack:
+        if profiling:
+            cprofile_stage = "layout" if args.profile_stats else None
+            profiler = stack.enter_context(profile(cprofile_stage))
+        if args.memprofile:
+            memory = stack.enter_context(memprofile(args.memprofile_top))
+        run(args, config)
+
+    for report, result in [(args.profile, profiler), (args.memprofile, memory)]:
+        if report == "json" and result is not None:
+            print(json.dumps(result.to_dict()), file=sys.stderr)
+        elif report and result is not None:
+            print(result.table(), file=sys.stderr)
+    if profiler is not None and args.profile_stats:
+        profiler.dump_stats(args.profile_stats)
+
+
+def run(args: argparse.Namespace, config: dict[str, Any]) -> None:
+    """Run the command line app for the parsed arguments"""
     # Create the exons
     if args.transcript:
         exons = exons_from_mutalyzer(args.transcript, config)
     elif args.exon_tsv:
         exons = exons_from_tsv_file(args.exon_tsv)
+    elif args.exon_bin:
+        exons = exons_from_binary_file(args.exon_bin)
 
     if args.variant_tsv:
         vars = variants_from_tsv_file(args.variant_tsv)
         for i, exon in enumerate(exons, 1):
             exon.variants = vars[i]
 
+    if args.dump_binary:
+        dump_binary(exons, args.dump_binary)
     if args.dump_exons:
         dump_exons(exons, args.dump_exons)
     if args.dump_variants:
@@ -267,7 +423,6 @@ def main() -> None:
             exons,
             config=config,
         )
-        print(plot)
-
-    if __name__ == "__main__":
-        main()
+        with metrics.stage("serialise"):
+            figure = str(plot)
+        print(figure)
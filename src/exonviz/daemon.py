@@ -0,0 +1,174 @@
+"""
+Run exonviz commands in a long-lived process, to avoid paying for the start
+up of Python, the imports and loading MANE on every invocation
+
+The server listens on a Unix socket. A client sends a single JSON line with
+the arguments and working directory of the command, and gets back a single
+JSON line with the exit status, stdout and stderr of the command.
+
+Only the command to draw a figure is run by the daemon. Subcommands read
+stdin, run servers or change the configuration of the process, so they are
+always run by the client itself.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+from typing import Any, Iterator
+
+from .subcommands import SUBCOMMANDS
+
+log = logging.getLogger(__name__)
+
+# Commands change the working directory and redirect stdout, so only one
+# command can run at a time
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _cached_fetch() -> Iterator[None]:
+    """Fetch the exons using the cache of the service module"""
+    from . import cli, service
+
+    fetch_exons = getattr(cli, "fetch_exons")
+    setattr(cli, "fetch_exons", service.fetch_payload)
+    try:
+        yield
+    finally:
+        setattr(cli, "fetch_exons", fetch_exons)
+
+
+def run(argv: list[str], cwd: str) -> dict[str, Any]:
+    """Run an exonviz command in this process, and capture its output"""
+    from . import cli
+
+    if argv and argv[0] in SUBCOMMANDS:
+        msg = f"The daemon does not run subcommands, run 'exonviz {argv[0]}' directly\n"
+        return {"status": 2, "stdout": "", "stderr": msg}
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    handler = logging.StreamHandler(stderr)
+    status = 0
+    with _lock:
+        previous = os.getcwd()
+        logging.getLogger().addHandler(handler)
+        try:
+            os.chdir(cwd)
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(
+                stderr
+            ), _cached_fetch():
+                cli.main(argv)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                status = e.code
+            elif e.code is not None:
+                print(e.code, file=stderr)
+                status = 1
+        except Exception as e:
+            print(f"{type(e).__name__}: {e}", file=stderr)
+            status = 1
+        finally:
+            logging.getLogger().removeHandler(handler)
+            os.chdir(previous)
+    return {"status": status, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """Run the command that was sent by the client"""
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            result = run(request["argv"], request["cwd"])
+        except (ValueError, KeyError, TypeError) as e:
+            result = {"status": 2, "stdout": "", "stderr": f"Invalid request: {e}\n"}
+        self.wfile.write(json.dumps(result).encode() + b"\n")
+
+
+def make_server(path: str) -> socketserver.UnixStreamServer:
+    """Create a server listening on the Unix socket at path"""
+    if os.path.exists(path):
+        # Refuse to take over the socket of a daemon that is still running
+        with contextlib.suppress(OSError), socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(path)
+            raise RuntimeError(f"An exonviz daemon is already listening on {path}")
+        os.unlink(path)
+    return socketserver.ThreadingUnixStreamServer(path, Handler)
+
+
+def send(path: str, argv: list[str]) -> dict[str, Any]:
+    """Send a command to the daemon listening on path"""
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(path)
+        request = {"argv": argv, "cwd": os.getcwd()}
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as fin:
+            result: dict[str, Any] = json.loads(fin.readline())
+    return result
+
+
+def client() -> None:
+    """Entry point of exonviz
+
+    If a socket is specified with --socket or $EXONVIZ_SOCKET, the command to
+    draw a figure is sent to the daemon. If no daemon is listening, or for
+    subcommands, the command is run in this process instead.
+    """
+    argv = sys.argv[1:]
+    path = os.environ.get("EXONVIZ_SOCKET")
+    subcommand = bool(argv) and argv[0] in SUBCOMMANDS
+    if "--socket" in argv and not subcommand:
+        index = argv.index("--socket")
+        path = argv[index + 1] if index + 1 < len(argv) else None
+        del argv[index : index + 2]
+
+    if path and not subcommand:
+        try:
+            result = send(path, argv)
+        except (FileNotFoundError, ConnectionRefusedError):
+            log.debug(f"No exonviz daemon listening on {path}")
+        else:
+            sys.stdout.write(result["stdout"])
+            sys.stderr.write(result["stderr"])
+            sys.exit(result["status"])
+
+    from .cli import main
+
+    main(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="exonviz serve",
+        description="Run exonviz commands sent to a Unix socket",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--socket",
+        default=os.environ.get("EXONVIZ_SOCKET"),
+        help="Path of the Unix socket (default: $EXONVIZ_SOCKET)",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.socket:
+        parser.error("Please specify --socket, or set EXONVIZ_SOCKET")
+
+    from .service import preload
+
+    preload()
+    server = make_server(args.socket)
+    print(f"Listening on {args.socket}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 import gzip
-from typing import Dict, Any, Generator
+from typing import Dict, Any, Generator, Iterable, List, Tuple
 
 gff_header = "seqid source type start end score strand phase attributes".split()
 
@@ -33,10 +33,65 @@ def parse_gff(fname: str) -> Generator[Dict[str, Any], None, None]:
             yield line_to_gff(line)
 
 
+def exon_models(
+    records: Iterable[Dict[str, Any]],
+) -> Generator[Tuple[str, Dict[str, Any]], None, None]:
+    """Make a Mutalyzer payload for every MANE Select transcript
+
+    The exons and CDS are in genomic coordinates. For transcripts on the
+    reverse strand, the start of every range is larger than the end, in the
+    same way as Mutalyzer does
+    """
+    mane_select = set()
+    strand: Dict[str, str] = dict()
+    exons: Dict[str, List[Tuple[int, int]]] = dict()
+    cds: Dict[str, List[Tuple[int, int]]] = dict()
+
+    for record in records:
+        attr = record["attributes"]
+        if record["type"] == "transcript":
+            if "MANE_Select" in attr.get("tag", []):
+                mane_select.add(attr["transcript_id"])
+            strand[attr["transcript_id"]] = record["strand"]
+            continue
+        transcript = attr.get("transcript_id", attr.get("Parent"))
+        if record["type"] == "exon":
+            exons.setdefault(transcript, list()).append(
+                (record["start"], record["end"])
+            )
+        # The stop codon is part of the coding region in Mutalyzer
+        elif record["type"] in ["CDS", "stop_codon"]:
+            cds.setdefault(transcript, list()).append((record["start"], record["end"]))
+
+    for transcript in sorted(mane_select):
+        # Non coding transcripts are not drawn by ExonViz
+        if transcript not in cds or transcript not in exons:
+            continue
+        cds_start = min(start for start, _ in cds[transcript])
+        cds_end = max(end for _, end in cds[transcript])
+        if strand[transcript] == "-":
+            ranges = [
+                [str(end), str(start)] for start, end in sorted(exons[transcript])
+            ]
+            payload_exons = ranges[::-1]
+            payload_cds = [str(cds_end), str(cds_start)]
+        else:
+            payload_exons = [
+                [str(start), str(end)] for start, end in sorted(exons[transcript])
+            ]
+            payload_cds = [str(cds_start), str(cds_end)]
+        yield transcript, {"exon": {"g": payload_exons}, "cds": {"g": [payload_cds]}}
+
+
 if __name__ == "__main__":
-    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("gff", help="GFF3 file of the MANE transcripts")
+    parser.add_argument("--exons", help="Also write the exon models to this file")
+    args = parser.parse_args()
 
-    fname = sys.argv[1]
+    fname = args.gff
     for record in parse_gff(fname):
         if (
             record["type"] == "transcript"
@@ -44,3 +99,9 @@ if __name__ == "__main__":
         ):
             attr = record["attributes"]
             print(attr["gene_name"], attr["transcript_id"], sep="\t")
+
+    if args.exons:
+        from exonviz.mane import write_models
+
+        with open(args.exons, "wb") as fout:
+            write_models(fout, exon_models(parse_gff(fname)))
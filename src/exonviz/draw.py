@@ -1,9 +1,10 @@
 from typing import Any, no_type_check
 import svg
-from .exon import element_xy, Element, Exon, Variant
+from .exon import element_xy, count_elements, simplify_exons, Element, Exon, Variant
 import exonviz.exon
 import textwrap
 import math
+import time
 
 
 # Options for drawing the figure. Used to create the cli parser and default dict
@@ -23,11 +24,19 @@ _config = [
         "List of variant colors to cycle through",
     ),
     ("variantshape", "pin", "Shape of the variant ('pin' or 'bar')"),
+    ("maxelements", 100000, "Simplify the figure if it has more elements"),
+    ("maxrows", 1000, "Maximum number of rows to draw"),
+    ("maxtime", 10.0, "Maximum time (in seconds) to spend on the layout"),
 ]
 
 config = {key: value for key, value, description in _config}
 
 
+def _option(figure_config: dict[str, Any], key: str) -> Any:
+    """Get an option from the figure configuration, or the default value"""
+    return figure_config.get(key, config[key])
+
+
 def shift(
     points: list[float | int], x_offset: float, y_offset: float
 ) -> list[float | int]:
@@ -107,7 +116,6 @@ def draw_legend(
     return elements
 
 
-@no_type_check
 def draw_exons(
     exons: list[Exon],
     config: dict[str, Any],
@@ -118,11 +126,28 @@ def draw_exons(
     :param config: ExonViz configuration dictionary
     :return: SVG figure of the rendered exons
     """
+    figure: svg.SVG
+    figure, _ = draw_figure(exons, config)
+    return figure
+
+
+@no_type_check
+def draw_figure(
+    exons: list[Exon],
+    config: dict[str, Any],
+) -> tuple[svg.SVG, str]:
+    """Draw a list of Exons, and report if the figure was truncated
+
+    :return: SVG figure of the rendered exons, and which budget was exceeded
+             ('' if the figure is complete)
+    """
     width = config["width"]
     height = config["height"]
     scale = config["scale"]
     gap = config["gap"]
     variant_shape = config["variantshape"]
+    deadline = time.monotonic() + _option(config, "maxtime")
+    max_elements = _option(config, "maxelements")
 
     if width < 1:
         raise ValueError("width should at least be 1")
@@ -133,19 +158,25 @@ def draw_exons(
     if gap < 0:
         raise ValueError("gap should at least be zero")
 
+    # Simplify the figure if it would contain too many elements
+    if count_elements(exons, variant_shape) > max_elements:
+        exons = simplify_exons(exons, scale, width, variant_shape, max_elements)
+
     # Determine the smallest scale every exon can be drawn at
     min_scale = max((e.min_scale(height) for e in exons))
     if scale < min_scale:
         msg = f"Transcript must be drawn at scale {min_scale} or larger"
         raise ValueError(msg)
 
-    elements = exonviz.exon.draw_exons(
+    elements, truncated = exonviz.exon.draw_rows(
         exons,
         width=width,
         height=height,
         scale=scale,
         gap=gap,
         variant_shape=variant_shape,
+        max_rows=_option(config, "maxrows"),
+        deadline=deadline,
     )
     # How far down the page did we go?
     x, y = bottom_right(elements, height)
@@ -164,4 +195,5 @@ def draw_exons(
     # The maximum width we have reached for this picture
     canvas_width, canvas_height = bottom_right(elements, height)
 
-    return svg.SVG(width=canvas_width, height=canvas_height, elements=elements)
+    figure = svg.SVG(width=canvas_width, height=canvas_height, elements=elements)
+    return figure, truncated
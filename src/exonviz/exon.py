@@ -1,7 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Any, Sequence, no_type_check
 import copy
 import math
+import struct
+import time
 from decimal import Decimal, ROUND_UP
 
 from typing import TypeAlias
@@ -9,15 +11,25 @@ from typing import TypeAlias
 from _io import TextIOWrapper
 from svg import Rect, Polygon, Text, Style, Circle, Point
 
+from . import metrics
 from .range import intersect, Range
 
 import logging
 
-logging.basicConfig(level="DEBUG")
 log = logging.getLogger(__name__)
 
 Element: TypeAlias = Circle | Rect | Polygon | Text | Style
 
+# Binary format: size, coding start, end, start phase and end phase, number of
+# variants, and the length of the name and color. The name and color follow,
+# and then the variants: position, length of the name and color, name, color
+_EXON = struct.Struct("<iiibbIHH")
+_VARIANT = struct.Struct("<iHH")
+# File format: magic bytes, version and the number of exons
+_MAGIC = b"EXVZ"
+_HEADER = struct.Struct("<4sBI")
+_VERSION = 1
+
 
 @dataclass()
 class Coding:
@@ -406,9 +418,9 @@ class Exon:
         new_color = self.color
 
         # Update the variants
-        new_variants = [v for v in self.variants if v.position <= size]
+        new_variants = [v for v in self.variants if v.position < size]
         # Get the variants that remain
-        self.variants = [v for v in self.variants if v.position > size]
+        self.variants = [v for v in self.variants if v.position >= size]
         # Update the variant positions
         for v in self.variants:
             v.position -= size
@@ -482,6 +494,53 @@ class Exon:
         ]
         return sep.join(map(str, records))
 
+    def to_bytes(self) -> bytes:
+        """Dump an exon in the compact binary format"""
+        name = self.name.encode()
+        color = self.color.encode()
+        parts = [
+            _EXON.pack(
+                self.size,
+                self.coding.start,
+                self.coding.end,
+                self.coding.start_phase,
+                self.coding.end_phase,
+                len(self.variants),
+                len(name),
+                len(color),
+            ),
+            name,
+            color,
+        ]
+        for variant in self.variants:
+            variant_name = variant.name.encode()
+            variant_color = variant.color.encode()
+            parts.append(
+                _VARIANT.pack(variant.position, len(variant_name), len(variant_color))
+            )
+            parts += [variant_name, variant_color]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Exon":
+        """Load an exon from the compact binary format"""
+        exon, offset = _unpack_exon(data, 0)
+        if offset != len(data):
+            raise ValueError("Unexpected data after the exon")
+        return exon
+
+
+class LayoutBudgetExceeded(Exception):
+    """The layout of the exons exceeded the row or time budget
+
+    :param rows: The rows that were laid out within the budget
+    :param reason: Which budget was exceeded
+    """
+
+    def __init__(self, rows: list[list[Exon]], reason: str) -> None:
+        super().__init__(reason)
+        self.rows = rows
+
 
 def _pick_split(splits: list[Range], page_size: int) -> int:
     """
@@ -512,11 +571,17 @@ def group_exons(
     scale: float = 1.0,
     page_full: float = 0.15,
     gap_offset: int | None = None,
+    max_rows: int | None = None,
+    deadline: float | None = None,
 ) -> list[list[Exon]]:
-    """Group exons on a page, so that they do not go over width"""
+    """Group exons on a page, so that they do not go over width
+
+    If the exons need more than max_rows rows, or the layout is not finished
+    before deadline (see time.monotonic), LayoutBudgetExceeded is raised
+    """
     if not exons:
         return [[]]
-    page = list()
+    page: list[list[Exon]] = list()
     row: list[Exon] = list()
 
     # Additional gap offset for exons that end with phase-0
@@ -526,6 +591,10 @@ def group_exons(
     space_left = width
     for exon in exons:
         while exon:
+            if max_rows is not None and len(page) >= max_rows:
+                raise LayoutBudgetExceeded(page, f"more than {max_rows} rows")
+            if deadline is not None and time.monotonic() > deadline:
+                raise LayoutBudgetExceeded(page, "out of time")
             # If there is no space left
             if space_left < 1:
                 if not row:
@@ -573,6 +642,8 @@ def group_exons(
             if new_exon.coding.end_phase == 0:
                 space_left -= gap_offset
     page.append(row)
+    if max_rows is not None and len(page) > max_rows:
+        raise LayoutBudgetExceeded(page[:max_rows], f"more than {max_rows} rows")
     return page
 
 
@@ -583,25 +654,159 @@ def draw_exons(
     scale: float,
     gap: int,
     variant_shape: str,
+    max_rows: int | None = None,
+    deadline: float | None = None,
 ) -> list[Element]:
+    """Draw the exons, over multiple rows if needed
+
+    If the row or time budget is exceeded, only the rows that fit in the
+    budget are drawn, followed by a note that the figure was truncated
+    """
+    elements, _ = draw_rows(
+        exons, width, height, scale, gap, variant_shape, max_rows, deadline
+    )
+    return elements
+
+
+def draw_rows(
+    exons: list[Exon],
+    width: int,
+    height: int,
+    scale: float,
+    gap: int,
+    variant_shape: str,
+    max_rows: int | None = None,
+    deadline: float | None = None,
+) -> tuple[list[Element], str]:
+    """Draw the exons like draw_exons, and report if the figure was truncated
+
+    Returns the elements, and which budget was exceeded ('' if none)
+    """
     x: float = height
     y: float = height
-    elements = list()
-    # The exons will be modified by grouping them, so we make a copy here
-    tmp_exons = copy.deepcopy(exons)
-
-    for row in group_exons(tmp_exons, width=width, height=height, scale=scale, gap=gap):
-        for exon in row:
-            elements += exon.draw(
-                height=height, scale=scale, x=x, y=y, variant_shape=variant_shape
+    elements: list[Element] = list()
+
+    truncated = ""
+    with metrics.stage("layout"):
+        # The exons will be modified by grouping them, so we make a copy here
+        tmp_exons = copy.deepcopy(exons)
+        try:
+            rows = group_exons(
+                tmp_exons,
+                width=width,
+                height=height,
+                scale=scale,
+                gap=gap,
+                max_rows=max_rows,
+                deadline=deadline,
             )
-            x += exon.draw_size(scale) + gap
-            if exon.coding.end_phase == 0:
-                x += height * 0.25
+        except LayoutBudgetExceeded as e:
+            rows = e.rows
+            truncated = str(e)
+
+    with metrics.stage("draw"):
+        for row in rows:
+            if deadline is not None and time.monotonic() > deadline:
+                truncated = "out of time"
+                break
+            for exon in row:
+                elements += exon.draw(
+                    height=height, scale=scale, x=x, y=y, variant_shape=variant_shape
+                )
+                x += exon.draw_size(scale) + gap
+                if exon.coding.end_phase == 0:
+                    x += height * 0.25
+
+            y += 2 * height
+            x = height
+
+    if truncated:
+        log.warning(f"Figure truncated: {truncated}")
+        elements.append(
+            Text(x=x, y=y, text=f"Figure truncated ({truncated})", class_=["legend"])
+        )
+    return elements, truncated
 
-        y += 2 * height
-        x = height
-    return elements
+
+def count_elements(exons: Sequence[Exon], variant_shape: str) -> int:
+    """Estimate the number of SVG elements needed to draw the exons"""
+    per_variant = 2 if variant_shape == "pin" else 1
+    return sum(2 + bool(e.name) + per_variant * len(e.variants) for e in exons)
+
+
+def merge_small_exons(exons: Sequence[Exon], scale: float) -> list[Exon]:
+    """Merge adjacent non coding exons which are drawn smaller than a pixel
+
+    Returns new Exons, the original exons are not modified
+    """
+    merged: list[Exon] = list()
+    for exon in exons:
+        previous = merged[-1] if merged else None
+        small = not exon.coding and exon.draw_size(scale) < 1
+        if small and previous and not previous.coding and previous.draw_size(scale) < 1:
+            variants = [
+                replace(v, position=v.position + previous.size) for v in exon.variants
+            ]
+            previous.size += exon.size
+            previous.variants = list(previous.variants) + variants
+        else:
+            merged.append(
+                Exon(
+                    size=exon.size,
+                    coding=replace(exon.coding),
+                    variants=[replace(v) for v in exon.variants],
+                    name=exon.name,
+                    color=exon.color,
+                )
+            )
+    return merged
+
+
+def aggregate_variants(exons: Sequence[Exon], scale: float, bucket: float) -> None:
+    """Replace the variants of each exon that are drawn within the same bucket
+    of pixels by a single variant, which is named after the number of variants
+    """
+    for exon in exons:
+        groups: dict[int, list[Variant]] = dict()
+        for variant in exon.variants:
+            key = int(variant.position * scale // bucket)
+            groups.setdefault(key, list()).append(variant)
+        exon.variants = [
+            (
+                group[0]
+                if len(group) == 1
+                else Variant(
+                    group[0].position, f"{len(group)} variants", group[0].color
+                )
+            )
+            for group in groups.values()
+        ]
+
+
+def simplify_exons(
+    exons: Sequence[Exon],
+    scale: float,
+    width: int,
+    variant_shape: str,
+    max_elements: int,
+) -> list[Exon]:
+    """Simplify the exons until they can be drawn with at most max_elements
+
+    Non coding exons smaller than a pixel are merged, and variants that are
+    close together are aggregated, with an increasing distance. The original
+    exons are not modified.
+    """
+    simplified = merge_small_exons(exons, scale)
+    # Every pass aggregates the original variants, so the aggregated variants
+    # are named after the number of variants they contain
+    variants = [exon.variants for exon in simplified]
+    bucket = 1.0
+    while count_elements(simplified, variant_shape) > max_elements and bucket < width:
+        for exon, original in zip(simplified, variants):
+            exon.variants = original
+        aggregate_variants(simplified, scale, bucket)
+        bucket *= 2
+    return simplified
 
 
 def parse_coding_region(exon_dict: dict[Any, Any]) -> None:
@@ -674,6 +879,71 @@ def exons_from_tsv(fin: TextIOWrapper) -> list[Exon]:
     return exons
 
 
+def _check_size(data: bytes, offset: int, size: int) -> None:
+    """Raise an error if data does not contain size bytes from offset"""
+    if offset + size > len(data):
+        raise ValueError(
+            f"Truncated ExonViz binary data: expected {offset + size} bytes, "
+            f"got {len(data)}"
+        )
+
+
+def _unpack_exon(data: bytes, offset: int) -> tuple[Exon, int]:
+    """Unpack the exon at offset, returns the exon and the offset after it"""
+    _check_size(data, offset, _EXON.size)
+    size, start, end, start_phase, end_phase, nvariants, nname, ncolor = (
+        _EXON.unpack_from(data, offset)
+    )
+    offset += _EXON.size
+    _check_size(data, offset, nname + ncolor)
+    name = data[offset : offset + nname].decode()
+    offset += nname
+    color = data[offset : offset + ncolor].decode()
+    offset += ncolor
+
+    variants = list()
+    for _ in range(nvariants):
+        _check_size(data, offset, _VARIANT.size)
+        position, nname, ncolor = _VARIANT.unpack_from(data, offset)
+        offset += _VARIANT.size
+        _check_size(data, offset, nname + ncolor)
+        variant_name = data[offset : offset + nname].decode()
+        offset += nname
+        variant_color = data[offset : offset + ncolor].decode()
+        offset += ncolor
+        variants.append(Variant(position, variant_name, variant_color))
+
+    coding = Coding(start, end, start_phase, end_phase)
+    return Exon(size, coding, variants, name, color), offset
+
+
+def exons_to_bytes(exons: Sequence[Exon]) -> bytes:
+    """Dump a list of exons in the compact binary format"""
+    header = _HEADER.pack(_MAGIC, _VERSION, len(exons))
+    return header + b"".join(exon.to_bytes() for exon in exons)
+
+
+def exons_from_bytes(data: bytes) -> list[Exon]:
+    """Load a list of exons from the compact binary format"""
+    if len(data) < _HEADER.size:
+        raise ValueError("Not an ExonViz binary file")
+    magic, version, count = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("Not an ExonViz binary file")
+    if version != _VERSION:
+        raise ValueError(f"Unsupported ExonViz binary version {version}")
+
+    exons = list()
+    offset = _HEADER.size
+    _check_size(data, offset, count * _EXON.size)
+    for _ in range(count):
+        exon, offset = _unpack_exon(data, offset)
+        exons.append(exon)
+    if offset != len(data):
+        raise ValueError("Unexpected data after the exons")
+    return exons
+
+
 @no_type_check
 def element_xy(element: Element) -> tuple[float, float]:
     """Determine the furthest x,y coordinates for various svg objects"""
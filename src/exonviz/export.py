@@ -0,0 +1,170 @@
+"""
+Export the exons and variants of many transcripts to a single Parquet file
+
+Every row of the file is an exon, with the variants in the exon as a nested
+list column. The exons are built concurrently by the batch module, and
+written in record batches, so the whole MANE set can be exported without
+keeping it in memory.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from typing import Any, Iterable, Iterator
+
+from . import batch, service
+from .cli import get_MANE, make_option_parser
+from .draw import _config
+
+log = logging.getLogger(__name__)
+
+# Number of exons in every record batch
+BATCH_SIZE = 10000
+
+COLUMNS = [
+    "description",
+    "transcript",
+    "exon",
+    "size",
+    "name",
+    "color",
+    "coding_start",
+    "coding_end",
+    "start_phase",
+    "end_phase",
+    "variants",
+]
+
+
+def _schema() -> Any:
+    import pyarrow as pa
+
+    variant = pa.struct(
+        [("position", pa.int32()), ("name", pa.string()), ("color", pa.string())]
+    )
+    return pa.schema(
+        [
+            ("description", pa.string()),
+            ("transcript", pa.string()),
+            ("exon", pa.int32()),
+            ("size", pa.int32()),
+            ("name", pa.string()),
+            ("color", pa.string()),
+            ("coding_start", pa.int32()),
+            ("coding_end", pa.int32()),
+            ("start_phase", pa.int8()),
+            ("end_phase", pa.int8()),
+            ("variants", pa.list_(variant)),
+        ]
+    )
+
+
+def exon_columns(
+    results: Iterable[dict[str, Any]], batch_size: int = BATCH_SIZE
+) -> Iterator[dict[str, list[Any]]]:
+    """Convert the results of batch.build_many to columns of batch_size exons
+
+    Results with an error are skipped
+    """
+    columns: dict[str, list[Any]] = {column: list() for column in COLUMNS}
+    rows = 0
+    for result in results:
+        if result["error"] is not None:
+            log.warning(f"Unable to export {result['description']}: {result['error']}")
+            continue
+        for number, exon in enumerate(result["exons"], 1):
+            columns["description"].append(result["description"])
+            columns["transcript"].append(result["transcript"])
+            columns["exon"].append(number)
+            columns["size"].append(exon.size)
+            columns["name"].append(exon.name)
+            columns["color"].append(exon.color)
+            columns["coding_start"].append(exon.coding.start)
+            columns["coding_end"].append(exon.coding.end)
+            columns["start_phase"].append(exon.coding.start_phase)
+            columns["end_phase"].append(exon.coding.end_phase)
+            columns["variants"].append(
+                [
+                    {"position": v.position, "name": v.name, "color": v.color}
+                    for v in exon.variants
+                ]
+            )
+            rows += 1
+        if rows >= batch_size:
+            yield columns
+            columns = {column: list() for column in COLUMNS}
+            rows = 0
+    if rows:
+        yield columns
+
+
+def write_parquet(
+    fname: str, results: Iterable[dict[str, Any]], batch_size: int = BATCH_SIZE
+) -> int:
+    """Write the results of batch.build_many to a Parquet file
+
+    Returns the number of exons that were written
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ModuleNotFoundError:
+        raise ModuleNotFoundError(
+            "Missing modules, please install with 'pip install exonviz[parquet]'"
+        )
+
+    schema = _schema()
+    total = 0
+    with pq.ParquetWriter(fname, schema) as writer:
+        for columns in exon_columns(results, batch_size):
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            total += len(columns["exon"])
+    return total
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="exonviz export",
+        description="Export the exons and variants of many transcripts to Parquet",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        parents=[make_option_parser()],
+    )
+    parser.add_argument("output", help="Parquet file to write")
+    parser.add_argument(
+        "descriptions",
+        nargs="*",
+        help="Descriptions or genes to export (default: all MANE genes)",
+    )
+    parser.add_argument("--description-list", help="File with one description per line")
+    parser.add_argument(
+        "--workers", type=int, default=8, help="Number of transcripts to fetch at once"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=BATCH_SIZE, help="Exons per record batch"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("EXONVIZ_CACHE_DIR"),
+        help="Cache directory for the Mutalyzer results (default: $EXONVIZ_CACHE_DIR)",
+    )
+    args = parser.parse_args(argv)
+
+    config = dict()
+    for key, *_ in _config:
+        config[key] = getattr(args, key)
+
+    if args.cache_dir:
+        service.set_cache_dir(args.cache_dir)
+
+    MANE = get_MANE()
+    descriptions = list(args.descriptions)
+    if args.description_list:
+        with open(args.description_list) as fin:
+            descriptions += [line.strip() for line in fin if line.strip()]
+    if not descriptions:
+        descriptions = list(MANE)
+
+    results = batch.build_many(descriptions, config, MANE, workers=args.workers)
+    total = write_parquet(args.output, results, args.batch_size)
+    print(f"Exported {total} exons to {args.output}", file=sys.stderr)
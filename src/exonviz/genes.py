@@ -0,0 +1,37 @@
+"""
+Prefix index over the gene names in MANE, for autocompletion
+"""
+
+import bisect
+
+
+class GeneIndex:
+    """Sorted index of gene names, for case-insensitive prefix searches
+
+    :param MANE: Dictionary of gene names to MANE Select transcripts
+    """
+
+    def __init__(self, MANE: dict[str, str]) -> None:
+        entries = sorted((gene.upper(), gene, tx) for gene, tx in MANE.items())
+        self.keys = [key for key, _, _ in entries]
+        self.genes = [(gene, tx) for _, gene, tx in entries]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, prefix: str, limit: int = 10) -> list[tuple[str, str]]:
+        """Find up to limit genes that start with prefix
+
+        Returns a list of (gene, transcript) tuples, sorted by gene name
+        """
+        key = prefix.upper()
+        if not key:
+            return list()
+        found: list[tuple[str, str]] = list()
+        index = bisect.bisect_left(self.keys, key)
+        while index < len(self.keys) and len(found) < limit:
+            if not self.keys[index].startswith(key):
+                break
+            found.append(self.genes[index])
+            index += 1
+        return found
@@ -0,0 +1,177 @@
+"""
+Render expensive figures in the background
+
+Jobs are rendered in a pool of worker processes, and the result is stored in
+the figure cache. If a cache directory is configured, the job records are
+stored there as well, so every worker of the website can report on them.
+Figures that were truncated by a render budget are not stored in the figure
+cache, so they are stored in the job record instead.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from . import service
+from .mutalyzer import variants_from_hgvs
+
+# Number of finished jobs to remember in memory
+MAX_JOBS = 1000
+
+
+@dataclass()
+class Job:
+    """A figure which is rendered in the background
+
+    :param id: Identifier of the job, the same figure always gets the same id
+    :param hgvs: HGVS description of the figure
+    :param config: ExonViz configuration dictionary
+    :param status: One of 'queued', 'running', 'done' or 'failed'
+    :param truncated: The figure was truncated by a render budget
+    """
+
+    id: str
+    hgvs: str
+    config: dict[str, Any]
+    status: str = "queued"
+    figure: str | None = None
+    dropped: list[str] = field(default_factory=list)
+    error: str | None = None
+    truncated: bool = False
+
+    def to_dict(self) -> dict[str, Any]:
+        """The job record, without the figure"""
+        return {
+            "id": self.id,
+            "hgvs": self.hgvs,
+            "config": self.config,
+            "status": self.status,
+            "dropped": self.dropped,
+            "error": self.error,
+            "truncated": self.truncated,
+        }
+
+
+def job_id(hgvs: str, config: dict[str, Any]) -> str:
+    """Determine the job id for a figure"""
+    key = json.dumps([hgvs, config], sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def estimate_cost(hgvs: str, payload: dict[str, Any], config: dict[str, Any]) -> float:
+    """Estimate how expensive it is to render a figure
+
+    The estimate is the number of exons and variants, plus the number of rows
+    the figure will span, since every row splits an exon
+    """
+    exons = payload["exon"]["g"]
+    if config["noncoding"]:
+        size = sum(abs(int(end) - int(start)) + 1 for start, end in exons)
+    else:
+        start, end = payload["cds"]["g"][0]
+        size = abs(int(end) - int(start)) + 1
+    rows: float = size * config["scale"] / config["width"]
+    return len(exons) + len(variants_from_hgvs(hgvs)) + rows
+
+
+class JobQueue:
+    """Queue of figures which are rendered in the background
+
+    :param processes: Number of processes used to render the figures. Use 0
+                      to render the figures in a background thread
+    """
+
+    def __init__(self, processes: int = 2) -> None:
+        self.processes = processes
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self.lock = threading.Lock()
+        # Fetching the payload happens in a thread, rendering in a process
+        self.threads = ThreadPoolExecutor(max_workers=max(processes, 1))
+        self.executor: Executor | None = None
+
+    def shutdown(self) -> None:
+        self.threads.shutdown()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def submit(self, hgvs: str, config: dict[str, Any]) -> Job:
+        """Add a figure to the queue, if it is not already queued"""
+        id_ = job_id(hgvs, config)
+        with self.lock:
+            job = self.jobs.get(id_)
+            if job is not None and job.status != "failed":
+                return job
+            job = Job(id_, hgvs, config)
+            self.jobs[id_] = job
+            while len(self.jobs) > MAX_JOBS:
+                self.jobs.popitem(last=False)
+        self._store(job)
+        self.threads.submit(self._run, job)
+        return job
+
+    def get(self, id_: str) -> Job | None:
+        """Get the job with the specified id
+
+        Jobs that were submitted by another process are looked up in the job
+        cache, their figure is taken from the figure cache once it is done.
+        If the figure is no longer in the cache, the job has failed and can be
+        submitted again
+        """
+        with self.lock:
+            job = self.jobs.get(id_)
+        if job is not None:
+            return job
+
+        record = service.job_cache.get(id_) if service.job_cache else None
+        if record is None:
+            return None
+        job = Job(**json.loads(record))
+        if job.figure is not None:
+            return job
+        cached = service.get_figure(job.hgvs, job.config)
+        if cached is not None:
+            job.status = "done"
+            job.figure, job.dropped = cached
+        elif job.status == "done":
+            job.status = "failed"
+            job.error = "The figure is no longer in the cache"
+        return job
+
+    def _store(self, job: Job) -> None:
+        if service.job_cache is not None:
+            record = job.to_dict()
+            if job.truncated:
+                record["figure"] = job.figure
+            service.job_cache.put(job.id, json.dumps(record).encode())
+
+    def _run(self, job: Job) -> None:
+        job.status = "running"
+        try:
+            payload = service.fetch_payload(job.hgvs)
+            if self.processes:
+                with self.lock:
+                    if self.executor is None:
+                        self.executor = ProcessPoolExecutor(self.processes)
+                future = self.executor.submit(
+                    service.render_payload, job.hgvs, payload, job.config
+                )
+                figure, dropped, truncated = future.result()
+            else:
+                figure, dropped, truncated = service.render_payload(
+                    job.hgvs, payload, job.config
+                )
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        else:
+            if not truncated:
+                service.put_figure(job.hgvs, job.config, figure, dropped)
+            job.figure = figure
+            job.dropped = dropped
+            job.truncated = truncated
+            job.status = "done"
+        self._store(job)
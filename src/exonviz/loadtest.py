@@ -0,0 +1,389 @@
+"""
+Load test the ExonViz website, and report the throughput and latency
+
+The website is started locally, with Mutalyzer replaced by the stub server
+from the testing module, so the results do not depend on mutalyzer.nl:
+
+    exonviz stub record fixtures/ "NM_003002.4:c.=" "ENST00000375549.8:c.="
+    exonviz loadtest --fixtures fixtures/ --requests 1000 --concurrency 8
+
+Every request is picked from a mix of transcripts, drawing configurations and
+endpoints ('draw' for GET /draw, 'post' for the form on /). The mix is a file
+with one JSON object per line:
+
+    {"endpoint": "draw", "transcript": "SDHD", "weight": 3}
+    {"endpoint": "post", "transcript": "NM_003002.4:c.274G>T",
+     "config": {"exonnumber": false, "scale": 2.0}}
+
+Use --url to load test a website that is already running, for example behind
+a production WSGI server.
+"""
+
+import argparse
+import contextlib
+import http.cookiejar
+import json
+import os
+import queue
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+from urllib.error import HTTPError, URLError
+
+from .service import web_config
+from .testing import replay
+
+ENDPOINTS = ["draw", "post"]
+
+# Command to start the website, {port} is replaced by a free port
+WEBSITE = (
+    f"{shlex.quote(sys.executable)} -m flask --app exonviz.app run --port {{port}}"
+)
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+@dataclass()
+class Request:
+    """A request in the mix
+
+    :param endpoint: 'draw' for GET /draw, 'post' for POST /
+    :param transcript: Transcript, HGVS description or gene to draw
+    :param config: Drawing options which differ from the website defaults
+    :param weight: How often this request is picked, relative to the others
+    """
+
+    endpoint: str
+    transcript: str
+    config: dict[str, Any] = field(default_factory=dict)
+    weight: float = 1.0
+
+    def __post_init__(self) -> None:
+        if self.endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{self.endpoint}'")
+        for key in self.config:
+            if key not in web_config:
+                raise ValueError(f"Unknown configuration option '{key}'")
+
+
+@dataclass()
+class Result:
+    """The outcome of a single request
+
+    :param latency: Seconds until the full response was received
+    :param status: HTTP status code, or 0 if there was no response
+    """
+
+    endpoint: str
+    latency: float
+    status: int
+    error: str | None = None
+
+
+def read_mix(fin: Iterable[str]) -> list[Request]:
+    """Read the mix of requests, one JSON object per line"""
+    mix = list()
+    for line in fin:
+        if line.strip():
+            mix.append(Request(**json.loads(line)))
+    if not mix:
+        raise ValueError("The mix does not contain any requests")
+    return mix
+
+
+def default_mix(fixtures: str | Path) -> list[Request]:
+    """Draw every recorded transcript, using both endpoints"""
+    transcripts = list()
+    for path in sorted(Path(fixtures).glob("*.json")):
+        fixture = json.loads(path.read_text())
+        if fixture["status"] == 200:
+            transcripts.append(fixture["transcript"])
+    if not transcripts:
+        raise ValueError(f"No fixtures found in {fixtures}")
+    return [Request(endpoint, t) for t in transcripts for endpoint in ENDPOINTS]
+
+
+def plan(mix: list[Request], requests: int, seed: int | None = None) -> list[Request]:
+    """Pick the requests to send from the mix, using the weights"""
+    rng = random.Random(seed)
+    return rng.choices(mix, weights=[r.weight for r in mix], k=requests)
+
+
+def query(request: Request) -> str:
+    """The query string for GET /draw"""
+    args: list[tuple[str, Any]] = [("transcript", request.transcript)]
+    for key, value in (web_config | request.config).items():
+        if isinstance(value, list):
+            args += [(key, item) for item in value]
+        else:
+            args.append((key, value))
+    return urllib.parse.urlencode(args)
+
+
+def form(request: Request) -> bytes:
+    """The form data for POST /, in the same way as the browser sends it"""
+    values: list[tuple[str, Any]] = [("transcript", request.transcript)]
+    for key, value in (web_config | request.config).items():
+        if isinstance(value, list):
+            values.append((key, " ".join(value)))
+        elif isinstance(value, bool):
+            # Checkboxes are only sent when they are checked
+            if value:
+                values.append((key, "on"))
+        else:
+            values.append((key, value))
+    return urllib.parse.urlencode(values).encode()
+
+
+class Client:
+    """A visitor of the website, with its own session cookie
+
+    :param url: Base URL of the website
+    :param timeout: Seconds to wait for a response
+    """
+
+    def __init__(self, url: str, timeout: float = 60) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+        self.session = False
+
+    def _open(self, url: str, data: bytes | None = None) -> bytes:
+        with self.opener.open(url, data, self.timeout) as response:
+            body: bytes = response.read()
+            return body
+
+    def send(self, request: Request) -> Result:
+        """Send the request, and measure how long it takes"""
+        if request.endpoint == "post" and not self.session:
+            # The form needs the defaults that are stored in the session
+            self._open(f"{self.url}/")
+            self.session = True
+
+        start = time.perf_counter()
+        try:
+            if request.endpoint == "draw":
+                body = self._open(f"{self.url}/draw?{query(request)}")
+            else:
+                body = self._open(f"{self.url}/", form(request))
+        except HTTPError as e:
+            e.read()
+            latency = time.perf_counter() - start
+            return Result(request.endpoint, latency, e.code, f"HTTP error {e.code}")
+        except (URLError, OSError) as e:
+            latency = time.perf_counter() - start
+            return Result(request.endpoint, latency, 0, str(e))
+        latency = time.perf_counter() - start
+
+        # The form reports errors on the page, instead of with the status code
+        if request.endpoint == "post" and b"<svg" not in body:
+            return Result(request.endpoint, latency, 200, "No figure on the page")
+        return Result(request.endpoint, latency, 200)
+
+
+def run(
+    url: str, requests: list[Request], concurrency: int = 1
+) -> tuple[list[Result], float]:
+    """Send the requests with concurrency clients
+
+    Returns the results, and the number of seconds it took
+    """
+    todo: queue.SimpleQueue[Request] = queue.SimpleQueue()
+    for request in requests:
+        todo.put(request)
+    results: list[Result] = list()
+
+    def visitor() -> None:
+        client = Client(url)
+        while True:
+            try:
+                request = todo.get_nowait()
+            except queue.Empty:
+                return
+            results.append(client.send(request))
+
+    threads = [threading.Thread(target=visitor) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def percentile(values: list[float], p: float) -> float:
+    """The p-th percentile of values, using the nearest rank
+
+    >>> percentile([4, 1, 3, 2], 50)
+    2
+    >>> percentile([4, 1, 3, 2], 99)
+    4
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarise(results: list[Result], elapsed: float) -> dict[str, Any]:
+    """Throughput and latency for every endpoint, and for all requests"""
+    summary = dict()
+    groups = {"all": results}
+    for endpoint in ENDPOINTS:
+        groups[endpoint] = [r for r in results if r.endpoint == endpoint]
+
+    for name, group in groups.items():
+        if not group:
+            continue
+        latencies = [r.latency for r in group]
+        summary[name] = {
+            "requests": len(group),
+            "errors": sum(r.error is not None for r in group),
+            "throughput": len(group) / elapsed,
+            "mean": sum(latencies) / len(latencies),
+            "max": max(latencies),
+        } | {f"p{p}": percentile(latencies, p) for p in PERCENTILES}
+    return summary
+
+
+def table(summary: dict[str, Any]) -> str:
+    """The summary as a table, with the latencies in milliseconds"""
+    columns = ["mean"] + [f"p{p}" for p in PERCENTILES] + ["max"]
+    header = f"{'endpoint':<9} {'requests':>8} {'errors':>6} {'req/s':>8}"
+    lines = [header + "".join(f" {c + ' (ms)':>10}" for c in columns)]
+    for name, values in summary.items():
+        line = (
+            f"{name:<9} {values['requests']:>8} {values['errors']:>6} "
+            f"{values['throughput']:>8.1f}"
+        )
+        lines.append(line + "".join(f" {values[c] * 1000:>10.1f}" for c in columns))
+    return "\n".join(lines)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def wait_for(url: str, process: subprocess.Popen[bytes], timeout: float) -> None:
+    """Wait until the website at url answers"""
+    deadline = time.monotonic() + timeout
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"The website exited with code {process.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except (URLError, OSError):
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"The website did not start within {timeout}s")
+            time.sleep(0.1)
+
+
+@contextlib.contextmanager
+def start_website(
+    mutalyzer_url: str, command: str = WEBSITE, timeout: float = 30
+) -> Iterator[str]:
+    """Start the website in a separate process, and yield its URL
+
+    The website uses the Mutalyzer API at mutalyzer_url
+    """
+    port = free_port()
+    env = os.environ | {"EXONVIZ_MUTALYZER_URL": mutalyzer_url}
+    process = subprocess.Popen(
+        shlex.split(command.format(port=port)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for(f"{url}/", process, timeout)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="exonviz loadtest",
+        description="Load test the ExonViz website",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument(
+        "--fixtures", help="Start the website locally, with the stub for these fixtures"
+    )
+    target.add_argument("--url", help="Load test the website that runs at this URL")
+    parser.add_argument(
+        "--mix", help="File with the requests to send (default: every fixture)"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=200, help="Number of requests to send"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Number of simultaneous clients"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=0, help="Requests to send before measuring"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the mix")
+    parser.add_argument(
+        "--command",
+        default=WEBSITE,
+        help="Command to start the website, {port} is replaced by the port",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds of latency of the stub"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of stub errors"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    if args.mix:
+        with open(args.mix) as fin:
+            mix = read_mix(fin)
+    elif args.fixtures:
+        mix = default_mix(args.fixtures)
+    else:
+        parser.error("--mix is required with --url")
+    requests = plan(mix, args.warmup + args.requests, args.seed)
+
+    with contextlib.ExitStack() as stack:
+        upstream = None
+        url = args.url
+        if args.fixtures:
+            upstream = stack.enter_context(
+                replay(args.fixtures, args.latency, args.error_rate)
+            )
+            url = stack.enter_context(start_website(upstream.url, args.command))
+
+        run(url, requests[: args.warmup], args.concurrency)
+        before = len(upstream.requests) if upstream else 0
+        results, elapsed = run(url, requests[args.warmup :], args.concurrency)
+        summary = summarise(results, elapsed)
+        if upstream:
+            # Requests that were not answered from the caches of the website
+            summary["upstream_requests"] = len(upstream.requests) - before
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(table({k: v for k, v in summary.items() if isinstance(v, dict)}))
+    if "upstream_requests" in summary:
+        print(f"Mutalyzer requests: {summary['upstream_requests']}")
@@ -0,0 +1,157 @@
+"""
+Precomputed exon models for the MANE Select transcripts
+
+The exon and CDS ranges of every MANE Select transcript are stored in a
+single file, so the most common request, a gene name, can be drawn without
+calling Mutalyzer. The file is generated with data/extract_mane.py.
+
+The transcripts are sorted, and stored in blocks which are compressed
+separately. The index at the start of the file holds the first transcript of
+every block, so a lookup only decompresses a single block.
+"""
+
+import bisect
+import importlib.resources
+import itertools
+import logging
+import struct
+import zlib
+from functools import lru_cache
+from typing import Any, BinaryIO, Iterable, Iterator
+
+Payload = dict[str, Any]
+
+log = logging.getLogger(__name__)
+
+# Magic, version and number of blocks
+_HEADER = struct.Struct("<4sBI")
+# Offset and size of a block, followed by the first transcript in the block
+_ENTRY = struct.Struct("<IIB")
+MAGIC = b"EXVM"
+VERSION = 1
+
+# Number of transcripts in a block
+BLOCK_SIZE = 128
+
+
+def format_model(transcript: str, payload: Payload) -> str:
+    """Format the payload of a transcript as a single line
+
+    Every exon position is stored as the difference with the previous
+    position, and the CDS relative to the first position, which compresses
+    well
+
+    >>> exons = [["1001", "1087"], ["1188", "1304"]]
+    >>> format_model("NM_1.1", {"exon": {"g": exons}, "cds": {"g": [["1036", "1250"]]}})
+    'NM_1.1\\t1001,86,101,116\\t35,249'
+    """
+    positions = [int(pos) for exon in payload["exon"]["g"] for pos in exon]
+    deltas = [positions[0]] + [b - a for a, b in zip(positions, positions[1:])]
+    cds = [int(pos) - positions[0] for pos in payload["cds"]["g"][0]]
+    return f"{transcript}\t{','.join(map(str, deltas))}\t{cds[0]},{cds[1]}"
+
+
+def parse_model(line: str) -> tuple[str, Payload]:
+    """Parse a line made by format_model
+
+    >>> transcript, payload = parse_model("NM_1.1\\t1001,86,101,116\\t35,249")
+    >>> payload["exon"]["g"], payload["cds"]["g"]
+    ([['1001', '1087'], ['1188', '1304']], [['1036', '1250']])
+    """
+    transcript, deltas, cds = line.split("\t")
+    positions = list(itertools.accumulate(int(delta) for delta in deltas.split(",")))
+    exons = [
+        [str(start), str(end)] for start, end in zip(positions[::2], positions[1::2])
+    ]
+    cds_start, cds_end = (str(int(pos) + positions[0]) for pos in cds.split(","))
+    payload = {"exon": {"g": exons}, "cds": {"g": [[cds_start, cds_end]]}}
+    return transcript, payload
+
+
+def write_models(
+    fout: BinaryIO, models: Iterable[tuple[str, Payload]], block_size: int = BLOCK_SIZE
+) -> int:
+    """Write the exon models to fout, returns the number of transcripts"""
+    lines = sorted(format_model(transcript, payload) for transcript, payload in models)
+    blocks = [lines[i : i + block_size] for i in range(0, len(lines), block_size)]
+
+    index = list()
+    data = list()
+    offset = 0
+    for block in blocks:
+        compressed = zlib.compress("\n".join(block).encode(), 9)
+        first = block[0].split("\t")[0].encode()
+        index.append(_ENTRY.pack(offset, len(compressed), len(first)) + first)
+        data.append(compressed)
+        offset += len(compressed)
+
+    fout.write(_HEADER.pack(MAGIC, VERSION, len(blocks)))
+    fout.write(b"".join(index))
+    fout.write(b"".join(data))
+    return len(lines)
+
+
+class ModelFile:
+    """Look up the exon models in a file made by write_models
+
+    :param data: The contents of the file
+    """
+
+    def __init__(self, data: bytes) -> None:
+        try:
+            magic, version, nblocks = _HEADER.unpack_from(data)
+        except struct.error:
+            raise ValueError("Not an exon model file")
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not an exon model file, or an unsupported version")
+
+        self.data = data
+        self.first: list[str] = list()
+        self.blocks: list[tuple[int, int]] = list()
+        pos = _HEADER.size
+        for _ in range(nblocks):
+            offset, size, length = _ENTRY.unpack_from(data, pos)
+            pos += _ENTRY.size
+            self.first.append(data[pos : pos + length].decode())
+            self.blocks.append((offset, size))
+            pos += length
+        # The blocks start after the index
+        self.start = pos
+        self._block = lru_cache(maxsize=32)(self._read_block)
+
+    def _read_block(self, number: int) -> dict[str, str]:
+        offset, size = self.blocks[number]
+        start = self.start + offset
+        lines = zlib.decompress(self.data[start : start + size]).decode()
+        return {line.split("\t", 1)[0]: line for line in lines.split("\n")}
+
+    def __len__(self) -> int:
+        return sum(len(self._block(n)) for n in range(len(self.blocks)))
+
+    def __iter__(self) -> Iterator[str]:
+        for number in range(len(self.blocks)):
+            yield from self._block(number)
+
+    def get(self, transcript: str) -> Payload | None:
+        """The payload for transcript, or None if it is not in the file"""
+        number = bisect.bisect_right(self.first, transcript) - 1
+        if number < 0:
+            return None
+        line = self._block(number).get(transcript)
+        return parse_model(line)[1] if line is not None else None
+
+
+@lru_cache(maxsize=1)
+def bundled_models() -> ModelFile | None:
+    """The exon models that are shipped with ExonViz, if they are installed
+
+    A warning is logged (once) when they are not installed
+    """
+    path = importlib.resources.files("exonviz") / "data" / "mane_exons.dat"
+    if not path.is_file():
+        log.warning(
+            "The MANE Select exon models are not installed, "
+            "see src/exonviz/data/README.md to generate them"
+        )
+        return None
+    return ModelFile(path.read_bytes())
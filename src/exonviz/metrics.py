@@ -0,0 +1,249 @@
+"""
+Metrics for the ExonViz website, in the Prometheus text format
+
+The metrics are kept per process. Updating a metric only takes a lock and a
+few additions, so it is cheap enough to do for every request.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from types import TracebackType
+from typing import Iterator, Protocol
+
+# Upper bounds of the buckets for the stage durations, in seconds
+BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+Labels = tuple[str, ...]
+
+
+def _format_labels(names: Labels, values: Labels) -> str:
+    if not names:
+        return ""
+    pairs = (f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """A value that only goes up
+
+    :param name: Name of the metric
+    :param description: Description of the metric
+    :param labels: Names of the labels of the metric
+    """
+
+    def __init__(self, name: str, description: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values: dict[Labels, float] = dict()
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Increase the counter for the specified label values"""
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        """Render the counter in the Prometheus text format"""
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(
+                    f"{self.name}{_format_labels(self.labels, labels)} {value}"
+                )
+        return lines
+
+
+class Histogram:
+    """Distribution of observed values, such as durations
+
+    :param name: Name of the metric
+    :param description: Description of the metric
+    :param labels: Names of the labels of the metric
+    :param buckets: Upper bounds of the buckets
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = BUCKETS,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # Per label values: count per bucket (the last bucket is +Inf), and sum
+        self.counts: dict[Labels, list[int]] = dict()
+        self.sums: dict[Labels, float] = dict()
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Add an observation for the specified label values"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            if labels not in self.counts:
+                self.counts[labels] = [0] * (len(self.buckets) + 1)
+                self.sums[labels] = 0.0
+            self.counts[labels][index] += 1
+            self.sums[labels] += value
+
+    def render(self) -> list[str]:
+        """Render the histogram in the Prometheus text format"""
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        names = self.labels + ("le",)
+        with self.lock:
+            for labels, counts in sorted(self.counts.items()):
+                total = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    total += count
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    label_str = _format_labels(names, labels + (le,))
+                    lines.append(f"{self.name}_bucket{label_str} {total}")
+                label_str = _format_labels(self.labels, labels)
+                lines.append(f"{self.name}_sum{label_str} {self.sums[labels]}")
+                lines.append(f"{self.name}_count{label_str} {total}")
+        return lines
+
+
+REGISTRY: list[Counter | Histogram] = list()
+
+
+def render() -> str:
+    """Render all metrics in the Prometheus text format"""
+    lines = list()
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+STAGES = Histogram(
+    "exonviz_stage_duration_seconds",
+    "Time spent in each stage of rendering a figure",
+    labels=("stage",),
+)
+CACHE = Counter(
+    "exonviz_cache_requests_total",
+    "Cache lookups by cache and result",
+    labels=("cache", "result"),
+)
+DROPPED_VARIANTS = Counter(
+    "exonviz_dropped_variants_total",
+    "Variants which were dropped because they fall outside the exons",
+)
+UPSTREAM_ERRORS = Counter(
+    "exonviz_upstream_errors_total", "Failed requests to mutalyzer"
+)
+SOURCE_REQUESTS = Counter(
+    "exonviz_source_requests_total",
+    "Transcript lookups by source and result",
+    labels=("source", "result"),
+)
+
+
+class Observer(Protocol):
+    """Receives the start and end of every stage, see observe_stages"""
+
+    def start(self, name: str) -> None: ...
+
+    def stop(self, name: str, duration: float) -> None: ...
+
+
+# Observers of the stages in the current context
+_observers: contextvars.ContextVar[tuple[Observer, ...]] = contextvars.ContextVar(
+    "observers", default=()
+)
+
+
+@contextlib.contextmanager
+def observe_stages(observer: Observer) -> Iterator[None]:
+    """Send the start and end of every stage within the context to observer"""
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield
+    finally:
+        _observers.reset(token)
+
+
+class _Timings(dict[str, float]):
+    """Total duration of every stage"""
+
+    def start(self, name: str) -> None:
+        pass
+
+    def stop(self, name: str, duration: float) -> None:
+        self[name] = self.get(name, 0.0) + duration
+
+
+@contextlib.contextmanager
+def record_stages() -> Iterator[dict[str, float]]:
+    """Record the total duration of every stage within the context
+
+    >>> with record_stages() as timings:
+    ...     with stage("parse"):
+    ...         pass
+    >>> list(timings)
+    ['parse']
+    """
+    timings = _Timings()
+    with observe_stages(timings):
+        yield timings
+
+
+class stage:
+    """Context manager which records the duration of a stage
+
+    The stages are 'mane' (gene name lookup), 'parse' (HGVS parsing), 'fetch'
+    (calls to mutalyzer), 'build' (build_exons), 'layout' (copying the exons
+    and group_exons),
+    'draw' (drawing the exons) and 'serialise' (converting to SVG)
+    """
+
+    __slots__ = ("name", "start", "observers")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.observers = _observers.get()
+        for observer in self.observers:
+            observer.start(self.name)
+        self.start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        duration = time.perf_counter() - self.start
+        STAGES.observe(duration, self.name)
+        for observer in self.observers:
+            observer.stop(self.name, duration)
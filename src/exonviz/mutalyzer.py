@@ -1,4 +1,8 @@
 from typing import Any, cast
+import bisect
+from collections import OrderedDict
+import os
+import threading
 import urllib.request
 from urllib.error import HTTPError
 import json
@@ -10,11 +14,33 @@ from .range import intersect
 
 import logging
 
-logging.basicConfig()
 log = logging.getLogger(__name__)
 
 Range = tuple[int, int]
 
+# Base URL of the Mutalyzer API, set EXONVIZ_MUTALYZER_URL to use another
+# instance, such as the stub server from exonviz.testing
+MUTALYZER_URL = os.environ.get("EXONVIZ_MUTALYZER_URL", "https://mutalyzer.nl/api")
+
+
+class MutalyzerError(RuntimeError):
+    """An error response from Mutalyzer
+
+    :param status: HTTP status code of the response
+    """
+
+    def __init__(self, message: str, status: int) -> None:
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def permanent(self) -> bool:
+        """Is the request itself wrong, so it will fail again
+
+        Server errors, timeouts and rate limiting are temporary
+        """
+        return self.status < 500 and self.status not in (408, 429)
+
 
 def parse_error_payload(error: HTTPError) -> str:
     """Parse HTTPError payload from mutalyzer"""
@@ -26,22 +52,25 @@ def parse_error_payload(error: HTTPError) -> str:
     return msg if msg else str(error)
 
 
-def fetch_exons(transcript: str) -> dict[str, Any]:
-    """Fetch transcript information from mutalyzer"""
+def fetch_exons(transcript: str, base_url: str | None = None) -> dict[str, Any]:
+    """Fetch transcript information from mutalyzer
 
-    url = f"https://mutalyzer.nl/api/normalize/{transcript}"
+    :param base_url: Base URL of the Mutalyzer API (default: MUTALYZER_URL)
+    """
+
+    url = f"{base_url or MUTALYZER_URL}/normalize/{transcript}"
 
     try:
         response = urllib.request.urlopen(url)
     except HTTPError as e:
         msg = parse_error_payload(e)
-        raise RuntimeError(msg)
+        raise MutalyzerError(msg, e.code)
     else:
         js = json.loads(response.read())
 
     if "selector_short" not in js:
         msg = f"No exons found for {transcript} (is it a genomic variant?)"
-        raise RuntimeError(msg)
+        raise MutalyzerError(msg, response.status)
     selector: dict[str, Any] = js["selector_short"]
     return selector
 
@@ -114,35 +143,105 @@ def exon_variants(
     return vars
 
 
-def exons_to_ranges(exons: list[list[str]], cds: list[str]) -> list[tuple[int, int]]:
-    """Convert mutalyzer exons to python ranges, for both strands"""
+def transcript_positions(exons: list[list[str]], positions: list[str]) -> list[int]:
+    """Convert genomic positions to 1-based positions on the transcript
+
+    The transcript is the exons without the introns, for both strands. All
+    positions are converted with a single crossmapper.
+    """
     reverse = is_reverse(exons[0][0], exons[0][1])
 
     x = mutalyzer_crossmapper.NonCoding(convert_exon_positions(exons), reverse)
     g = mutalyzer_crossmapper.Genomic()
 
-    output_exons = list()
-    for exon in exons:
-        e_start = (
-            x.coordinate_to_noncoding(g.genomic_to_coordinate(int(exon[0])))[0] - 1
-        )
-        e_end = x.coordinate_to_noncoding(g.genomic_to_coordinate(int(exon[1])))[0]
-        output_exons.append((e_start, e_end))
+    return [
+        x.coordinate_to_noncoding(g.genomic_to_coordinate(int(pos)))[0]
+        for pos in positions
+    ]
 
-    return output_exons
+
+def exons_to_ranges(exons: list[list[str]], cds: list[str]) -> list[tuple[int, int]]:
+    """Convert mutalyzer exons to python ranges, for both strands"""
+    positions = transcript_positions(exons, [pos for exon in exons for pos in exon])
+    return [(start - 1, end) for start, end in zip(positions[::2], positions[1::2])]
 
 
 def cds_to_ranges(exons: list[list[str]], cds: list[str]) -> tuple[int, int]:
     """Convert mutalyzer exons to python ranges, for both strands"""
-    reverse = is_reverse(cds[0], cds[1])
+    cds_start, cds_end = transcript_positions(exons, cds)
+    return (cds_start - 1, cds_end)
 
-    x = mutalyzer_crossmapper.NonCoding(convert_exon_positions(exons), reverse)
-    g = mutalyzer_crossmapper.Genomic()
 
-    cds_start = x.coordinate_to_noncoding(g.genomic_to_coordinate(int(cds[0])))[0] - 1
-    cds_end = x.coordinate_to_noncoding(g.genomic_to_coordinate(int(cds[1])))[0]
+class TranscriptModel:
+    """The exons and coding region of a transcript, from a Mutalyzer payload
+
+    All exon and CDS boundaries are converted to ranges on the transcript
+    without introns when the model is made, and a single crossmapper is used
+    for all variants. Use transcript_model to reuse the model for every
+    description on the same transcript.
+
+    :param payload: The 'selector_short' payload from Mutalyzer
+    """
+
+    def __init__(self, payload: dict[str, Any]) -> None:
+        # Copies, so changes to the payload do not affect the model
+        self.genomic_exons = [list(exon) for exon in payload["exon"]["g"]]
+        self.genomic_cds = list(payload["cds"]["g"][0])
+        self.reverse = is_reverse(*self.genomic_exons[0])
+
+        boundaries = [pos for exon in self.genomic_exons for pos in exon]
+        positions = transcript_positions(
+            self.genomic_exons, boundaries + self.genomic_cds
+        )
+        self.exons = [
+            (start - 1, end) for start, end in zip(positions[:-2:2], positions[1:-2:2])
+        ]
+        self.cds = (positions[-2] - 1, positions[-1])
+        self.crossmap = mutalyzer_crossmapper.Coding(self.exons, self.cds)
+
+    def matches(self, payload: dict[str, Any]) -> bool:
+        """Was the model made from payload"""
+        return bool(
+            payload["exon"]["g"] == self.genomic_exons
+            and payload["cds"]["g"][0] == self.genomic_cds
+        )
+
+    def position(self, variant: str) -> int | None:
+        """The position of a variant in c. format on the transcript
+
+        Returns None for intronic variants, which are not supported
+        """
+        t = cdot_to_tuple(variant)
+        if t[1]:
+            return None
+        return int(self.crossmap.coding_to_coordinate(t))
+
 
-    return (cds_start, cds_end)
+# The models of recently drawn transcripts, see transcript_model
+_models: OrderedDict[str, TranscriptModel] = OrderedDict()
+_models_lock = threading.Lock()
+MAX_MODELS = 1024
+
+
+def transcript_model(transcript: str, payload: dict[str, Any]) -> TranscriptModel:
+    """The (cached) model of a transcript, made from payload
+
+    The cache is keyed on the transcript, so the model is reused when the
+    same transcript is drawn with different variants. If the payload for the
+    transcript differs from the cached model, a new model is made.
+    """
+    with _models_lock:
+        model = _models.get(transcript)
+        if model is not None and model.matches(payload):
+            _models.move_to_end(transcript)
+            return model
+
+    model = TranscriptModel(payload)
+    with _models_lock:
+        _models[transcript] = model
+        if len(_models) > MAX_MODELS:
+            _models.popitem(last=False)
+    return model
 
 
 def variants_from_hgvs(hgvs: str) -> list[str]:
@@ -165,42 +264,66 @@ def build_exons(
     mutalyzer: dict[str, Any],
     config: dict[str, Any],
 ) -> tuple[list[Exon], list[str]]:
-    """Build Exons from the mutalyzer payload"""
+    """Build Exons from the mutalyzer payload
+
+    Only the exons from firstexon to lastexon are built, but the exon names,
+    phases and variant colors are the same as when drawing all exons
+    """
     Exons: list[Exon] = list()
 
-    exons = mutalyzer["exon"]["g"]
-    cds = mutalyzer["cds"]["g"][0]
     coordinate_system = transcript_to_coordinate(hgvs)
 
     variants = variants_from_hgvs(hgvs)
 
     # Convert to ranges
-    exon_ranges = exons_to_ranges(exons, cds)
-    cds_ranges = cds_to_ranges(exons, cds)
+    model = transcript_model(hgvs.strip(" ").split(":")[0], mutalyzer)
+    exon_ranges = model.exons
+    cds_ranges = model.cds
+
+    # Determine the exons that are part of the specified exon range
+    first_exon = max(0, config["firstexon"] - 1)
+    last_exon = min(config["lastexon"], len(exon_ranges))
+
+    # Map every variant to the exon it falls in, intronic variants are skipped
+    starts = [start for start, _ in exon_ranges]
+    exon_vars: list[list[tuple[int, str]]] = [list() for _ in exon_ranges]
+    for var in variants:
+        position = model.position(var)
+        if position is None:
+            continue
+        i = bisect.bisect_right(starts, position) - 1
+        if i >= 0 and position < exon_ranges[i][1]:
+            exon_vars[i].append((position, var))
 
     start_phase = 0
 
-    # Used for the exon name
-    index = 0
     # Used for picking the variant color
     color_index = 0
     colors = config["variantcolors"]
 
-    for exon in exon_ranges:
+    for index, exon in enumerate(exon_ranges[:last_exon]):
+        # Determine the coding region for this exon
+        coding = make_coding(exon, cds_ranges, start_phase)
+        # Set the start phase for the next exon
+        start_phase = coding.end_phase
+
+        # Exons before the range only count towards the phase and colors
+        if index < first_exon:
+            color_index += len(exon_vars[index])
+            continue
+
         # Determine the name of this exon
-        index += 1
-        name = f"{index}" if config["exonnumber"] else ""
+        name = f"{index + 1}" if config["exonnumber"] else ""
 
         # Determine the start and end for this exon
         e_start, e_end = exon
-        # Determine the coding region for this exon
-        coding = make_coding(exon, cds_ranges, start_phase)
-        # Determine the variants for this exon
-        vars = exon_variants(exon_ranges, cds_ranges, exon, variants, coordinate_system)
-        # Set the variant colors
-        for var in vars:
-            i = color_index % len(colors)
-            var.color = colors[i]
+        # Determine the variants for this exon, and set the variant colors
+        vars = list()
+        for position, var in exon_vars[index]:
+            color = colors[color_index % len(colors)]
+            vars.append(
+                Variant(position - e_start, f"{coordinate_system}.{var}", color)
+            )
             color_index += 1
         # Determine the size for this exon
         e_size = e_end - e_start
@@ -209,33 +332,13 @@ def build_exons(
 
         E = Exon(size=e_size, coding=coding, variants=vars, name=name, color=color)
 
-        # Set the start phase for the next exon
-        start_phase = coding.end_phase
-
         if not config["noncoding"]:
             E.remove_noncoding()
         Exons.append(E)
 
-    # Remove exons that are not part of the specified exon range
-    first_exon = max(0, config["firstexon"] - 1)
-    last_exon = min(config["lastexon"], len(Exons))
-    Exons = Exons[first_exon:last_exon]
-
-    # Variants that ended up in the exons
-    exon_vars = list()
-    for e in Exons:
-        for v in e.variants:
-            # Remember to cut off the c. or r.
-            exon_vars.append(v.name[2:])
-
-    # Determine which variants have been dropped
-    dropped = list()
-
-    hgvs_variants = variants_from_hgvs(hgvs)
-
-    for variant in hgvs_variants:
-        if variant not in exon_vars:
-            dropped.append(variant)
+    # Determine which variants have been dropped, in a single pass
+    drawn = {v.name for e in Exons for v in e.variants}
+    dropped = [var for var in variants if f"{coordinate_system}.{var}" not in drawn]
 
     return Exons, dropped
 
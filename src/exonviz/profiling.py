@@ -0,0 +1,198 @@
+"""
+Profile where the time and memory of rendering a figure are spent
+
+The profiler uses the stages of the metrics module, so it reports on the same
+stages as the /metrics endpoint of the website:
+
+    with profile() as profiler:
+        exons = make_exons("SDHD", config)
+        str(draw_exons(exons, config))
+    print(profiler.table())
+"""
+
+import contextlib
+import cProfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator
+
+from . import metrics
+
+
+@dataclass()
+class StageProfile:
+    """Time spent in a stage
+
+    :param calls: Number of times the stage was entered
+    :param wall: Wall clock time in seconds
+    :param cpu: CPU time of the thread in seconds
+    """
+
+    calls: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+
+
+class Profiler:
+    """Record the wall and CPU time of every stage
+
+    :param cprofile_stage: Also run cProfile during this stage (e.g. 'layout')
+    """
+
+    def __init__(self, cprofile_stage: str | None = None) -> None:
+        self.stages: dict[str, StageProfile] = dict()
+        self.cprofile_stage = cprofile_stage
+        self.cprofile = cProfile.Profile() if cprofile_stage else None
+        # CPU time at the start of the stages that are running
+        self._cpu: dict[str, list[float]] = dict()
+
+    def start(self, name: str) -> None:
+        self._cpu.setdefault(name, list()).append(time.thread_time())
+        if self.cprofile is not None and name == self.cprofile_stage:
+            self.cprofile.enable()
+
+    def stop(self, name: str, duration: float) -> None:
+        if self.cprofile is not None and name == self.cprofile_stage:
+            self.cprofile.disable()
+        cpu = time.thread_time() - self._cpu[name].pop()
+        stage = self.stages.setdefault(name, StageProfile())
+        stage.calls += 1
+        stage.wall += duration
+        stage.cpu += cpu
+
+    def to_dict(self) -> dict[str, Any]:
+        """The profile of every stage, in the order they were first entered"""
+        return {name: asdict(stage) for name, stage in self.stages.items()}
+
+    def table(self) -> str:
+        """The profile of every stage as a table"""
+        lines = [f"{'stage':<10} {'calls':>6} {'wall (ms)':>10} {'cpu (ms)':>10}"]
+        for name, stage in self.stages.items():
+            lines.append(
+                f"{name:<10} {stage.calls:>6} "
+                f"{stage.wall * 1000:>10.2f} {stage.cpu * 1000:>10.2f}"
+            )
+        total_wall = sum(stage.wall for stage in self.stages.values())
+        total_cpu = sum(stage.cpu for stage in self.stages.values())
+        lines.append(
+            f"{'total':<10} {'':>6} {total_wall * 1000:>10.2f} {total_cpu * 1000:>10.2f}"
+        )
+        return "\n".join(lines)
+
+    def dump_stats(self, fname: str) -> None:
+        """Write the cProfile statistics, which can be read with pstats"""
+        if self.cprofile is None:
+            raise RuntimeError("No stage was profiled with cProfile")
+        self.cprofile.dump_stats(fname)
+
+
+@contextlib.contextmanager
+def profile(cprofile_stage: str | None = None) -> Iterator[Profiler]:
+    """Profile the stages within the context"""
+    profiler = Profiler(cprofile_stage)
+    with metrics.observe_stages(profiler):
+        yield profiler
+
+
+@dataclass()
+class StageMemory:
+    """Memory allocated in a stage
+
+    :param calls: Number of times the stage was entered
+    :param peak: Highest memory use during the stage, in bytes above the
+                 memory use at the start of the stage
+    :param retained: Memory still in use at the end of the stage, in bytes
+    :param sites: Source lines which retained the most memory, with the bytes
+    """
+
+    calls: int = 0
+    peak: int = 0
+    retained: int = 0
+    sites: list[tuple[str, int]] = field(default_factory=list)
+
+
+# Do not report the memory used by tracemalloc itself
+_IGNORE = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+class MemoryProfiler:
+    """Record the peak and retained memory of every stage using tracemalloc
+
+    :param top: Number of allocation sites to report for every stage
+    """
+
+    def __init__(self, top: int = 5) -> None:
+        self.stages: dict[str, StageMemory] = dict()
+        self.top = top
+        # Stages that are running: name, memory use at the start, highest
+        # memory use so far and a snapshot
+        self._running: list[tuple[str, int, list[int], tracemalloc.Snapshot]] = list()
+
+    def _update_peaks(self) -> None:
+        """Store the current peak for the running stages, and reset it"""
+        _, peak = tracemalloc.get_traced_memory()
+        for _, _, highest, _ in self._running:
+            highest[0] = max(highest[0], peak)
+        tracemalloc.reset_peak()
+
+    def start(self, name: str) -> None:
+        # Take the snapshot first, so it does not count towards the peak
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORE)
+        self._update_peaks()
+        current, _ = tracemalloc.get_traced_memory()
+        self._running.append((name, current, [current], snapshot))
+
+    def stop(self, name: str, duration: float) -> None:
+        self._update_peaks()
+        name, start, highest, before = self._running.pop()
+        current, _ = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces(_IGNORE)
+
+        stage = self.stages.setdefault(name, StageMemory())
+        stage.calls += 1
+        stage.peak = max(stage.peak, highest[0] - start)
+        stage.retained += current - start
+        sites = dict(stage.sites)
+        for diff in after.compare_to(before, "lineno"):
+            if diff.size_diff > 0:
+                frame = diff.traceback[0]
+                site = f"{frame.filename}:{frame.lineno}"
+                sites[site] = sites.get(site, 0) + diff.size_diff
+        top = sorted(sites.items(), key=lambda item: item[1], reverse=True)
+        stage.sites = top[: self.top]
+
+    def to_dict(self) -> dict[str, Any]:
+        """The memory of every stage, in the order they were first entered"""
+        return {name: asdict(stage) for name, stage in self.stages.items()}
+
+    def table(self) -> str:
+        """The memory of every stage as a table, with the top allocation sites"""
+        lines = [f"{'stage':<10} {'calls':>6} {'peak (kB)':>10} {'retained (kB)':>14}"]
+        for name, stage in self.stages.items():
+            lines.append(
+                f"{name:<10} {stage.calls:>6} "
+                f"{stage.peak / 1024:>10.1f} {stage.retained / 1024:>14.1f}"
+            )
+            for site, size in stage.sites:
+                lines.append(f"    {size / 1024:>10.1f} kB  {site}")
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def memprofile(top: int = 5, frames: int = 1) -> Iterator[MemoryProfiler]:
+    """Profile the memory of the stages within the context
+
+    Tracing the memory allocations makes the code within the context several
+    times slower
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start(frames)
+    profiler = MemoryProfiler(top)
+    try:
+        with metrics.observe_stages(profiler):
+            yield profiler
+    finally:
+        if not tracing:
+            tracemalloc.stop()
@@ -0,0 +1,46 @@
+"""
+Read and write recorded Mutalyzer responses
+
+Every response is stored as a JSON fixture in a directory, with the
+transcript, the HTTP status and the body of the response. The fixtures are
+made with 'exonviz stub record', and used by the stub server in
+exonviz.testing and by the 'fixtures' transcript source.
+"""
+
+import json
+import urllib.parse
+from pathlib import Path
+from typing import Any
+
+
+def fixture_path(directory: str | Path, transcript: str) -> Path:
+    """The file which holds the fixture for transcript"""
+    return Path(directory) / (urllib.parse.quote(transcript, safe="") + ".json")
+
+
+def save_fixture(
+    directory: str | Path, transcript: str, body: Any, status: int = 200
+) -> Path:
+    """Store a Mutalyzer response as a fixture"""
+    path = fixture_path(directory, transcript)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fixture = {"transcript": transcript, "status": status, "body": body}
+    path.write_text(json.dumps(fixture, indent=2) + "\n")
+    return path
+
+
+def load_fixture(directory: str | Path, transcript: str) -> dict[str, Any] | None:
+    """Load the fixture for transcript, if it was recorded"""
+    path = fixture_path(directory, transcript)
+    if not path.exists():
+        return None
+    fixture: dict[str, Any] = json.loads(path.read_text())
+    return fixture
+
+
+def fixtures(directory: str | Path) -> list[str]:
+    """The transcripts that were recorded in directory"""
+    transcripts = list()
+    for path in sorted(Path(directory).glob("*.json")):
+        transcripts.append(json.loads(path.read_text())["transcript"])
+    return transcripts
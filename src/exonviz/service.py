@@ -0,0 +1,395 @@
+"""
+Functions shared by the ExonViz web applications
+
+This module does not depend on any web framework, so it can be used by both
+the Flask and the ASGI application.
+"""
+
+import copy
+import gc
+import importlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Mapping
+
+from . import metrics, mutalyzer, sources
+from .cache import DiskCache
+from .cli import check_input, get_MANE, trim_variants
+from .draw import draw_figure, config as default_config
+from .exon import Exon
+
+log = logging.getLogger(__name__)
+
+
+def _budget(key: str) -> int | float:
+    """The render budget from the environment, or the default budget"""
+    default = default_config[key]
+    assert isinstance(default, (int, float))
+    return type(default)(os.environ.get(f"EXONVIZ_{key.upper()}", default))
+
+
+# The render budgets of the website (EXONVIZ_MAXELEMENTS, EXONVIZ_MAXROWS and
+# EXONVIZ_MAXTIME). Requests can lower these budgets, but not raise them
+budgets = {key: _budget(key) for key in ["maxelements", "maxrows", "maxtime"]}
+
+# The default configuration for the website
+web_config = (
+    default_config
+    | {
+        "width": 1024,
+        "firstexon": 1,
+        "lastexon": 1000,
+        "exonnumber": True,
+    }
+    | budgets
+)
+
+# Mutalyzer payloads which have been used most recently by this process
+MAX_PAYLOADS = 1024
+_payloads: OrderedDict[str, dict[str, Any]] = OrderedDict()
+_payloads_lock = threading.Lock()
+# Payloads which are being fetched, so concurrent requests for the same
+# transcript only fetch it once
+_inflight: dict[str, Future[dict[str, Any]]] = dict()
+_inflight_lock = threading.Lock()
+
+# Seconds to remember that mutalyzer rejected a transcript, so the same bad
+# input is not sent again (EXONVIZ_ERROR_TTL, 0 to disable)
+ERROR_TTL = float(os.environ.get("EXONVIZ_ERROR_TTL", "600"))
+MAX_ERRORS = 10000
+# Transcripts rejected by mutalyzer, with the time the error expires, the
+# message and the status code
+_errors: dict[str, tuple[float, str, int]] = dict()
+
+# Caches for the mutalyzer payloads, rendered figures and background jobs, see
+# set_cache_dir
+payload_cache: DiskCache | None = None
+figure_cache: DiskCache | None = None
+job_cache: DiskCache | None = None
+
+
+def set_cache_dir(directory: str | Path | None) -> None:
+    """Store the mutalyzer payloads, rendered figures and jobs in directory
+
+    If directory is None, payloads are only cached in memory, and figures
+    are not cached at all
+    """
+    global payload_cache, figure_cache, job_cache
+    if directory is None:
+        payload_cache = None
+        figure_cache = None
+        job_cache = None
+    else:
+        payload_cache = DiskCache(Path(directory) / "payloads")
+        figure_cache = DiskCache(Path(directory) / "figures")
+        job_cache = DiskCache(Path(directory) / "jobs")
+    _payloads.clear()
+    _errors.clear()
+
+
+def rewrite_transcript(transcript: str, MANE: dict[str, str]) -> str:
+    """Rewrite the transcript, if needed"""
+    with metrics.stage("mane"):
+        transcript = MANE.get(transcript, transcript)
+    with metrics.stage("parse"):
+        return check_input(transcript)
+
+
+def _remember_error(no_variants: str, error: mutalyzer.MutalyzerError) -> None:
+    """Remember that mutalyzer rejected no_variants, for ERROR_TTL seconds"""
+    if ERROR_TTL <= 0 or not error.permanent:
+        return
+    _errors.pop(no_variants, None)
+    if len(_errors) >= MAX_ERRORS:
+        # Forget the oldest error
+        _errors.pop(next(iter(_errors)), None)
+    _errors[no_variants] = (time.monotonic() + ERROR_TTL, str(error), error.status)
+
+
+def _check_errors(no_variants: str) -> None:
+    """Raise the error if mutalyzer recently rejected no_variants"""
+    if ERROR_TTL <= 0:
+        return
+    rejected = _errors.get(no_variants)
+    if rejected is None or time.monotonic() >= rejected[0]:
+        metrics.CACHE.inc("upstream_error", "miss")
+        _errors.pop(no_variants, None)
+        return
+    _, message, status = rejected
+    metrics.CACHE.inc("upstream_error", "hit")
+    raise mutalyzer.MutalyzerError(message, status)
+
+
+def _get_payload(no_variants: str) -> dict[str, Any] | None:
+    """Get a payload from the memory cache"""
+    with _payloads_lock:
+        payload = _payloads.get(no_variants)
+        if payload is not None:
+            _payloads.move_to_end(no_variants)
+        return payload
+
+
+def _put_payload(no_variants: str, payload: dict[str, Any]) -> None:
+    """Store a payload in the memory cache, which holds MAX_PAYLOADS payloads"""
+    with _payloads_lock:
+        _payloads[no_variants] = payload
+        _payloads.move_to_end(no_variants)
+        while len(_payloads) > MAX_PAYLOADS:
+            _payloads.popitem(last=False)
+
+
+def _fetch_exons(no_variants: str) -> dict[str, Any]:
+    """Wrapper to cache calls to mutalyzer
+
+    Concurrent calls for the same transcript wait for a single fetch.
+    Permanent errors from mutalyzer are cached as well, for ERROR_TTL seconds
+    """
+    payload = _get_payload(no_variants)
+    if payload is not None:
+        metrics.CACHE.inc("payload_memory", "hit")
+        return payload
+    metrics.CACHE.inc("payload_memory", "miss")
+
+    with _inflight_lock:
+        # The payload may have been fetched since the check above
+        payload = _get_payload(no_variants)
+        if payload is not None:
+            return payload
+        future = _inflight.get(no_variants)
+        fetching = future is None
+        if future is None:
+            future = _inflight[no_variants] = Future()
+    if not fetching:
+        metrics.CACHE.inc("payload_inflight", "hit")
+        return future.result()
+
+    try:
+        payload = _load_exons(no_variants)
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(payload)
+        return payload
+    finally:
+        with _inflight_lock:
+            del _inflight[no_variants]
+
+
+def _load_exons(no_variants: str) -> dict[str, Any]:
+    """Load the payload from the disk cache or the transcript sources"""
+    _check_errors(no_variants)
+
+    cached = payload_cache.get(no_variants) if payload_cache is not None else None
+    if cached is not None:
+        metrics.CACHE.inc("payload_disk", "hit")
+        payload: dict[str, Any] = json.loads(cached)
+    else:
+        if payload_cache is not None:
+            metrics.CACHE.inc("payload_disk", "miss")
+        log.info(f"Fetching {no_variants}")
+        try:
+            with metrics.stage("fetch"):
+                payload = sources.fetch_exons(no_variants)
+        except Exception as e:
+            metrics.UPSTREAM_ERRORS.inc()
+            if isinstance(e, mutalyzer.MutalyzerError):
+                _remember_error(no_variants, e)
+            raise
+        if payload_cache is not None:
+            payload_cache.put(no_variants, json.dumps(payload).encode())
+
+    _put_payload(no_variants, payload)
+    return payload
+
+
+def payload_cached(hgvs: str) -> bool:
+    """Determine if the mutalyzer payload for hgvs is in the cache"""
+    no_variants = trim_variants(hgvs)
+    return payload_cache is not None and no_variants in payload_cache
+
+
+def fetch_payload(hgvs: str) -> dict[str, Any]:
+    """Fetch the (cached) mutalyzer payload for an HGVS description
+
+    The cache is keyed on the transcript without variants, so different
+    variants on the same transcript share a single call to mutalyzer.
+    A copy is returned, so the caller is free to modify the payload.
+    """
+    return copy.deepcopy(_fetch_exons(trim_variants(hgvs)))
+
+
+def build(hgvs: str, config: dict[str, Any]) -> tuple[list[Exon], list[str]]:
+    """Build the exons for hgvs, using the payload cache
+
+    Returns the exons and the list of dropped variants
+    """
+    payload = fetch_payload(hgvs)
+    with metrics.stage("build"):
+        return mutalyzer.build_exons(hgvs, payload, config)
+
+
+def render_payload(
+    hgvs: str, payload: dict[str, Any], config: dict[str, Any]
+) -> tuple[str, list[str], bool]:
+    """Render the figure for hgvs from a mutalyzer payload
+
+    Returns the figure as an SVG string, the list of dropped variants and if
+    the figure was truncated by the row or time budget. Truncated figures
+    should not be cached. This function only uses its arguments, so it can
+    be run in a separate process.
+    """
+    with metrics.stage("build"):
+        exons, dropped_variants = mutalyzer.build_exons(hgvs, payload, config)
+    metrics.DROPPED_VARIANTS.inc(amount=len(dropped_variants))
+    drawing, truncated = draw_figure(exons, config)
+    with metrics.stage("serialise"):
+        figure = str(drawing)
+    return figure, dropped_variants, bool(truncated)
+
+
+def _figure_key(hgvs: str, config: dict[str, Any]) -> str:
+    return json.dumps([hgvs, config], sort_keys=True)
+
+
+def get_figure(hgvs: str, config: dict[str, Any]) -> tuple[str, list[str]] | None:
+    """Get the rendered figure and dropped variants from the cache"""
+    if figure_cache is None:
+        return None
+    cached = figure_cache.get(_figure_key(hgvs, config))
+    if cached is None:
+        metrics.CACHE.inc("figure", "miss")
+        return None
+    metrics.CACHE.inc("figure", "hit")
+    figure, dropped_variants = json.loads(cached)
+    return figure, dropped_variants
+
+
+def put_figure(
+    hgvs: str, config: dict[str, Any], figure: str, dropped_variants: list[str]
+) -> None:
+    """Store the rendered figure and dropped variants in the cache"""
+    if figure_cache is not None:
+        value = json.dumps([figure, dropped_variants]).encode()
+        figure_cache.put(_figure_key(hgvs, config), value)
+
+
+def render(hgvs: str, config: dict[str, Any]) -> tuple[str, list[str]]:
+    """Render the figure for hgvs, using the caches where possible
+
+    Returns the figure as an SVG string, and the list of dropped variants.
+    """
+    cached = get_figure(hgvs, config)
+    if cached is not None:
+        return cached
+    figure, dropped_variants, truncated = render_payload(
+        hgvs, fetch_payload(hgvs), config
+    )
+    if not truncated:
+        put_figure(hgvs, config, figure, dropped_variants)
+    return figure, dropped_variants
+
+
+def secure_filename(fname: str) -> str:
+    """Replace the characters that are not safe to use in a file name"""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", fname)
+
+
+def limit_budgets(figure_config: dict[str, Any]) -> dict[str, Any]:
+    """Make sure the configuration does not exceed the render budgets
+
+    >>> limit_budgets(web_config | {"maxrows": 10**9})["maxrows"]
+    1000
+    >>> limit_budgets(web_config | {"maxtime": float("nan")})["maxtime"]
+    10.0
+    """
+    # The budget goes first, so min returns it if the value is NaN
+    return figure_config | {
+        key: min(budget, figure_config[key]) for key, budget in budgets.items()
+    }
+
+
+def config_from_query(
+    args: Mapping[str, str], variantcolors: list[str]
+) -> dict[str, Any]:
+    """Create a drawing configuration from URL query arguments
+
+    Values are cast to the type of the default value, and missing values
+    are taken from the default configuration. The render budgets can only
+    be lowered
+    """
+    figure_config = default_config.copy()
+    for key, default in default_config.items():
+        if isinstance(default, list):
+            if variantcolors:
+                figure_config[key] = variantcolors
+        elif key not in args:
+            continue
+        elif isinstance(default, bool):
+            figure_config[key] = args[key] == "True"
+        elif isinstance(default, (int, float)):
+            figure_config[key] = type(default)(args[key])
+        else:
+            figure_config[key] = args[key]
+    return limit_budgets(figure_config)
+
+
+def config_from_json(
+    values: Mapping[str, Any], base: dict[str, Any] = web_config
+) -> dict[str, Any]:
+    """Create a drawing configuration from (JSON) values
+
+    Missing values are taken from base, and an error is raised for unknown
+    options or values of the wrong type. The render budgets can only be
+    lowered
+    """
+    figure_config = base.copy()
+    for key, value in values.items():
+        if key not in base:
+            raise ValueError(f"Unknown configuration option '{key}'")
+        default = base[key]
+        if isinstance(default, list):
+            if not isinstance(value, list):
+                raise ValueError(f"Configuration option '{key}' should be a list")
+            figure_config[key] = [str(item) for item in value]
+        elif isinstance(default, bool):
+            if not isinstance(value, bool):
+                raise ValueError(f"Configuration option '{key}' should be a boolean")
+            figure_config[key] = value
+        else:
+            figure_config[key] = type(default)(value)
+    return limit_budgets(figure_config)
+
+
+def preload() -> None:
+    """Load everything that is needed to render figures, and freeze the heap
+
+    Call this in the main process before forking workers (e.g. in the
+    on_starting hook of gunicorn). The workers then share the memory pages
+    with MANE, the compiled HGVS grammars and the imported modules, instead
+    of each loading their own copy on the first request.
+    """
+    get_MANE()
+    # Compile the HGVS grammars for full descriptions and single variants
+    check_input("NM_003002.4:c.[274G>T;300del]")
+    mutalyzer.cdot_to_tuple("274G>T")
+    # Set up the transcript sources, and read the exon models of the MANE
+    # Select transcripts if they are used
+    sources.get_source().preload()
+    # Modules which are only used by some requests
+    for module in ["exonviz.batch", "exonviz.genes", "exonviz.jobs"]:
+        importlib.import_module(module)
+    # Move everything to the permanent generation, so the garbage collector
+    # does not touch (and thereby copy) these pages in the workers
+    gc.collect()
+    gc.freeze()
+
+
+set_cache_dir(os.environ.get("EXONVIZ_CACHE_DIR"))
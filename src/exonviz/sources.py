@@ -0,0 +1,402 @@
+"""
+Sources for the exons of transcripts
+
+A source returns the payload for a transcript without variants, in the same
+shape as the 'selector_short' of Mutalyzer, which is used by build_exons:
+
+    {"exon": {"g": [["1", "87"], ...]}, "cds": {"g": [["36", "515"]]}}
+
+Sources return None for transcripts they do not know, so they can be chained
+to look up transcripts in fast local sources first, and only ask Mutalyzer
+for the rest. The chain is configured with EXONVIZ_SOURCES, for example:
+
+    EXONVIZ_SOURCES=mane,cached:db:/data/exons.sqlite,fixtures:/data/fixtures,mutalyzer
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable
+
+from . import metrics, mutalyzer
+from .cache import DiskCache
+from .mane import ModelFile, bundled_models
+from .recordings import fixtures, load_fixture
+
+log = logging.getLogger(__name__)
+
+Payload = dict[str, Any]
+
+
+class TranscriptSource:
+    """Where the exons of transcripts come from
+
+    Subclasses implement fetch, which returns None for unknown transcripts
+    """
+
+    name = "source"
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}()"
+
+    def fetch(self, transcript: str) -> Payload | None:
+        """Fetch the payload for a transcript without variants"""
+        raise NotImplementedError
+
+    def get(self, transcript: str) -> Payload:
+        """Fetch the payload for a transcript, and raise an error if unknown"""
+        payload = self.fetch(transcript)
+        if payload is None:
+            raise RuntimeError(f"Transcript {transcript} was not found in {self!r}")
+        return payload
+
+    def preload(self) -> None:
+        """Load everything the source needs up front, see service.preload"""
+
+
+class MutalyzerSource(TranscriptSource):
+    """Fetch the transcripts from the Mutalyzer API
+
+    Mutalyzer knows every transcript, so errors are raised instead of
+    returning None
+
+    :param base_url: Base URL of the Mutalyzer API (default: MUTALYZER_URL)
+    """
+
+    name = "mutalyzer"
+
+    def __init__(self, base_url: str | None = None) -> None:
+        self.base_url = base_url
+
+    def __repr__(self) -> str:
+        return f"MutalyzerSource({self.base_url!r})"
+
+    def fetch(self, transcript: str) -> Payload | None:
+        if self.base_url is None:
+            return mutalyzer.fetch_exons(transcript)
+        return mutalyzer.fetch_exons(transcript, base_url=self.base_url)
+
+
+class DatabaseSource(TranscriptSource):
+    """Look up the transcripts in a local SQLite database
+
+    :param path: Path of the database, which is created if it does not exist
+    """
+
+    name = "db"
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts"
+                " (transcript TEXT PRIMARY KEY, payload TEXT NOT NULL)"
+            )
+        db.close()
+
+    def __repr__(self) -> str:
+        return f"DatabaseSource({str(self.path)!r})"
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call, so the source can be used from every thread
+        # and forked process
+        return sqlite3.connect(self.path)
+
+    def fetch(self, transcript: str) -> Payload | None:
+        db = self._connect()
+        try:
+            row = db.execute(
+                "SELECT payload FROM transcripts WHERE transcript = ?", (transcript,)
+            ).fetchone()
+        finally:
+            db.close()
+        if row is None:
+            return None
+        payload: Payload = json.loads(row[0])
+        return payload
+
+    def add(self, transcripts: Iterable[tuple[str, Payload]]) -> None:
+        """Store the payloads of transcripts in the database"""
+        with self._connect() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?)",
+                ((t, json.dumps(payload)) for t, payload in transcripts),
+            )
+        db.close()
+
+
+class FixtureSource(TranscriptSource):
+    """Use the Mutalyzer responses recorded with 'exonviz stub record'
+
+    Recorded errors are treated as unknown transcripts
+
+    :param directory: Directory with the fixtures
+    """
+
+    name = "fixtures"
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def __repr__(self) -> str:
+        return f"FixtureSource({str(self.directory)!r})"
+
+    def fetch(self, transcript: str) -> Payload | None:
+        fixture = load_fixture(self.directory, transcript)
+        if fixture is None or fixture["status"] != 200:
+            return None
+        payload: Payload | None = fixture["body"].get("selector_short")
+        return payload
+
+
+class MemorySource(TranscriptSource):
+    """Transcripts that are kept in memory
+
+    :param payloads: The payload for every transcript
+    """
+
+    name = "memory"
+
+    def __init__(self, payloads: dict[str, Payload] | None = None) -> None:
+        self.payloads = dict(payloads) if payloads else dict()
+
+    def __repr__(self) -> str:
+        return f"MemorySource({len(self.payloads)} transcripts)"
+
+    def fetch(self, transcript: str) -> Payload | None:
+        return self.payloads.get(transcript)
+
+
+class CachedSource(TranscriptSource):
+    """Cache the payloads of a source in memory, and optionally on disk
+
+    Only payloads that were found are cached, so unknown transcripts are
+    looked up again the next time
+
+    :param source: The source to cache
+    :param cache: Also store the payloads in this disk cache
+    :param maxsize: Number of payloads to keep in memory
+    """
+
+    def __init__(
+        self,
+        source: TranscriptSource,
+        cache: DiskCache | None = None,
+        maxsize: int = 1024,
+    ) -> None:
+        self.source = source
+        self.name = source.name
+        self.cache = cache
+        self.maxsize = maxsize
+        self.memory: OrderedDict[str, Payload] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"CachedSource({self.source!r})"
+
+    def preload(self) -> None:
+        self.source.preload()
+
+    def fetch(self, transcript: str) -> Payload | None:
+        with self.lock:
+            if transcript in self.memory:
+                self.memory.move_to_end(transcript)
+                return self.memory[transcript]
+
+        payload: Payload | None = None
+        cached = self.cache.get(transcript) if self.cache is not None else None
+        if cached is not None:
+            payload = json.loads(cached)
+        else:
+            payload = self.source.fetch(transcript)
+            if payload is not None and self.cache is not None:
+                self.cache.put(transcript, json.dumps(payload).encode())
+
+        if payload is not None:
+            with self.lock:
+                self.memory[transcript] = payload
+                if len(self.memory) > self.maxsize:
+                    self.memory.popitem(last=False)
+        return payload
+
+
+class ManeSource(TranscriptSource):
+    """Use the precomputed exon models of the MANE Select transcripts
+
+    Only descriptions without variants of a MANE Select transcript, such as
+    'ENST00000375549.8:c.=', are found
+
+    :param path: File with the exon models (default: the bundled models)
+    """
+
+    name = "mane"
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self.path = Path(path) if path is not None else None
+        self._models: ModelFile | None = None
+
+    def __repr__(self) -> str:
+        return f"ManeSource({str(self.path) if self.path else None!r})"
+
+    @property
+    def models(self) -> ModelFile | None:
+        """The exon models, which are only read when they are first used"""
+        if self.path is None:
+            return bundled_models()
+        if self._models is None:
+            self._models = ModelFile(self.path.read_bytes())
+        return self._models
+
+    def preload(self) -> None:
+        """Read the exon models now, instead of on the first request"""
+        self.models
+
+    def fetch(self, transcript: str) -> Payload | None:
+        reference, _, variants = transcript.partition(":")
+        if variants not in ("c.=", "r.=", "n.="):
+            return None
+        models = self.models
+        return models.get(reference) if models is not None else None
+
+
+class SourceChain(TranscriptSource):
+    """Try every source in order, until one of them knows the transcript
+
+    :param sources: The sources to try
+    """
+
+    name = "chain"
+
+    def __init__(self, sources: list[TranscriptSource]) -> None:
+        self.sources = sources
+
+    def __repr__(self) -> str:
+        return f"SourceChain({self.sources!r})"
+
+    def preload(self) -> None:
+        for source in self.sources:
+            source.preload()
+
+    def fetch(self, transcript: str) -> Payload | None:
+        for source in self.sources:
+            payload = source.fetch(transcript)
+            if payload is not None:
+                metrics.SOURCE_REQUESTS.inc(source.name, "found")
+                log.debug(f"Found {transcript} in {source!r}")
+                return payload
+            metrics.SOURCE_REQUESTS.inc(source.name, "missing")
+        return None
+
+
+def _source_cache(spec: str) -> DiskCache | None:
+    """The disk cache for a source under EXONVIZ_CACHE_DIR, if it is set
+
+    Every source gets its own directory, since sources may not agree on the
+    exons of a transcript
+    """
+    directory = os.environ.get("EXONVIZ_CACHE_DIR")
+    if not directory:
+        return None
+    digest = hashlib.sha256(spec.encode()).hexdigest()[:16]
+    return DiskCache(Path(directory) / "sources" / digest)
+
+
+def parse_source(spec: str) -> TranscriptSource:
+    """Create a single source
+
+    The source is 'mane', 'mane:<path>', 'db:<path>', 'fixtures:<directory>',
+    'mutalyzer' or 'mutalyzer:<base url>'. Prefix it with 'cached:' to keep
+    the transcripts it found in memory, and on disk if EXONVIZ_CACHE_DIR is
+    set. A bare 'mane' uses the bundled exon models, and raises a ValueError
+    when they are not installed
+
+    >>> parse_source("cached:fixtures:tests/fixtures")
+    CachedSource(FixtureSource('tests/fixtures'))
+    """
+    kind, _, argument = spec.strip().partition(":")
+    if kind == "cached" and argument:
+        return CachedSource(parse_source(argument), _source_cache(argument))
+    elif kind == "mutalyzer":
+        return MutalyzerSource(argument or None)
+    elif kind == "mane" and argument:
+        return ManeSource(argument)
+    elif kind == "mane":
+        if bundled_models() is None:
+            raise ValueError(
+                "The bundled MANE Select exon models are not installed, "
+                "use 'mane:<path>'"
+            )
+        return ManeSource()
+    elif kind == "db" and argument:
+        return DatabaseSource(argument)
+    elif kind == "fixtures" and argument:
+        return FixtureSource(argument)
+    raise ValueError(f"Invalid transcript source '{spec}'")
+
+
+def parse_sources(spec: str) -> SourceChain:
+    """Create a chain of sources from a comma separated list, see parse_source
+
+    >>> parse_sources("fixtures:tests/fixtures,cached:mutalyzer")
+    SourceChain([FixtureSource('tests/fixtures'), CachedSource(MutalyzerSource(None))])
+    """
+    return SourceChain([parse_source(item) for item in spec.split(",")])
+
+
+# The sources that are used to fetch transcripts, see set_source
+_source: TranscriptSource | None = None
+
+
+def get_source() -> TranscriptSource:
+    """The source for transcripts, from EXONVIZ_SOURCES
+
+    By default, every transcript is fetched from Mutalyzer
+    """
+    global _source
+    if _source is None:
+        _source = parse_sources(os.environ.get("EXONVIZ_SOURCES", "mutalyzer"))
+    return _source
+
+
+def set_source(source: TranscriptSource | None) -> None:
+    """Use source to fetch transcripts, or EXONVIZ_SOURCES if source is None"""
+    global _source
+    _source = source
+
+
+def fetch_exons(transcript: str) -> Payload:
+    """Fetch the payload for a transcript without variants from the source"""
+    return get_source().get(transcript)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="exonviz make-db",
+        description="Store recorded Mutalyzer responses in a transcript database",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("database", help="SQLite database to create or update")
+    parser.add_argument(
+        "fixtures", nargs="+", help="Directories with fixtures from 'exonviz stub'"
+    )
+    args = parser.parse_args(argv)
+
+    db = DatabaseSource(args.database)
+    total = 0
+    for directory in args.fixtures:
+        source = FixtureSource(directory)
+        payloads = list()
+        for transcript in fixtures(directory):
+            payload = source.fetch(transcript)
+            if payload is not None:
+                payloads.append((transcript, payload))
+        db.add(payloads)
+        total += len(payloads)
+    print(f"Stored {total} transcripts in {args.database}", file=sys.stderr)
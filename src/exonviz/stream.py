@@ -0,0 +1,110 @@
+"""
+Render descriptions from stdin, and write one JSON record per line to stdout
+
+Every line of the input is either an HGVS description (or gene name), or a
+JSON object with a "description" and an optional "config" with drawing
+options for that description. Every description is written as soon as it has
+been rendered, so the memory use does not depend on the size of the input.
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import asdict
+from typing import Any, Iterable, TextIO
+
+from . import metrics, service
+from .cli import get_MANE, make_option_parser
+from .draw import _config
+from .exon import Exon
+
+
+def exon_to_dict(exon: Exon) -> dict[str, Any]:
+    """Convert an Exon to a dictionary that can be written as JSON"""
+    return {
+        "size": exon.size,
+        "name": exon.name,
+        "color": exon.color,
+        "coding": asdict(exon.coding),
+        "variants": [asdict(variant) for variant in exon.variants],
+    }
+
+
+def parse_line(line: str, config: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+    """Determine the description and drawing configuration for a line"""
+    if not line.startswith("{"):
+        return line, config
+    values = json.loads(line)
+    if not isinstance(values, dict) or "description" not in values:
+        raise ValueError("JSON input should be an object with a 'description'")
+    return values["description"], service.config_from_json(
+        values.get("config", dict()), base=config
+    )
+
+
+def process(
+    line: str, config: dict[str, Any], MANE: dict[str, str], exons: bool = False
+) -> dict[str, Any]:
+    """Render a single line of input, errors are reported in the record"""
+    record: dict[str, Any] = {
+        "description": line,
+        "transcript": None,
+        "dropped": list(),
+        "error": None,
+    }
+    start = time.perf_counter()
+    with metrics.record_stages() as timings:
+        try:
+            description, figure_config = parse_line(line, config)
+            record["description"] = description
+            record["transcript"] = service.rewrite_transcript(description, MANE)
+            if exons:
+                built, dropped = service.build(record["transcript"], figure_config)
+                record["exons"] = [exon_to_dict(exon) for exon in built]
+            else:
+                record["figure"], dropped = service.render(
+                    record["transcript"], figure_config
+                )
+            record["dropped"] = dropped
+        except Exception as e:
+            record["error"] = str(e)
+    record["timings"] = timings | {"total": time.perf_counter() - start}
+    return record
+
+
+def stream(
+    lines: Iterable[str],
+    fout: TextIO,
+    config: dict[str, Any],
+    MANE: dict[str, str],
+    exons: bool = False,
+) -> None:
+    """Process every line, and write the records to fout"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = process(line, config, MANE, exons)
+        print(json.dumps(record), file=fout, flush=True)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="exonviz stream",
+        description="Render descriptions from stdin, and write JSON lines to stdout",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        parents=[make_option_parser()],
+    )
+    parser.add_argument(
+        "--exons",
+        action="store_true",
+        help="Write the exons and variants instead of the figure",
+    )
+    args = parser.parse_args(argv)
+
+    config = dict()
+    for key, *_ in _config:
+        config[key] = getattr(args, key)
+
+    stream(sys.stdin, sys.stdout, config, get_MANE(), args.exons)
@@ -0,0 +1,18 @@
+"""
+The subcommands of exonviz
+
+This module has no imports, so the client of the daemon can recognise
+subcommands without importing the command line app.
+"""
+
+# Subcommands have their own argument parser, in the specified module
+SUBCOMMANDS = {
+    "warm-cache": "exonviz.warmup",
+    "serve": "exonviz.daemon",
+    "stream": "exonviz.stream",
+    "export": "exonviz.export",
+    "stub": "exonviz.testing",
+    "synthetic": "exonviz.synthetic",
+    "loadtest": "exonviz.loadtest",
+    "make-db": "exonviz.sources",
+}
@@ -0,0 +1,207 @@
+"""
+Make synthetic transcripts and variants of a given size
+
+The transcripts are used by the benchmarks, and to test the layout against
+extreme inputs: hundreds of exons, tiny exons which set the minimum scale of
+the figure and dense clusters of variants. The output only depends on the
+seed, so every transcript can be made again:
+
+    exonviz synthetic --exons 500 --variants 2000 --tiny 0.1 --clusters 5 \\
+        --exon-tsv exons.tsv --variant-tsv variants.tsv
+    exonviz synthetic --exons 500 --fixtures fixtures/ --transcript NM_SYNTH.1
+"""
+
+import argparse
+import json
+import random
+from typing import Any
+
+from .cli import dump_exons, dump_variants
+from .exon import Coding, Exon, Variant
+from .range import Range
+from .recordings import save_fixture
+
+COLORS = ["#BA1C30", "#DB6917", "#EBCE2B", "#702C8C", "#C0BD7F"]
+
+# Size of the tiny exons, which need a large scale to draw the caps
+TINY_SIZES = (1, 5)
+
+
+def _exon_sizes(
+    rng: random.Random, exons: int, min_size: int, max_size: int, tiny: float
+) -> list[int]:
+    sizes = list()
+    for _ in range(exons):
+        if tiny and rng.random() < tiny:
+            sizes.append(rng.randint(*TINY_SIZES))
+        else:
+            sizes.append(rng.randint(min_size, max_size))
+    return sizes
+
+
+def make_exons(
+    exons: int,
+    variants: int = 0,
+    seed: int = 42,
+    min_size: int = 20,
+    max_size: int = 400,
+    tiny: float = 0.0,
+    clusters: int = 0,
+) -> list[Exon]:
+    """Make a transcript with the specified number of exons and variants
+
+    The coding region starts halfway the first exon and ends halfway the last
+    exon, so the phases of the exons vary.
+
+    :param tiny: Fraction of exons of 1 to 5 bp
+    :param clusters: Put the variants in this many dense clusters, instead of
+                     spreading them over the transcript
+    """
+    rng = random.Random(seed)
+    sizes = _exon_sizes(rng, exons, min_size, max_size, tiny)
+
+    transcript = list()
+    phase = 0
+    for i, size in enumerate(sizes):
+        start = size // 2 if i == 0 else 0
+        end = size // 2 if i == exons - 1 else size
+        end_phase = (phase + end - start) % 3
+        coding = Coding(start, end, phase, end_phase)
+        transcript.append(Exon(size, coding, list(), name=str(i + 1)))
+        phase = end_phase
+
+    centers = [rng.choice(transcript) for _ in range(clusters)]
+    for n in range(variants):
+        if centers:
+            exon = centers[n % clusters]
+            position = min(exon.size - 1, abs(int(rng.gauss(exon.size / 2, 2))))
+        else:
+            exon = rng.choice(transcript)
+            position = rng.randrange(exon.size)
+        variant = Variant(position, f"c.{n}del", COLORS[n % 5])
+        assert isinstance(exon.variants, list)
+        exon.variants.append(variant)
+    for exon in transcript:
+        assert isinstance(exon.variants, list)
+        exon.variants.sort(key=lambda v: v.position)
+
+    return transcript
+
+
+def make_payload(
+    exons: int,
+    seed: int = 42,
+    min_size: int = 20,
+    max_size: int = 400,
+    tiny: float = 0.0,
+) -> dict[str, Any]:
+    """Make a Mutalyzer payload with the specified number of exons"""
+    rng = random.Random(seed)
+    ranges = list()
+    position = 1
+    for size in _exon_sizes(rng, exons, min_size, max_size, tiny):
+        ranges.append([str(position), str(position + size - 1)])
+        # Skip over the intron
+        position += size + rng.randint(100, 5000)
+
+    cds_start = int(ranges[0][0]) + min(10, int(ranges[0][1]) - int(ranges[0][0]))
+    cds_end = int(ranges[-1][1]) - min(10, int(ranges[-1][1]) - int(ranges[-1][0]))
+    return {"exon": {"g": ranges}, "cds": {"g": [[str(cds_start), str(cds_end)]]}}
+
+
+def make_response(payload: dict[str, Any]) -> dict[str, Any]:
+    """Wrap a payload in a Mutalyzer normalize response"""
+    return {"selector_short": payload}
+
+
+def coding_size(payload: dict[str, Any]) -> int:
+    """The size of the coding region of a payload, without the introns"""
+    cds_start, cds_end = (int(pos) for pos in payload["cds"]["g"][0])
+    size = 0
+    for start, end in payload["exon"]["g"]:
+        start, end = max(int(start), cds_start), min(int(end), cds_end)
+        size += max(0, end - start + 1)
+    return size
+
+
+def make_hgvs(
+    transcript: str, payload: dict[str, Any], variants: int, seed: int = 42
+) -> str:
+    """Make an HGVS description with unsorted variants in the coding region"""
+    rng = random.Random(seed)
+    if not variants:
+        return f"{transcript}:c.="
+    positions = rng.sample(range(1, coding_size(payload) + 1), variants)
+    return f"{transcript}:c.[{';'.join(f'{pos}del' for pos in positions)}]"
+
+
+def make_ranges(count: int, seed: int = 42, max_size: int = 20) -> list[Range]:
+    """Make sorted, non-overlapping ranges, which may touch or be empty"""
+    rng = random.Random(seed)
+    ranges = list()
+    position = 0
+    for _ in range(count):
+        position += rng.randint(0, max_size)
+        end = position + rng.randint(0, max_size)
+        ranges.append((position, end))
+        position = end
+    return ranges
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="exonviz synthetic",
+        description="Make a synthetic transcript with variants",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--exons", type=int, default=100, help="Number of exons")
+    parser.add_argument("--variants", type=int, default=0, help="Number of variants")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--min-size", type=int, default=20, help="Minimum exon size")
+    parser.add_argument("--max-size", type=int, default=400, help="Maximum exon size")
+    parser.add_argument(
+        "--tiny", type=float, default=0.0, help="Fraction of exons of 1 to 5 bp"
+    )
+    parser.add_argument(
+        "--clusters", type=int, default=0, help="Put the variants in dense clusters"
+    )
+    parser.add_argument("--exon-tsv", help="Write the exons to a TSV file")
+    parser.add_argument("--variant-tsv", help="Write the variants to a TSV file")
+    parser.add_argument("--payload", help="Write a Mutalyzer payload to a JSON file")
+    parser.add_argument(
+        "--fixtures", help="Store the payload as a fixture for 'exonviz stub serve'"
+    )
+    parser.add_argument(
+        "--transcript",
+        default="NM_SYNTH.1",
+        help="Name of the transcript in the HGVS description and fixture",
+    )
+    args = parser.parse_args(argv)
+
+    if args.exon_tsv or args.variant_tsv:
+        exons = make_exons(
+            args.exons,
+            args.variants,
+            args.seed,
+            args.min_size,
+            args.max_size,
+            args.tiny,
+            args.clusters,
+        )
+        if args.exon_tsv:
+            dump_exons(exons, args.exon_tsv)
+        if args.variant_tsv:
+            dump_variants(exons, args.variant_tsv)
+
+    payload = make_payload(
+        args.exons, args.seed, args.min_size, args.max_size, args.tiny
+    )
+    if args.payload:
+        with open(args.payload, "wt") as fout:
+            json.dump(payload, fout, indent=2)
+    if args.fixtures:
+        no_variants = f"{args.transcript}:c.="
+        save_fixture(args.fixtures, no_variants, make_response(payload))
+
+    # The description to draw the payload with variants
+    print(make_hgvs(args.transcript, payload, args.variants, args.seed))
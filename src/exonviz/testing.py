@@ -0,0 +1,203 @@
+"""
+Record responses from Mutalyzer, and replay them with a local stub server
+
+This makes it possible to test, benchmark and load test ExonViz without
+access to mutalyzer.nl. Every response is stored as a JSON fixture in a
+directory. The stub server answers requests for the recorded transcripts,
+optionally with extra latency and injected errors:
+
+    exonviz stub record fixtures/ NM_003002.4:c.= NM_000546.6:c.=
+    exonviz stub serve fixtures/ --port 8001 --latency 0.2 --error-rate 0.05
+    EXONVIZ_MUTALYZER_URL=http://localhost:8001/api exonviz --transcript SDHD
+"""
+
+import argparse
+import contextlib
+import json
+import random
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.error import HTTPError
+
+from . import mutalyzer
+from .recordings import load_fixture, save_fixture
+
+
+def record(
+    transcripts: list[str], directory: str | Path, base_url: str | None = None
+) -> None:
+    """Record the Mutalyzer normalize responses for transcripts
+
+    Error responses are recorded as well, so they can be replayed
+    """
+    for transcript in transcripts:
+        url = f"{base_url or mutalyzer.MUTALYZER_URL}/normalize/{transcript}"
+        try:
+            response = urllib.request.urlopen(url)
+        except HTTPError as e:
+            status, data = e.code, e.read()
+        else:
+            status, data = response.status, response.read()
+        try:
+            body = json.loads(data)
+        except ValueError:
+            body = data.decode(errors="replace")
+        save_fixture(directory, transcript, body, status)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answer /api/normalize/<transcript> from the recorded fixtures"""
+
+    server: "StubServer"
+
+    def do_GET(self) -> None:
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        prefix = "/api/normalize/"
+        path = urllib.parse.unquote(self.path)
+        if not path.startswith(prefix):
+            self.respond(404, {"message": f"Unknown endpoint {self.path}"})
+            return
+
+        server.requests.append(path[len(prefix) :])
+        if server.inject_error():
+            self.respond(503, "Injected error")
+            return
+
+        fixture = load_fixture(server.directory, path[len(prefix) :])
+        if fixture is None:
+            details = f"No fixture for {path[len(prefix):]}"
+            self.respond(404, {"custom": {"errors": [{"details": details}]}})
+        else:
+            self.respond(fixture["status"], fixture["body"])
+
+    def respond(self, status: int, body: Any) -> None:
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """Local HTTP server which replays recorded Mutalyzer responses
+
+    :param directory: Directory with the recorded fixtures
+    :param port: Port to listen on, 0 picks a free port
+    :param latency: Seconds to wait before answering every request
+    :param error_rate: Fraction of requests that fail with a 503 error
+    :param seed: Seed for the injected errors
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        directory: str | Path,
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.directory = Path(directory)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # Transcripts that were requested, in order
+        self.requests: list[str] = list()
+
+    @property
+    def url(self) -> str:
+        """Base URL of the stub, to use instead of the Mutalyzer API"""
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}/api"
+
+    def inject_error(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+
+@contextlib.contextmanager
+def replay(
+    directory: str | Path, latency: float = 0.0, error_rate: float = 0.0
+) -> Iterator[StubServer]:
+    """Replay the fixtures in directory for every call to Mutalyzer
+
+    Starts a stub server in a background thread, and points MUTALYZER_URL
+    at it for the duration of the context
+    """
+    server = StubServer(directory, latency=latency, error_rate=error_rate)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    previous = mutalyzer.MUTALYZER_URL
+    mutalyzer.MUTALYZER_URL = server.url
+    try:
+        yield server
+    finally:
+        mutalyzer.MUTALYZER_URL = previous
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="exonviz stub",
+        description="Record Mutalyzer responses, and replay them with a stub server",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Record Mutalyzer responses")
+    record_parser.add_argument("directory", help="Directory for the fixtures")
+    record_parser.add_argument(
+        "transcripts",
+        nargs="+",
+        help="HGVS descriptions to record (e.g. NM_003002.4:c.=)",
+    )
+    record_parser.add_argument(
+        "--mutalyzer-url", help="Base URL of the Mutalyzer API to record from"
+    )
+
+    serve_parser = subparsers.add_parser("serve", help="Serve the recorded responses")
+    serve_parser.add_argument("directory", help="Directory with the fixtures")
+    serve_parser.add_argument(
+        "--port", type=int, default=8001, help="Port to listen on"
+    )
+    serve_parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds of latency per request"
+    )
+    serve_parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of requests that fail"
+    )
+    serve_parser.add_argument("--seed", type=int, help="Seed for the injected errors")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record(args.transcripts, args.directory, args.mutalyzer_url)
+        return
+
+    server = StubServer(
+        args.directory, args.port, args.latency, args.error_rate, args.seed
+    )
+    print(f"Set EXONVIZ_MUTALYZER_URL={server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
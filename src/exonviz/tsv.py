@@ -0,0 +1,141 @@
+"""
+Read and write the exons of many transcripts in a single TSV file
+
+Every line contains a single exon, and starts with the transcript it belongs
+to. The exons of a transcript must be on consecutive lines. The variants of
+an exon are stored as comma separated lists, in the same way as for
+exons_from_tsv. Files ending in .gz are compressed with gzip, files ending in
+.zst with zstandard.
+"""
+
+import gzip
+import io
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+from .exon import Coding, Exon, Variant
+
+HEADER = [
+    "transcript",
+    "size",
+    "name",
+    "color",
+    "coding_start",
+    "coding_end",
+    "start_phase",
+    "end_phase",
+    "variant_pos",
+    "variant_name",
+    "variant_color",
+]
+
+# Number of lines to collect before writing them to the file
+WRITE_BUFFER = 10000
+
+
+def open_tsv(fname: str | Path, mode: str = "rt") -> IO[str]:
+    """Open a (compressed) TSV file in text mode"""
+    fname = str(fname)
+    binary = mode.replace("t", "") + "b"
+    if fname.endswith(".gz"):
+        return io.TextIOWrapper(gzip.GzipFile(fname, binary))
+    if fname.endswith(".zst"):
+        try:
+            import zstandard
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(
+                "Missing modules, please install with 'pip install exonviz[zstd]'"
+            )
+        return io.TextIOWrapper(zstandard.open(fname, binary))
+    return open(fname, mode)
+
+
+def _parse_variants(positions: str, names: str, colors: str) -> list[Variant]:
+    if not positions:
+        return list()
+    variants = list()
+    for pos, name, color in zip(
+        positions.split(","), names.split(","), colors.split(","), strict=True
+    ):
+        variants.append(Variant(int(pos), name, color))
+    return variants
+
+
+def read_transcripts(fin: Iterable[str]) -> Iterator[tuple[str, list[Exon]]]:
+    """Read the exons for every transcript from a multi-transcript TSV file
+
+    The exons are yielded one transcript at a time, so the whole file is
+    never kept in memory
+    """
+    lines = iter(fin)
+    header = next(lines).rstrip("\n").split("\t")
+    if header != HEADER:
+        raise RuntimeError("Unexpected header in TSV file")
+
+    fields = (line.rstrip("\n").split("\t") for line in lines)
+    for transcript, records in groupby(fields, key=itemgetter(0)):
+        exons = list()
+        for record in records:
+            if len(record) != len(HEADER):
+                raise ValueError(f"Expected {len(HEADER)} columns, got {record}")
+            (
+                _,
+                size,
+                name,
+                color,
+                start,
+                end,
+                start_phase,
+                end_phase,
+                positions,
+                names,
+                colors,
+            ) = record
+            exon = Exon(
+                int(size),
+                Coding(int(start), int(end), int(start_phase), int(end_phase)),
+                _parse_variants(positions, names, colors),
+                name,
+            )
+            if color:
+                exon.color = color
+            exons.append(exon)
+        yield transcript, exons
+
+
+def _format_exon(transcript: str, exon: Exon) -> str:
+    coding = exon.coding
+    variants = exon.variants
+    for variant in variants:
+        if "," in variant.name or "," in variant.color:
+            raise ValueError(f"Cannot write variant with a comma: {variant}")
+    record = [
+        transcript,
+        str(exon.size),
+        exon.name,
+        exon.color,
+        str(coding.start),
+        str(coding.end),
+        str(coding.start_phase),
+        str(coding.end_phase),
+        ",".join(str(variant.position) for variant in variants),
+        ",".join(variant.name for variant in variants),
+        ",".join(variant.color for variant in variants),
+    ]
+    return "\t".join(record) + "\n"
+
+
+def write_transcripts(
+    fout: IO[str], transcripts: Iterable[tuple[str, Iterable[Exon]]]
+) -> None:
+    """Write the exons of every transcript to a multi-transcript TSV file"""
+    buffer = ["\t".join(HEADER) + "\n"]
+    for transcript, exons in transcripts:
+        for exon in exons:
+            buffer.append(_format_exon(transcript, exon))
+        if len(buffer) >= WRITE_BUFFER:
+            fout.writelines(buffer)
+            buffer.clear()
+    fout.writelines(buffer)
@@ -0,0 +1,133 @@
+"""
+Pre-render the figures for the website, so the first visitor for a gene
+already gets a cached figure
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable
+
+from . import service
+from .cli import get_MANE
+
+log = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Limit the number of calls per second, shared between threads
+
+    :param rate: Maximum number of calls per second, 0 means no limit
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_call = time.monotonic()
+
+    def wait(self) -> None:
+        """Wait until the next call is allowed"""
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def warm_gene(
+    gene: str, MANE: dict[str, str], config: dict[str, Any], limiter: RateLimiter
+) -> str:
+    """Render the figure for gene into the cache
+
+    Returns 'cached' if the figure was already in the cache, and 'rendered'
+    if it was not
+    """
+    hgvs = service.rewrite_transcript(gene, MANE)
+    if service.get_figure(hgvs, config) is not None:
+        return "cached"
+    # Only calls to mutalyzer count towards the rate limit
+    if not service.payload_cached(hgvs):
+        limiter.wait()
+    service.render(hgvs, config)
+    return "rendered"
+
+
+def warm_cache(
+    genes: Iterable[str],
+    MANE: dict[str, str],
+    config: dict[str, Any],
+    workers: int = 8,
+    rate: float = 5.0,
+) -> Counter[str]:
+    """Render the figures for genes into the cache, in parallel
+
+    Returns how many genes were cached, rendered or failed
+    """
+    limiter = RateLimiter(rate)
+
+    def warm(gene: str) -> str:
+        try:
+            return warm_gene(gene, MANE, config, limiter)
+        except Exception as e:
+            log.warning(f"Unable to render {gene}: {e}")
+            return "failed"
+
+    counts: Counter[str] = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for status in executor.map(warm, genes):
+            counts[status] += 1
+    return counts
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="exonviz warm-cache",
+        description="Pre-render the website figures for MANE Select transcripts",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "genes", nargs="*", help="Genes to render (default: all MANE genes)"
+    )
+    parser.add_argument("--gene-list", help="File with one gene per line")
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("EXONVIZ_CACHE_DIR"),
+        help="Cache directory used by the website (default: $EXONVIZ_CACHE_DIR)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="Number of genes to render in parallel"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=5.0,
+        help="Maximum number of calls to mutalyzer per second (0 for no limit)",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.cache_dir:
+        parser.error("Please specify --cache-dir, or set EXONVIZ_CACHE_DIR")
+    service.set_cache_dir(args.cache_dir)
+
+    MANE = get_MANE()
+    genes = list(args.genes)
+    if args.gene_list:
+        with open(args.gene_list) as fin:
+            genes += [line.strip() for line in fin if line.strip()]
+    if not genes:
+        genes = list(MANE)
+
+    counts = warm_cache(
+        genes, MANE, service.web_config, workers=args.workers, rate=args.rate
+    )
+    print(
+        f"Rendered {counts['rendered']}, already cached {counts['cached']}, "
+        f"failed {counts['failed']}",
+        file=sys.stderr,
+    )
@@ -0,0 +1,33 @@
+"""Mutalyzer payloads, and a fixture to use them instead of mutalyzer"""
+
+import pytest
+
+from typing import Any, Iterator
+
+from exonviz import mutalyzer, service
+
+# Mutalyzer payload for SDHD (NM_003002.4), with the introns removed
+SDHD = {
+    "exon": {"g": [["1", "87"], ["88", "204"], ["205", "349"], ["350", "1339"]]},
+    "cds": {"g": [["36", "515"]]},
+}
+
+
+@pytest.fixture
+def offline_mutalyzer(monkeypatch: pytest.MonkeyPatch) -> Iterator[list[str]]:
+    """Replace the calls to mutalyzer with the SDHD payload
+
+    Yields the list of transcripts that were requested from mutalyzer
+    """
+    requested: list[str] = list()
+
+    def fetch_exons(transcript: str) -> dict[str, Any]:
+        requested.append(transcript)
+        if not transcript.startswith("NM_003002.4"):
+            raise RuntimeError(f"Unknown transcript {transcript}")
+        return SDHD
+
+    monkeypatch.setattr(mutalyzer, "fetch_exons", fetch_exons)
+    service._payloads.clear()
+    yield requested
+    service._payloads.clear()
@@ -0,0 +1,151 @@
+import io
+import pytest
+import time
+import zipfile
+
+from typing import Any, Iterator
+
+pytest.importorskip("flask")
+
+from flask.testing import FlaskClient
+
+import exonviz.app
+from exonviz.app import app
+from exonviz.jobs import JobQueue
+
+from payloads import offline_mutalyzer
+
+
+@pytest.fixture
+def client() -> FlaskClient:
+    return app.test_client()
+
+
+def test_draw(client: FlaskClient, offline_mutalyzer: list[str]) -> None:
+    response = client.get("/draw?transcript=NM_003002.4:c.274G>T&exonnumber=True")
+    assert response.status_code == 200
+    assert response.data.startswith(b"<svg")
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "transcript=BRAC1",
+        "transcript=/l",
+        "transcript=SDHD&width=wide",
+        "transcript=NM_003002.4:c.274G>",
+        "transcript=NM_003002.4:c.[274G>T;300del",
+    ],
+)
+def test_draw_invalid(client: FlaskClient, query: str) -> None:
+    response = client.get(f"/draw?{query}")
+    assert response.status_code == 400
+
+
+def test_draw_budgets(
+    client: FlaskClient,
+    offline_mutalyzer: list[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """The render budgets of the server can not be raised by a query"""
+    monkeypatch.setitem(exonviz.service.budgets, "maxrows", 1)
+    query = "maxelements=10000000&maxrows=100000&maxtime=1e9&width=100"
+    response = client.get(f"/draw?transcript=NM_003002.4&{query}")
+    assert response.status_code == 200
+    assert b"Figure truncated (more than 1 rows)" in response.data
+
+    response = client.post(
+        "/api/render",
+        json={
+            "descriptions": ["NM_003002.4"],
+            "config": {"maxrows": 100000, "width": 100},
+        },
+    )
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        figure = archive.read("1-NM_003002.4_c._.svg")
+    assert b"Figure truncated (more than 1 rows)" in figure
+
+
+def test_metrics(client: FlaskClient, offline_mutalyzer: list[str]) -> None:
+    client.get("/draw?transcript=NM_003002.4:c.[274G>T;52+15del]")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+
+    metrics = response.data.decode()
+    for stage in ["mane", "parse", "fetch", "build", "layout", "draw", "serialise"]:
+        assert f'exonviz_stage_duration_seconds_count{{stage="{stage}"}}' in metrics
+    assert (
+        'exonviz_cache_requests_total{cache="payload_memory",result="miss"}' in metrics
+    )
+    assert "exonviz_dropped_variants_total" in metrics
+
+
+def test_api_render(client: FlaskClient, offline_mutalyzer: list[str]) -> None:
+    data = {"descriptions": ["NM_003002.4:c.274G>T", "NM_003002.4"]}
+    response = client.post("/api/render", json=data)
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert len(archive.namelist()) == 3
+
+
+@pytest.mark.parametrize(
+    "data", [{}, {"descriptions": "SDHD"}, {"descriptions": [], "config": {"x": 1}}]
+)
+def test_api_render_invalid(client: FlaskClient, data: dict[str, Any]) -> None:
+    response = client.post("/api/render", json=data)
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def job_queue(monkeypatch: pytest.MonkeyPatch) -> Iterator[JobQueue]:
+    """Render every figure in the background"""
+    queue = JobQueue(processes=0)
+    monkeypatch.setattr(exonviz.app, "JOBS", queue)
+    monkeypatch.setattr(exonviz.app, "JOB_THRESHOLD", 0)
+    yield queue
+    queue.shutdown()
+
+
+def test_draw_job(
+    client: FlaskClient, job_queue: JobQueue, offline_mutalyzer: list[str]
+) -> None:
+    """Expensive figures are rendered in the background"""
+    response = client.get("/draw?transcript=NM_003002.4")
+    (job,) = job_queue.jobs.values()
+    # The job may already be done, in which case the figure is returned
+    assert response.status_code in [200, 202]
+    url = f"/api/jobs/{job.id}"
+
+    for _ in range(1000):
+        response = client.get(url)
+        if response.status_code != 202:
+            break
+        time.sleep(0.01)
+
+    assert response.status_code == 200
+    assert response.data.startswith(b"<svg")
+
+
+def test_submit_job(
+    client: FlaskClient, job_queue: JobQueue, offline_mutalyzer: list[str]
+) -> None:
+    response = client.post("/api/jobs", json={"description": "NM_003002.4"})
+    assert response.status_code in [200, 202]
+
+
+def test_unknown_job(client: FlaskClient, job_queue: JobQueue) -> None:
+    assert client.get("/api/jobs/unknown").status_code == 404
+
+
+def test_api_genes(client: FlaskClient) -> None:
+    response = client.get("/api/genes?prefix=bst2")
+    assert response.status_code == 200
+    assert response.json == [{"gene": "BST2", "transcript": "ENST00000252593.7"}]
+
+
+def test_api_genes_limit(client: FlaskClient) -> None:
+    response = client.get("/api/genes?prefix=B&limit=5")
+    assert response.json is not None
+    assert len(response.json) == 5
@@ -0,0 +1,335 @@
+import asyncio
+import io
+import json
+import pytest
+import threading
+import zipfile
+
+from pathlib import Path
+from urllib.parse import urlencode
+
+from payloads import offline_mutalyzer
+
+from typing import Any
+
+from exonviz import service
+from exonviz.asgi import App
+from exonviz.jobs import JobQueue
+
+Response = tuple[int, dict[bytes, bytes], bytes]
+
+
+async def request(
+    app: App, method: str, path: str, query: str = "", body: bytes = b""
+) -> Response:
+    """Send a request to the ASGI app, the body is sent in two parts"""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query.encode(),
+    }
+    messages: list[dict[str, Any]] = list()
+    parts = [body[: len(body) // 2], body[len(body) // 2 :]]
+
+    async def receive() -> dict[str, Any]:
+        part = parts.pop(0)
+        return {"type": "http.request", "body": part, "more_body": bool(parts)}
+
+    async def send(message: dict[str, Any]) -> None:
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start, response = messages
+    return start["status"], dict(start["headers"]), response["body"]
+
+
+async def get(app: App, path: str, query: str = "") -> Response:
+    """Send a GET request to the ASGI app"""
+    return await request(app, "GET", path, query)
+
+
+async def post(app: App, path: str, data: Any) -> Response:
+    """Send data as JSON to the ASGI app"""
+    return await request(app, "POST", path, body=json.dumps(data).encode())
+
+
+@pytest.fixture(scope="module")
+def app() -> App:
+    # Render the figures in the default thread pool
+    return App(processes=0)
+
+
+def test_draw(app: App, offline_mutalyzer: list[str]) -> None:
+    status, headers, body = asyncio.run(
+        get(app, "/draw", "transcript=NM_003002.4:c.274G>T&exonnumber=True")
+    )
+    assert status == 200
+    assert headers[b"content-type"] == b"text/svg"
+    assert body.startswith(b"<svg")
+
+
+def test_draw_concurrent(app: App, offline_mutalyzer: list[str]) -> None:
+    """Concurrent requests for the same transcript only fetch it once"""
+
+    async def draw_many() -> list[Response]:
+        requests = [
+            get(app, "/draw", f"transcript=NM_003002.4:c.{i}del") for i in range(1, 20)
+        ]
+        return await asyncio.gather(*requests)
+
+    responses = asyncio.run(draw_many())
+    assert all(status == 200 for status, _, _ in responses)
+    assert offline_mutalyzer == ["NM_003002.4:c.="]
+
+
+def test_draw_process_pool(offline_mutalyzer: list[str]) -> None:
+    app = App(processes=1)
+    try:
+        status, _, body = asyncio.run(get(app, "/draw", "transcript=NM_003002.4"))
+    finally:
+        app.stop()
+    assert status == 200
+    assert body.startswith(b"<svg")
+
+
+def test_draw_error(app: App, offline_mutalyzer: list[str]) -> None:
+    status, _, body = asyncio.run(get(app, "/draw", "transcript=NM_000000.1"))
+    assert status == 400
+    assert body == b"Unknown transcript NM_000000.1:c.="
+
+
+@pytest.mark.parametrize(
+    "transcript", ["NM_003002.4:c.274G>", "NM_003002.4:c.[274G>T;300del"]
+)
+def test_draw_malformed(app: App, transcript: str) -> None:
+    """Errors of the HGVS parser are reported to the client"""
+    query = urlencode({"transcript": transcript})
+    status, _, body = asyncio.run(get(app, "/draw", query))
+    assert status == 400
+    assert b"Unexpected character end of input" in body
+
+
+def test_invalid_config(app: App) -> None:
+    status, _, body = asyncio.run(get(app, "/draw", "transcript=SDHD&width=abc"))
+    assert status == 400
+    assert b"abc" in body
+
+
+def test_draw_off_event_loop(
+    app: App, offline_mutalyzer: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Parsing and the figure cache do not block the event loop"""
+    threads: dict[str, int] = dict()
+
+    def record(name: str, function: Any) -> Any:
+        def wrapper(*args: Any) -> Any:
+            threads[name] = threading.get_ident()
+            return function(*args)
+
+        return wrapper
+
+    for name in ["rewrite_transcript", "get_figure", "put_figure"]:
+        monkeypatch.setattr(service, name, record(name, getattr(service, name)))
+
+    status, _, _ = asyncio.run(get(app, "/draw", "transcript=NM_003002.4:c.10del"))
+    assert status == 200
+    assert sorted(threads) == ["get_figure", "put_figure", "rewrite_transcript"]
+    assert threading.get_ident() not in threads.values()
+
+
+def test_thread_pool(
+    offline_mutalyzer: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Mutalyzer is called from the thread pool of the app, of the specified size"""
+    names: list[str] = list()
+    fetch_payload = service.fetch_payload
+
+    def record(hgvs: str) -> dict[str, Any]:
+        names.append(threading.current_thread().name)
+        return fetch_payload(hgvs)
+
+    monkeypatch.setattr(service, "fetch_payload", record)
+    app = App(processes=0, threads=3)
+    try:
+        status, _, _ = asyncio.run(get(app, "/draw", "transcript=NM_003002.4:c.11del"))
+        assert app.thread_pool is not None
+        assert app.thread_pool._max_workers == 3
+    finally:
+        app.stop()
+    assert status == 200
+    assert names[0].startswith("exonviz-asgi")
+
+
+def test_draw_truncated_not_cached(
+    app: App, offline_mutalyzer: list[str], tmp_path: Path
+) -> None:
+    service.set_cache_dir(tmp_path)
+    try:
+        query = "transcript=NM_003002.4:c.=&maxtime=0"
+        status, _, body = asyncio.run(get(app, "/draw", query))
+        config = service.config_from_query({"maxtime": "0"}, list())
+        cached = service.get_figure("NM_003002.4:c.=", config)
+    finally:
+        service.set_cache_dir(None)
+    assert status == 200
+    assert b"Figure truncated" in body
+    assert cached is None
+
+
+def test_missing_transcript(app: App) -> None:
+    status, _, _ = asyncio.run(get(app, "/draw"))
+    assert status == 400
+
+
+def test_not_found(app: App) -> None:
+    status, _, _ = asyncio.run(get(app, "/unknown"))
+    assert status == 404
+
+
+def test_api_genes(app: App) -> None:
+    status, headers, body = asyncio.run(get(app, "/api/genes", "prefix=bst2"))
+    assert status == 200
+    assert headers[b"content-type"] == b"application/json"
+    assert json.loads(body) == [{"gene": "BST2", "transcript": "ENST00000252593.7"}]
+
+
+def test_method_not_allowed(app: App) -> None:
+    status, _, _ = asyncio.run(request(app, "POST", "/draw"))
+    assert status == 405
+
+
+def test_body_too_large(app: App, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("exonviz.asgi.MAX_BODY", 10)
+    status, _, _ = asyncio.run(post(app, "/api/render", {"descriptions": ["SDHD"]}))
+    assert status == 413
+
+
+def test_index(app: App) -> None:
+    status, headers, body = asyncio.run(get(app, "/"))
+    assert status == 200
+    assert headers[b"content-type"].startswith(b"text/html")
+    assert b"Welcome to ExonViz" in body
+    assert b"NM_003002.4:r.[274g&gt;u;300del]" in body
+
+
+FORM = {
+    "transcript": "NM_003002.4:c.274G>T",
+    "height": "20",
+    "scale": "1.0",
+    "gap": "0",
+    "width": "1024",
+    "firstexon": "1",
+    "lastexon": "1000",
+    "color": "",
+    "variantcolors": "red blue",
+    "exonnumber": "on",
+    "variantshape": "pin",
+}
+
+
+def test_index_post(app: App, offline_mutalyzer: list[str]) -> None:
+    body = urlencode(FORM).encode()
+    status, _, page = asyncio.run(request(app, "POST", "/", body=body))
+    assert status == 200
+    assert b"<svg" in page
+    assert b"href=/draw?" in page
+    assert b"transcript=NM_003002.4%3Ac.274G%3ET" in page
+    assert b'class="flash"' not in page
+
+
+@pytest.mark.parametrize(
+    "form, message",
+    [
+        (FORM | {"transcript": "NM_000000.1"}, b"Unknown transcript"),
+        (FORM | {"height": "high"}, b"invalid literal"),
+        ({"transcript": "SDHD"}, b"Missing field"),
+    ],
+)
+def test_index_post_error(
+    app: App, offline_mutalyzer: list[str], form: dict[str, str], message: bytes
+) -> None:
+    body = urlencode(form).encode()
+    status, _, page = asyncio.run(request(app, "POST", "/", body=body))
+    assert status == 200
+    assert message in page
+    assert b"<svg" not in page
+
+
+def test_static(app: App) -> None:
+    status, headers, _ = asyncio.run(get(app, "/static/style.css"))
+    assert status == 200
+    assert headers[b"content-type"] == b"text/css"
+    status, _, _ = asyncio.run(get(app, "/static/../asgi.py"))
+    assert status == 404
+
+
+def test_metrics(app: App, offline_mutalyzer: list[str]) -> None:
+    asyncio.run(get(app, "/draw", "transcript=NM_003002.4:c.12del"))
+    status, _, body = asyncio.run(get(app, "/metrics"))
+    assert status == 200
+    assert b'exonviz_stage_duration_seconds_count{stage="parse"}' in body
+
+
+def test_api_render(app: App, offline_mutalyzer: list[str]) -> None:
+    data = {"descriptions": ["NM_003002.4:c.274G>T", "NM_003002.4", "NM_000000.1"]}
+    status, headers, body = asyncio.run(post(app, "/api/render", data))
+    assert status == 200
+    assert headers[b"content-type"] == b"application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        assert len(archive.namelist()) == 3
+        manifest = json.loads(archive.read("manifest.json"))
+    assert [entry["error"] for entry in manifest] == [
+        None,
+        None,
+        "Unknown transcript NM_000000.1:c.=",
+    ]
+
+
+@pytest.mark.parametrize(
+    "data", [{}, {"descriptions": "SDHD"}, {"descriptions": [], "config": {"x": 1}}]
+)
+def test_api_render_invalid(app: App, data: dict[str, Any]) -> None:
+    status, _, _ = asyncio.run(post(app, "/api/render", data))
+    assert status == 400
+
+
+def test_jobs_disabled(app: App) -> None:
+    status, _, _ = asyncio.run(post(app, "/api/jobs", {"description": "SDHD"}))
+    assert status == 404
+    status, _, _ = asyncio.run(get(app, "/api/jobs/unknown"))
+    assert status == 404
+
+
+def test_jobs(offline_mutalyzer: list[str]) -> None:
+    queue = JobQueue(processes=0)
+    app = App(processes=0, jobs=queue)
+
+    async def submit_and_wait() -> Response:
+        status, headers, body = await post(
+            app, "/api/jobs", {"description": "NM_003002.4"}
+        )
+        if status == 200:
+            return status, headers, body
+        assert status == 202
+        url = json.loads(body)["url"]
+        assert headers[b"location"] == url.encode()
+        for _ in range(1000):
+            status, headers, body = await get(app, url)
+            if status != 202:
+                break
+            await asyncio.sleep(0.01)
+        return status, headers, body
+
+    try:
+        status, _, body = asyncio.run(submit_and_wait())
+        invalid, _, _ = asyncio.run(post(app, "/api/jobs", {"description": "/l"}))
+        unknown, _, _ = asyncio.run(get(app, "/api/jobs/unknown"))
+    finally:
+        queue.shutdown()
+        app.stop()
+    assert status == 200
+    assert body.startswith(b"<svg")
+    assert invalid == 400
+    assert unknown == 404
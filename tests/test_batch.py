@@ -0,0 +1,59 @@
+import io
+import json
+import zipfile
+
+from exonviz import service
+from exonviz.batch import build_many, render_many, zip_figures
+
+from payloads import offline_mutalyzer
+
+MANE = {"SDHD": "NM_003002.4"}
+
+DESCRIPTIONS = [
+    "SDHD",
+    "NM_003002.4:c.[274G>T;52+15del]",
+    "NM_000000.1",
+]
+
+
+def test_render_many(offline_mutalyzer: list[str]) -> None:
+    results = list(render_many(DESCRIPTIONS, service.web_config, MANE))
+
+    # The results are returned in order
+    assert [r["description"] for r in results] == DESCRIPTIONS
+    assert results[0]["transcript"] == "NM_003002.4:c.="
+    assert results[1]["dropped"] == ["52+15del"]
+    assert results[2]["figure"] is None
+    assert results[2]["error"] == "Unknown transcript NM_000000.1:c.="
+
+    # The transcript was only fetched once
+    assert offline_mutalyzer.count("NM_003002.4:c.=") == 1
+
+
+def test_zip_figures(offline_mutalyzer: list[str]) -> None:
+    results = render_many(DESCRIPTIONS, service.web_config, MANE)
+    data = b"".join(zip_figures(results))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        names = archive.namelist()
+        manifest = json.loads(archive.read("manifest.json"))
+        figure = archive.read(manifest[0]["file"])
+
+    assert names == [
+        "1-NM_003002.4_c._.svg",
+        "2-NM_003002.4_c._52_15del_274G_T_.svg",
+        "manifest.json",
+    ]
+    assert figure.startswith(b"<svg")
+    assert manifest[2]["file"] is None
+    assert manifest[2]["error"] == "Unknown transcript NM_000000.1:c.="
+
+
+def test_build_many(offline_mutalyzer: list[str]) -> None:
+    results = list(build_many(DESCRIPTIONS, service.web_config, MANE))
+
+    assert [r["description"] for r in results] == DESCRIPTIONS
+    assert len(results[0]["exons"]) == 4
+    assert results[1]["dropped"] == ["52+15del"]
+    assert results[2]["exons"] is None
+    assert results[2]["error"] == "Unknown transcript NM_000000.1:c.="
@@ -1,6 +1,13 @@
 import pytest
 
-from exonviz.cli import check_input, get_MANE, trim_variants, sort_variants
+from exonviz import cli
+from exonviz.cli import (
+    check_input,
+    classify_input,
+    get_MANE,
+    trim_variants,
+    sort_variants,
+)
 
 
 # A list of valid inputs for the tool
@@ -47,6 +54,93 @@ def test_check_invalid_input(input: str) -> None:
         check_input(input)
 
 
+CLASSIFY = [
+    ("NM_003002.4:c.274G>T", "description"),
+    ("NG_012337.3(NM_003002.4):c.274G>T", "description"),
+    ("ENST00000375549.8:c.[274G>T;300del]", "description"),
+    ("NM_003002.4", "reference"),
+    ("NM_003002", "reference"),
+    ("ENST00000375549.8", "reference"),
+    ("NG_012337.3(NM_003002.4)", "reference"),
+    ("LRG_9t1", "reference"),
+    ("SDHD", "gene"),
+    ("BRAC1", "gene"),
+    ("HLA-A", "gene"),
+    ("C4B_2", "gene"),
+    ("SDHD:c.274G>T", "invalid"),
+    ("NM_003002.4 c.274G>T", "invalid"),
+    ("", "invalid"),
+    ("/l", "invalid"),
+]
+
+
+@pytest.mark.parametrize("input, kind", CLASSIFY)
+def test_classify_input(input: str, kind: str) -> None:
+    assert classify_input(input) == kind
+
+
+def test_classify_input_mane() -> None:
+    """All MANE genes and transcripts are recognised"""
+    for gene, transcript in get_MANE().items():
+        # Some genes only have an Ensembl ID
+        assert classify_input(gene) in ("gene", "reference")
+        assert classify_input(transcript) == "reference"
+
+
+def test_check_input_gene() -> None:
+    """Genes are only valid if they have a MANE Select transcript"""
+    MANE = get_MANE()
+    assert check_input("SDHD") == f"{MANE['SDHD']}:c.="
+    assert check_input("ENSG00000288644") == f"{MANE['ENSG00000288644']}:c.="
+    with pytest.raises(ValueError, match="not a gene with a MANE Select transcript"):
+        check_input("BRAC1")
+
+
+@pytest.mark.parametrize("input", ["SDHD:c.274G>T", "NM_003002.4 c.274G>T"])
+def test_check_input_rejected(input: str) -> None:
+    """Input that can not be valid is rejected without the HGVS parser"""
+    with pytest.raises(ValueError, match="not a valid HGVS description"):
+        check_input(input)
+
+
+MALFORMED = [
+    "NM_003002.4:c.274G>",
+    "NM_003002.4:c.[274G>T;300del",
+    "NM_003002.4:c.274G>T]",
+]
+
+
+@pytest.mark.parametrize("input", MALFORMED)
+def test_check_input_malformed(input: str) -> None:
+    """Errors of the HGVS parser are raised as a ValueError"""
+    with pytest.raises(ValueError, match="Unexpected character"):
+        check_input(input)
+
+
+@pytest.mark.parametrize(
+    "input, error",
+    [
+        ("BRAC1", "not a gene with a MANE Select transcript"),
+        ("/l", "not a valid HGVS description"),
+        ("NM_003002.4:c.274G>", "Unexpected character end of input"),
+        ("NM_003002.4:c.[274G>T;300del", "Unexpected character end of input"),
+        ("NM_003002.4:c.274G>T]", "Unexpected character ']'"),
+    ],
+)
+def test_main_rejected(
+    input: str,
+    error: str,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Invalid input is reported without a traceback, and Mutalyzer is not used"""
+    monkeypatch.setattr(cli, "fetch_exons", pytest.fail)
+    with pytest.raises(SystemExit) as e:
+        cli.main(["--transcript", input])
+    assert e.value.code == 1
+    assert error in capsys.readouterr().err
+
+
 TRIM = [
     ("NM_003002.4:c.=", "NM_003002.4:c.="),
     ("NM_003002.4:r.=", "NM_003002.4:r.="),
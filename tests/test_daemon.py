@@ -0,0 +1,121 @@
+import pytest
+import socket
+import sys
+import threading
+
+from pathlib import Path
+from typing import Any, Iterator
+
+from exonviz import cli, daemon as daemon_module
+from exonviz.daemon import client, make_server, send
+
+from payloads import offline_mutalyzer
+
+
+@pytest.fixture
+def daemon(tmp_path: Path) -> Iterator[str]:
+    path = str(tmp_path / "exonviz.sock")
+    server = make_server(path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_send(daemon: str, offline_mutalyzer: list[str]) -> None:
+    result = send(daemon, ["--transcript", "NM_003002.4:c.274G>T"])
+    assert result["status"] == 0
+    assert result["stdout"].startswith("<svg")
+
+
+def test_send_cached(daemon: str, offline_mutalyzer: list[str]) -> None:
+    """The daemon only calls mutalyzer once for the same transcript"""
+    send(daemon, ["--transcript", "NM_003002.4:c.274G>T"])
+    send(daemon, ["--transcript", "NM_003002.4:c.300del"])
+    assert offline_mutalyzer == ["NM_003002.4:c.="]
+
+
+def test_send_error(daemon: str, offline_mutalyzer: list[str]) -> None:
+    result = send(daemon, ["--transcript", "NM_000000.1"])
+    assert result["status"] == 1
+    assert result["stdout"] == ""
+    assert "Unknown transcript" in result["stderr"]
+
+
+def test_send_invalid_arguments(daemon: str) -> None:
+    result = send(daemon, ["--no-such-option"])
+    assert result["status"] == 2
+    assert "usage:" in result["stderr"]
+
+
+@pytest.mark.parametrize("subcommand", ["stream", "serve", "warm-cache", "stub"])
+def test_send_subcommand(daemon: str, subcommand: str) -> None:
+    """Subcommands are not run by the daemon"""
+    result = send(daemon, [subcommand])
+    assert result["status"] == 2
+    assert "does not run subcommands" in result["stderr"]
+
+
+@pytest.mark.parametrize(
+    "argv, forwarded",
+    [
+        (["--transcript", "SDHD"], True),
+        (["stream"], False),
+        (["warm-cache", "SDHD"], False),
+        (["loadtest", "--fixtures", "fixtures"], False),
+    ],
+)
+def test_client(
+    argv: list[str], forwarded: bool, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Only the command to draw a figure is sent to the daemon"""
+    sent: list[list[str]] = list()
+    ran: list[list[str]] = list()
+
+    def fake_send(path: str, argv: list[str]) -> dict[str, Any]:
+        sent.append(argv)
+        return {"status": 0, "stdout": "", "stderr": ""}
+
+    monkeypatch.setattr(daemon_module, "send", fake_send)
+    monkeypatch.setattr(cli, "main", lambda argv: ran.append(argv))
+    monkeypatch.setattr(sys, "argv", ["exonviz"] + argv)
+    monkeypatch.setenv("EXONVIZ_SOCKET", "/tmp/exonviz.sock")
+
+    if forwarded:
+        with pytest.raises(SystemExit):
+            client()
+        assert sent == [argv]
+        assert ran == []
+    else:
+        client()
+        assert sent == []
+        assert ran == [argv]
+
+
+def test_send_relative_path(
+    daemon: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Paths are relative to the working directory of the client"""
+    (tmp_path / "exons.tsv").write_text(
+        "size\tname\tcolor\tcoding_start\tcoding_end\tstart_phase\tend_phase\n"
+        "10\t\t#4C72B7\t0\t10\t0\t1\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    result = send(daemon, ["--exon-tsv", "exons.tsv"])
+    assert result["status"] == 0, result["stderr"]
+
+
+def test_make_server_running(daemon: str) -> None:
+    with pytest.raises(RuntimeError):
+        make_server(daemon)
+
+
+def test_make_server_stale_socket(tmp_path: Path) -> None:
+    """A socket without a daemon is replaced"""
+    path = str(tmp_path / "exonviz.sock")
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.bind(path)
+    server = make_server(path)
+    server.server_close()
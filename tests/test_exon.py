@@ -2,6 +2,7 @@ import pytest
 
 from typing import cast, Any
 import copy
+import math
 
 from exonviz.exon import (
     Coding,
@@ -13,8 +14,16 @@ from exonviz.exon import (
     element_xy,
     Element,
     draw_exons,
+    LayoutBudgetExceeded,
+    aggregate_variants,
+    count_elements,
+    exons_from_bytes,
+    exons_to_bytes,
+    merge_small_exons,
+    simplify_exons,
 )
-from exonviz.draw import draw_exons as draw_exons_config
+from exonviz.draw import draw_exons as draw_exons_config, draw_figure
+from exonviz.synthetic import make_exons
 
 from exonviz.range import Range
 from svg import Rect, Text, Polygon, Style, Point
@@ -701,6 +710,18 @@ class TestExon:
         assert new.color == "yellow"
         assert all.color == "yellow"
 
+    def test_split_exon_variant_on_boundary(self) -> None:
+        """
+        GIVEN an exon with a variant on the first position after the split
+        WHEN we split the exon
+        THEN the variant should stay in the remaining exon
+        """
+        e = Exon(size=10, variants=[Variant(4, "A>T", "red"), Variant(5, "C>G", "red")])
+        new = e.split(size=5)
+
+        assert new.variants == [Variant(4, "A>T", "red")]
+        assert e.variants == [Variant(0, "C>G", "red")]
+
     def test_draw_name(self) -> None:
         """
         GIVEN an exon with a name
@@ -1122,3 +1143,203 @@ class TestDrawing:
         with pytest.raises(ValueError) as e:
             draw_exons_config(exons, config)
         assert msg in str(e.value)
+
+
+class TestBudget:
+    def test_group_exons_max_rows(self) -> None:
+        """Only the rows within the budget are returned"""
+        exons = [Exon(100) for _ in range(5)]
+        with pytest.raises(LayoutBudgetExceeded) as e:
+            group_exons(exons, height=20, scale=1, gap=0, width=100, max_rows=2)
+        assert e.value.rows == [[Exon(100)], [Exon(100)]]
+
+    def test_group_exons_max_rows_fits(self) -> None:
+        exons = [Exon(100) for _ in range(2)]
+        page = group_exons(exons, height=20, scale=1, gap=0, width=100, max_rows=2)
+        assert len(page) == 2
+
+    def test_group_exons_deadline(self) -> None:
+        with pytest.raises(LayoutBudgetExceeded) as e:
+            group_exons([Exon(100)], height=20, scale=1, gap=0, width=100, deadline=0)
+        assert str(e.value) == "out of time"
+
+    def test_draw_exons_truncated(self) -> None:
+        exons = [Exon(100) for _ in range(5)]
+        elements = draw_exons(
+            exons,
+            width=100,
+            height=20,
+            scale=1,
+            gap=0,
+            variant_shape="pin",
+            max_rows=2,
+        )
+        text = elements[-1]
+        assert isinstance(text, Text)
+        assert text.text == "Figure truncated (more than 2 rows)"
+
+    def test_merge_small_exons(self) -> None:
+        """Non coding exons smaller than a pixel are merged"""
+        exons = [
+            Exon(5, variants=[Variant(1, "a", "red")], name="1"),
+            Exon(5, variants=[Variant(1, "b", "red")], name="2"),
+            Exon(100, coding=Coding(0, 100)),
+            Exon(5),
+        ]
+        merged = merge_small_exons(exons, scale=0.1)
+        assert merged == [
+            Exon(
+                10, variants=[Variant(1, "a", "red"), Variant(6, "b", "red")], name="1"
+            ),
+            Exon(100, coding=Coding(0, 100)),
+            Exon(5),
+        ]
+        # The original exons are not modified
+        assert exons[0].size == 5
+
+    def test_aggregate_variants(self) -> None:
+        """Variants that are drawn in the same bucket are aggregated"""
+        variants = [
+            Variant(0, "a", "red"),
+            Variant(1, "b", "blue"),
+            Variant(10, "c", "red"),
+        ]
+        exons = [Exon(100, variants=variants)]
+        aggregate_variants(exons, scale=1, bucket=5)
+        assert exons[0].variants == [
+            Variant(0, "2 variants", "red"),
+            Variant(10, "c", "red"),
+        ]
+
+    def test_simplify_exons(self) -> None:
+        variants = [Variant(i, f"{i}del", "red") for i in range(100)]
+        exons = [Exon(100, coding=Coding(0, 100), variants=variants)]
+        simplified = simplify_exons(
+            exons, scale=1, width=100, variant_shape="pin", max_elements=50
+        )
+        assert count_elements(simplified, "pin") <= 50
+        assert len(exons[0].variants) == 100
+
+    def test_simplify_exons_count(self) -> None:
+        """Aggregated variants are named after all the variants they contain"""
+        variants = [Variant(i, f"{i}del", "red") for i in range(30)]
+        exons = [Exon(100, coding=Coding(0, 100), variants=variants)]
+        simplified = simplify_exons(
+            exons, scale=1, width=100, variant_shape="pin", max_elements=5
+        )
+        assert simplified[0].variants == [Variant(0, "30 variants", "red")]
+
+    def test_draw_simplified(self) -> None:
+        """Figures with too many elements are simplified"""
+        variants = [Variant(i, f"{i}del", "red") for i in range(1000)]
+        exons = [Exon(1000, coding=Coding(0, 1000), variants=variants)]
+        config = {
+            "width": 1000,
+            "height": 20,
+            "scale": 1.0,
+            "gap": 0,
+            "variantshape": "pin",
+            "maxelements": 100,
+        }
+        figure = draw_exons_config(exons, config)
+        assert figure.elements is not None
+        assert len(figure.elements) < 150
+
+    @pytest.mark.parametrize(
+        "budget, truncated",
+        [
+            (dict(), ""),
+            ({"maxrows": 2}, "more than 2 rows"),
+            ({"maxtime": 0}, "out of time"),
+        ],
+    )
+    def test_draw_figure_truncated(
+        self, budget: dict[str, Any], truncated: str
+    ) -> None:
+        """draw_figure reports which budget was exceeded"""
+        exons = [Exon(100) for _ in range(5)]
+        config = {
+            "width": 100,
+            "height": 20,
+            "scale": 1.0,
+            "gap": 0,
+            "variantshape": "pin",
+        }
+        _, reason = draw_figure(exons, config | budget)
+        assert reason == truncated
+
+
+class TestFuzzLayout:
+    """Lay out synthetic transcripts, and check that nothing gets lost"""
+
+    @pytest.mark.parametrize("seed", range(25))
+    def test_group_exons_invariants(self, seed: int) -> None:
+        exons = make_exons(60, 300, seed=seed, tiny=0.2, clusters=3)
+        scale = max(1.0, *(exon.min_scale(20) for exon in exons))
+        page = group_exons(
+            copy.deepcopy(exons), height=20, gap=5, width=1024, scale=scale
+        )
+        parts = [exon for row in page for exon in row]
+
+        assert sum(e.size for e in parts) == sum(e.size for e in exons)
+        assert sum(e.coding.size for e in parts) == sum(e.coding.size for e in exons)
+        assert [v.name for e in parts for v in e.variants] == [
+            v.name for e in exons for v in e.variants
+        ]
+        for part in parts:
+            assert all(0 <= v.position < part.size for v in part.variants)
+        for row in page:
+            drawn = sum(math.ceil(e.draw_size(scale)) for e in row)
+            assert drawn + 5 * (len(row) - 1) <= 1024
+
+
+class TestBinary:
+    EXONS = [
+        Exon(87, Coding(35, 87, 0, 1), name="1"),
+        Exon(
+            117,
+            Coding(0, 117, 1, 2),
+            [Variant(10, "c.62A>T", "red"), Variant(20, "c.72del", "#702C8C")],
+            "2 ✓",
+            "purple",
+        ),
+        Exon(10),
+    ]
+
+    def test_exon_roundtrip(self) -> None:
+        for exon in self.EXONS:
+            assert Exon.from_bytes(exon.to_bytes()) == exon
+
+    def test_exon_trailing_data(self) -> None:
+        with pytest.raises(ValueError):
+            Exon.from_bytes(Exon(10).to_bytes() + b"\0")
+
+    def test_exons_roundtrip(self) -> None:
+        assert exons_from_bytes(exons_to_bytes(self.EXONS)) == self.EXONS
+
+    def test_exons_empty(self) -> None:
+        assert exons_from_bytes(exons_to_bytes([])) == []
+
+    @pytest.mark.parametrize("data", [b"", b"size\tname\n", b"EXVZ\x02\0\0\0\0"])
+    def test_exons_invalid(self, data: bytes) -> None:
+        with pytest.raises(ValueError):
+            exons_from_bytes(data)
+
+    def test_exons_truncated(self) -> None:
+        """Every truncated file is reported, instead of raising struct.error"""
+        data = exons_to_bytes(self.EXONS)
+        for size in range(9, len(data)):
+            with pytest.raises(ValueError, match="Truncated ExonViz binary data"):
+                exons_from_bytes(data[:size])
+
+    def test_exon_truncated(self) -> None:
+        data = self.EXONS[0].to_bytes()
+        for size in range(len(data)):
+            with pytest.raises(ValueError, match="Truncated ExonViz binary data"):
+                Exon.from_bytes(data[:size])
+
+    def test_exons_count_too_large(self) -> None:
+        """The number of exons in the header does not match the data"""
+        data = b"EXVZ\x01\xff\xff\xff\xff" + Exon(10).to_bytes()
+        with pytest.raises(ValueError, match="Truncated ExonViz binary data"):
+            exons_from_bytes(data)
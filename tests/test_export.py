@@ -0,0 +1,45 @@
+import pytest
+
+from pathlib import Path
+
+from exonviz import service
+from exonviz.batch import build_many
+from exonviz.export import exon_columns, write_parquet
+
+from payloads import offline_mutalyzer
+
+MANE = {"SDHD": "NM_003002.4"}
+
+DESCRIPTIONS = ["NM_003002.4:c.274G>T", "NM_000000.1", "SDHD"]
+
+
+def test_exon_columns(offline_mutalyzer: list[str]) -> None:
+    results = build_many(DESCRIPTIONS, service.web_config, MANE)
+    (columns,) = exon_columns(results)
+
+    # The description that failed is skipped
+    assert len(columns["exon"]) == 8
+    assert columns["exon"][:4] == [1, 2, 3, 4]
+    assert columns["transcript"][4] == "NM_003002.4:c.="
+    assert columns["variants"][2] == [
+        {"position": 104, "name": "c.274G>T", "color": "#BA1C30"}
+    ]
+
+
+def test_exon_columns_batches(offline_mutalyzer: list[str]) -> None:
+    """Every batch holds the exons of complete transcripts"""
+    results = build_many(DESCRIPTIONS, service.web_config, MANE)
+    batches = list(exon_columns(results, batch_size=3))
+    assert [len(columns["exon"]) for columns in batches] == [4, 4]
+
+
+def test_write_parquet(tmp_path: Path, offline_mutalyzer: list[str]) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    fname = str(tmp_path / "exons.parquet")
+    results = build_many(DESCRIPTIONS, service.web_config, MANE)
+
+    assert write_parquet(fname, results, batch_size=3) == 8
+
+    table = pq.read_table(fname)
+    assert table.num_rows == 8
+    assert table.column("variants").to_pylist()[2][0]["name"] == "c.274G>T"
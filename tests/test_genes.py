@@ -0,0 +1,47 @@
+import pytest
+
+from exonviz.cli import get_MANE
+from exonviz.genes import GeneIndex
+
+MANE = {
+    "BRCA1": "NM_007294.4",
+    "BRCA2": "NM_000059.4",
+    "BRAF": "NM_004333.6",
+    "SDHD": "NM_003002.4",
+    "C1orf43": "NM_015449.3",
+}
+
+
+@pytest.fixture(scope="module")
+def index() -> GeneIndex:
+    return GeneIndex(MANE)
+
+
+SEARCH = [
+    ("BRC", ["BRCA1", "BRCA2"]),
+    ("brc", ["BRCA1", "BRCA2"]),
+    ("BR", ["BRAF", "BRCA1", "BRCA2"]),
+    ("BRCA1", ["BRCA1"]),
+    ("c1ORF", ["C1orf43"]),
+    ("BRCA3", []),
+    ("", []),
+    ("ZZZ", []),
+]
+
+
+@pytest.mark.parametrize("prefix, genes", SEARCH)
+def test_search(index: GeneIndex, prefix: str, genes: list[str]) -> None:
+    assert [gene for gene, _ in index.search(prefix)] == genes
+
+
+def test_search_transcript(index: GeneIndex) -> None:
+    assert index.search("SDHD") == [("SDHD", "NM_003002.4")]
+
+
+def test_search_limit(index: GeneIndex) -> None:
+    assert len(index.search("BR", limit=2)) == 2
+
+
+def test_index_mane() -> None:
+    index = GeneIndex(get_MANE())
+    assert ("BST2", "ENST00000252593.7") in index.search("bst")
@@ -0,0 +1,54 @@
+import pytest
+import subprocess
+import sys
+
+import exonviz
+
+# Maximum time for "import exonviz", in microseconds. Importing everything
+# eagerly took about 300ms
+IMPORT_BUDGET = 100_000
+
+
+def importtime(statement: str) -> dict[str, int]:
+    """The cumulative import time in microseconds for every imported module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = dict()
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_import_budget() -> None:
+    assert importtime("import exonviz")["exonviz"] < IMPORT_BUDGET
+
+
+def test_drawing_imports() -> None:
+    """Drawing exons does not import the modules used to talk to Mutalyzer"""
+    statement = "import sys; from exonviz import Exon, draw_exons; print(*sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", statement], capture_output=True, text=True, check=True
+    )
+    modules = result.stdout.split()
+    assert "exonviz.draw" in modules
+    for module in ["exonviz.cli", "mutalyzer_hgvs_parser", "mutalyzer_crossmapper"]:
+        assert module not in modules
+
+
+def test_lazy_attribute() -> None:
+    from exonviz.exon import Exon
+
+    assert exonviz.Exon is Exon
+
+
+def test_unknown_attribute() -> None:
+    with pytest.raises(AttributeError):
+        exonviz.no_such_attribute
@@ -0,0 +1,160 @@
+import json
+import os
+import pytest
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+from typing import Iterator
+
+from exonviz import service
+from exonviz.jobs import Job, JobQueue, estimate_cost, job_id
+
+from payloads import offline_mutalyzer, SDHD
+
+
+def wait(queue: JobQueue, job: Job, timeout: float = 10) -> Job:
+    """Wait until the job is done or failed"""
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        found = queue.get(job.id)
+        if found is not None and found.status in ["done", "failed"]:
+            return found
+        time.sleep(0.01)
+    raise TimeoutError(job)
+
+
+@pytest.fixture
+def queue() -> Iterator[JobQueue]:
+    queue = JobQueue(processes=0)
+    yield queue
+    queue.shutdown()
+
+
+def test_job_id() -> None:
+    """The same figure always gets the same id"""
+    config = service.web_config
+    assert job_id("NM_003002.4:c.=", config) == job_id("NM_003002.4:c.=", config)
+    assert job_id("NM_003002.4:c.=", config) != job_id("NM_003002.4:r.=", config)
+
+
+def test_estimate_cost() -> None:
+    config = service.web_config | {"width": 100}
+    # 4 exons, 2 variants, and 480 coding bp over rows of 100 pixels
+    assert estimate_cost("NM_003002.4:c.[1del;2del]", SDHD, config) == 4 + 2 + 4.8
+
+
+def test_estimate_cost_noncoding() -> None:
+    config = service.web_config | {"width": 100, "noncoding": True}
+    assert estimate_cost("NM_003002.4:c.=", SDHD, config) == 4 + 13.39
+
+
+def test_job(queue: JobQueue, offline_mutalyzer: list[str]) -> None:
+    job = wait(queue, queue.submit("NM_003002.4:c.=", service.web_config))
+    assert job.status == "done"
+    assert job.figure is not None and job.figure.startswith("<svg")
+
+
+def test_job_submitted_once(queue: JobQueue, offline_mutalyzer: list[str]) -> None:
+    """The same figure is only queued once"""
+    job = queue.submit("NM_003002.4:c.=", service.web_config)
+    assert queue.submit("NM_003002.4:c.=", service.web_config) is job
+
+
+def test_job_failed(queue: JobQueue, offline_mutalyzer: list[str]) -> None:
+    job = wait(queue, queue.submit("NM_000000.1:c.=", service.web_config))
+    assert job.status == "failed"
+    assert job.error == "Unknown transcript NM_000000.1:c.="
+
+
+def test_job_process_pool(offline_mutalyzer: list[str]) -> None:
+    queue = JobQueue(processes=1)
+    try:
+        job = wait(queue, queue.submit("NM_003002.4:c.=", service.web_config))
+    finally:
+        queue.shutdown()
+    assert job.status == "done"
+
+
+def test_job_other_process(
+    tmp_path: Path, queue: JobQueue, offline_mutalyzer: list[str]
+) -> None:
+    """Jobs from other processes are found through the cache"""
+    service.set_cache_dir(tmp_path)
+    try:
+        job = wait(queue, queue.submit("NM_003002.4:c.=", service.web_config))
+        other = JobQueue(processes=0).get(job.id)
+    finally:
+        service.set_cache_dir(None)
+    assert other is not None
+    assert other.status == "done"
+    assert other.figure == job.figure
+
+
+def test_job_truncated(
+    tmp_path: Path, queue: JobQueue, offline_mutalyzer: list[str]
+) -> None:
+    """Truncated figures are returned, but not cached"""
+    config = service.web_config | {"maxtime": 0}
+    service.set_cache_dir(tmp_path)
+    try:
+        job = wait(queue, queue.submit("NM_003002.4:c.=", config))
+        cached = service.get_figure("NM_003002.4:c.=", config)
+    finally:
+        service.set_cache_dir(None)
+    assert job.status == "done"
+    assert job.figure is not None and "Figure truncated" in job.figure
+    assert cached is None
+
+
+def test_job_truncated_other_process(
+    tmp_path: Path, queue: JobQueue, offline_mutalyzer: list[str]
+) -> None:
+    """Truncated figures are found by other processes in the job record"""
+    config = service.web_config | {"maxtime": 0}
+    service.set_cache_dir(tmp_path)
+    try:
+        job = wait(queue, queue.submit("NM_003002.4:c.=", config))
+    finally:
+        service.set_cache_dir(None)
+
+    code = (
+        "import json, sys; from exonviz.jobs import JobQueue; "
+        "job = JobQueue(processes=0).get(sys.argv[1]); "
+        "print(json.dumps([job.status, job.figure]))"
+    )
+    env = os.environ | {"EXONVIZ_CACHE_DIR": str(tmp_path)}
+    result = subprocess.run(
+        [sys.executable, "-c", code, job.id],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    status, figure = json.loads(result.stdout)
+    assert status == "done"
+    assert figure == job.figure
+    assert "Figure truncated" in figure
+
+
+def test_job_figure_missing(
+    tmp_path: Path, queue: JobQueue, offline_mutalyzer: list[str]
+) -> None:
+    """A job whose figure is no longer in the cache has failed"""
+    service.set_cache_dir(tmp_path)
+    try:
+        job = wait(queue, queue.submit("NM_003002.4:c.=", service.web_config))
+        for path in (tmp_path / "figures").rglob("*"):
+            if path.is_file():
+                path.unlink()
+        other = JobQueue(processes=0).get(job.id)
+    finally:
+        service.set_cache_dir(None)
+    assert other is not None
+    assert other.status == "failed"
+    assert other.error == "The figure is no longer in the cache"
+
+
+def test_unknown_job(queue: JobQueue) -> None:
+    assert queue.get("unknown") is None
@@ -0,0 +1,149 @@
+import json
+import pytest
+import threading
+import urllib.parse
+
+from pathlib import Path
+from typing import Iterator
+
+from exonviz.loadtest import (
+    Request,
+    Result,
+    default_mix,
+    form,
+    main,
+    plan,
+    query,
+    read_mix,
+    run,
+    summarise,
+    table,
+)
+from exonviz.service import config_from_query, web_config
+from exonviz.recordings import save_fixture
+
+from payloads import SDHD, offline_mutalyzer
+
+
+@pytest.fixture
+def website(offline_mutalyzer: list[str]) -> Iterator[str]:
+    """Run the website in a background thread"""
+    pytest.importorskip("flask")
+    from werkzeug.serving import make_server
+
+    from exonviz.app import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    thread.join()
+
+
+def test_request_invalid() -> None:
+    with pytest.raises(ValueError, match="Unknown endpoint"):
+        Request("api", "SDHD")
+    with pytest.raises(ValueError, match="Unknown configuration option"):
+        Request("draw", "SDHD", {"colour": "red"})
+
+
+def test_read_mix() -> None:
+    lines = [
+        '{"endpoint": "draw", "transcript": "SDHD", "weight": 3}\n',
+        "\n",
+        '{"endpoint": "post", "transcript": "TP53", "config": {"scale": 2.0}}\n',
+    ]
+    assert read_mix(lines) == [
+        Request("draw", "SDHD", weight=3),
+        Request("post", "TP53", {"scale": 2.0}),
+    ]
+    with pytest.raises(ValueError):
+        read_mix([])
+
+
+def test_default_mix(tmp_path: Path) -> None:
+    save_fixture(tmp_path, "NM_003002.4:c.=", {"selector_short": SDHD})
+    save_fixture(tmp_path, "NM_BAD.1:c.=", "Invalid", status=422)
+    assert default_mix(tmp_path) == [
+        Request("draw", "NM_003002.4:c.="),
+        Request("post", "NM_003002.4:c.="),
+    ]
+
+
+def test_plan() -> None:
+    mix = [Request("draw", "SDHD", weight=9), Request("post", "SDHD", weight=1)]
+    requests = plan(mix, 1000, seed=1)
+    assert requests == plan(mix, 1000, seed=1)
+    assert 800 < sum(r.endpoint == "draw" for r in requests) < 1000
+
+
+def test_query() -> None:
+    request = Request("draw", "SDHD", {"scale": 2.5, "variantcolors": ["red", "blue"]})
+    args = urllib.parse.parse_qs(query(request))
+    config = config_from_query(
+        {key: value[0] for key, value in args.items()}, args["variantcolors"]
+    )
+    assert args["transcript"] == ["SDHD"]
+    assert config["scale"] == 2.5
+    assert config["variantcolors"] == ["red", "blue"]
+    assert config["exonnumber"] == web_config["exonnumber"]
+
+
+def test_form() -> None:
+    request = Request("post", "SDHD", {"exonnumber": False, "noncoding": True})
+    values = urllib.parse.parse_qs(form(request).decode())
+    assert values["noncoding"] == ["on"]
+    assert "exonnumber" not in values
+    assert values["variantcolors"] == ["#BA1C30 #DB6917 #EBCE2B #702C8C #C0BD7F"]
+
+
+def test_summarise() -> None:
+    results = [Result("draw", i / 100, 200) for i in range(1, 101)]
+    results.append(Result("post", 2.0, 0, "Connection refused"))
+    summary = summarise(results, elapsed=10)
+
+    assert summary["all"]["requests"] == 101
+    assert summary["all"]["errors"] == 1
+    assert summary["draw"]["throughput"] == 10
+    assert summary["draw"]["p50"] == 0.5
+    assert summary["draw"]["p99"] == 0.99
+    assert summary["post"]["max"] == 2.0
+    assert table(summary).splitlines()[1].startswith("all")
+
+
+def test_run(website: str) -> None:
+    mix = [
+        Request("draw", "NM_003002.4:c.274G>T"),
+        Request("post", "NM_003002.4:c.[274G>T;300del]", {"scale": 2.0}),
+        Request("draw", "NM_BAD.1:c.="),
+    ]
+    results, elapsed = run(website, mix * 4, concurrency=3)
+    assert len(results) == 12
+    assert elapsed > 0
+
+    errors = [r for r in results if r.error]
+    assert len(errors) == 4
+    assert {r.status for r in errors} == {500}
+
+
+def test_run_post_error(website: str) -> None:
+    (result,) = run(website, [Request("post", "NM_BAD.1:c.=")])[0]
+    assert result.status == 200
+    assert result.error == "No figure on the page"
+
+
+def test_main(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """Start the website and the stub, and load test them"""
+    pytest.importorskip("flask")
+    save_fixture(tmp_path, "NM_003002.4:c.=", {"selector_short": SDHD})
+    # fmt: off
+    main([
+        "--fixtures", str(tmp_path), "--requests", "10", "--concurrency", "1", "--json"
+    ])
+    # fmt: on
+
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["all"]["requests"] == 10
+    assert summary["all"]["errors"] == 0
+    assert summary["upstream_requests"] == 1
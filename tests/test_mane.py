@@ -0,0 +1,191 @@
+import gzip
+import io
+import logging
+import pytest
+import subprocess
+import sys
+
+from pathlib import Path
+from typing import Any, Iterator
+
+from exonviz import mane
+from exonviz.cli import get_MANE, make_exons
+from exonviz.data.extract_mane import exon_models, line_to_gff
+from exonviz.draw import config
+from exonviz.mane import ModelFile, write_models
+from exonviz.mutalyzer import build_exons
+from exonviz.sources import (
+    ManeSource,
+    MutalyzerSource,
+    SourceChain,
+    parse_source,
+    set_source,
+)
+from exonviz.synthetic import make_payload
+
+from payloads import SDHD, offline_mutalyzer
+
+TRANSCRIPT = get_MANE()["SDHD"]
+
+# Introns between the exons of SDHD, in genomic coordinates
+INTRONS = [1000, 2000, 3000]
+
+
+def sdhd_gff(strand: str) -> list[str]:
+    """GFF records for SDHD, with introns between the exons"""
+    transcript_start = 5000
+    exons: list[tuple[int, int]] = list()
+    position = transcript_start
+    for (start, end), intron in zip(SDHD["exon"]["g"], INTRONS + [0]):
+        size = int(end) - int(start) + 1
+        exons.append((position, position + size - 1))
+        position += size + intron
+
+    # Convert the CDS from transcript to genomic coordinates
+    def genomic(pos: int) -> int:
+        for (start, end), (g_start, _) in zip(SDHD["exon"]["g"], exons):
+            if int(start) <= pos <= int(end):
+                return g_start + pos - int(start)
+        raise ValueError(pos)
+
+    cds_start, cds_end = (genomic(int(pos)) for pos in SDHD["cds"]["g"][0])
+    cds = [
+        (max(start, cds_start), min(end, cds_end))
+        for start, end in exons
+        if start <= cds_end and end >= cds_start
+    ]
+
+    if strand == "-":
+        # Mirror the transcript, so it lies on the reverse strand
+        def mirror(r: tuple[int, int]) -> tuple[int, int]:
+            return 100000 - r[1], 100000 - r[0]
+
+        exons = [mirror(exon) for exon in exons]
+        cds = [mirror(c) for c in cds]
+
+    attr = f"transcript_id={TRANSCRIPT}"
+    lines = [
+        f"chr11\tBestRefSeq\ttranscript\t{min(exons)[0]}\t{max(exons)[1]}\t.\t{strand}"
+        f"\t.\tgene_name=SDHD;{attr};tag=MANE_Select",
+        f"chr11\tBestRefSeq\ttranscript\t1\t100\t.\t+\t.\tgene_name=X;"
+        f"transcript_id=ENST_OTHER.1;tag=MANE_Plus_Clinical",
+    ]
+    for kind, ranges in [("exon", exons), ("CDS", cds)]:
+        for first, last in ranges:
+            lines.append(
+                f"chr11\tBestRefSeq\t{kind}\t{first}\t{last}\t.\t{strand}\t.\t{attr}"
+            )
+    return lines
+
+
+@pytest.fixture
+def models(tmp_path: Path) -> Iterator[Path]:
+    """An exon model file for SDHD"""
+    path = tmp_path / "mane_exons.dat"
+    records = [line_to_gff(line) for line in sdhd_gff("+")]
+    with open(path, "wb") as fout:
+        write_models(fout, exon_models(records))
+    yield path
+    set_source(None)
+
+
+@pytest.mark.parametrize("strand", ["+", "-"])
+def test_exon_models(strand: str) -> None:
+    """The exon models are drawn the same as the Mutalyzer payload"""
+    records = [line_to_gff(line) for line in sdhd_gff(strand)]
+    ((transcript, payload),) = exon_models(records)
+    assert transcript == TRANSCRIPT
+
+    hgvs = "NM_003002.4:c.[274G>T;300del]"
+    assert build_exons(hgvs, payload, config) == build_exons(hgvs, SDHD, config)
+
+
+def test_model_file() -> None:
+    models = [(f"NM_{i:06}.1", make_payload(i % 20 + 1, seed=i)) for i in range(1000)]
+    fout = io.BytesIO()
+    assert write_models(fout, reversed(models), block_size=64) == 1000
+
+    model_file = ModelFile(fout.getvalue())
+    assert len(model_file.blocks) == 16
+    assert len(model_file) == 1000
+    assert list(model_file) == [transcript for transcript, _ in models]
+    for transcript, payload in models[::37]:
+        assert model_file.get(transcript) == payload
+    for missing in ["NM_000000.0", "NM_000064.2", "NM_999999.1", "A"]:
+        assert model_file.get(missing) is None
+
+
+def test_model_file_empty() -> None:
+    fout = io.BytesIO()
+    write_models(fout, [])
+    assert ModelFile(fout.getvalue()).get("NM_003002.4") is None
+
+
+@pytest.mark.parametrize("data", [b"", b"EXVZ\x01\0\0\0\0", b"EXVM\x02\0\0\0\0"])
+def test_model_file_invalid(data: bytes) -> None:
+    with pytest.raises(ValueError):
+        ModelFile(data)
+
+
+def test_mane_source(models: Path) -> None:
+    source = ManeSource(models)
+    assert source.fetch(f"{TRANSCRIPT}:c.=") is not None
+    assert source.fetch(f"{TRANSCRIPT}:r.=") is not None
+    assert source.fetch(f"{TRANSCRIPT}:c.274G>T") is None
+    assert source.fetch("NM_003002.4:c.=") is None
+
+
+def test_mane_source_not_installed(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(mane, "bundled_models", lambda: None)
+    assert ManeSource().fetch(f"{TRANSCRIPT}:c.=") is None
+
+
+def test_bundled_models_missing(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """A warning is logged when the bundled models are not installed"""
+    monkeypatch.setattr("importlib.resources.files", lambda _: tmp_path)
+    mane.bundled_models.cache_clear()
+    try:
+        with caplog.at_level(logging.WARNING, logger="exonviz.mane"):
+            assert mane.bundled_models() is None
+    finally:
+        mane.bundled_models.cache_clear()
+    assert "MANE Select exon models are not installed" in caplog.text
+
+
+def test_parse_mane_not_installed(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(mane, "bundled_models", lambda: None)
+    monkeypatch.setattr("exonviz.sources.bundled_models", lambda: None)
+    with pytest.raises(ValueError, match="mane:<path>"):
+        parse_source("mane")
+
+
+def test_parse_mane_path(models: Path) -> None:
+    source = parse_source(f"cached:mane:{models}")
+    source.preload()
+    assert source.fetch(f"{TRANSCRIPT}:c.=") is not None
+
+
+def test_make_exons(models: Path, offline_mutalyzer: list[str]) -> None:
+    """Genes are drawn without calling Mutalyzer"""
+    set_source(SourceChain([ManeSource(models), MutalyzerSource()]))
+    exons = make_exons("SDHD", config)
+    assert exons == make_exons("NM_003002.4", config)
+    assert offline_mutalyzer == ["NM_003002.4:c.="]
+
+
+def test_extract_mane(tmp_path: Path) -> None:
+    gff = tmp_path / "mane.gff.gz"
+    with gzip.open(gff, "wt") as fout:
+        print("##gff-version 3", *sdhd_gff("-"), sep="\n", file=fout)
+    script = Path(mane.__file__).parent / "data" / "extract_mane.py"
+    out = subprocess.run(
+        [sys.executable, script, gff, "--exons", tmp_path / "mane_exons.dat"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    assert out == f"SDHD\t{TRANSCRIPT}\n"
+    models = ModelFile((tmp_path / "mane_exons.dat").read_bytes())
+    assert list(models) == [TRANSCRIPT]
@@ -0,0 +1,46 @@
+from exonviz.metrics import Counter, Histogram, STAGES, render, stage
+
+
+def test_counter() -> None:
+    counter = Counter("test_total", "Test counter", labels=("result",))
+    counter.inc("hit")
+    counter.inc("hit")
+    counter.inc("miss", amount=3)
+    assert counter.render() == [
+        "# HELP test_total Test counter",
+        "# TYPE test_total counter",
+        'test_total{result="hit"} 2',
+        'test_total{result="miss"} 3',
+    ]
+
+
+def test_counter_without_labels() -> None:
+    counter = Counter("test_nolabels_total", "Test counter")
+    counter.inc()
+    assert counter.render()[-1] == "test_nolabels_total 1"
+
+
+def test_histogram() -> None:
+    histogram = Histogram("test_seconds", "Test histogram", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.1)
+    histogram.observe(5)
+    assert histogram.render() == [
+        "# HELP test_seconds Test histogram",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{le="0.1"} 2',
+        'test_seconds_bucket{le="1.0"} 2',
+        'test_seconds_bucket{le="+Inf"} 3',
+        "test_seconds_sum 5.15",
+        "test_seconds_count 3",
+    ]
+
+
+def test_stage() -> None:
+    with stage("test"):
+        pass
+    assert STAGES.counts[("test",)][0] == 1
+
+
+def test_render() -> None:
+    assert "# TYPE exonviz_stage_duration_seconds histogram" in render()
@@ -16,15 +16,22 @@ from exonviz.mutalyzer import (
     cds_to_ranges,
     Range,
     parse_error_payload,
+    MutalyzerError,
     less_than,
     variant_to_tuple,
     variants_from_hgvs,
+    TranscriptModel,
+    transcript_model,
+    build_exons,
 )
 from exonviz.exon import Coding, Variant
+from exonviz.draw import config
 
 from typing import Any
 from http.client import HTTPMessage
 
+from payloads import SDHD
+
 # Example mutalyzer payload
 mutalyzer = {
     "exon": {
@@ -237,6 +244,18 @@ def test_parse_error_payload(
     assert parse_error_payload(E) == expected
 
 
+@pytest.mark.parametrize(
+    "status, permanent",
+    [(200, True), (400, True), (404, True), (422, True), (408, False), (429, False)]
+    + [(500, False), (503, False)],
+)
+def test_mutalyzer_error_permanent(status: int, permanent: bool) -> None:
+    """Only errors in the request itself are permanent"""
+    error = MutalyzerError("error", status)
+    assert isinstance(error, RuntimeError)
+    assert error.permanent is permanent
+
+
 TO_TUP = [
     ("-20", (0, -20, 0)),
     ("-10+1", (0, -10, 1)),
@@ -392,3 +411,88 @@ def test_cdot_to_position_forward(variant: str, expected: int | None) -> None:
 def test_variants_from_hgvs(hgvs: str, expected: list[str]) -> None:
     """Test extracting variants from an hgvs description"""
     assert variants_from_hgvs(hgvs) == expected
+
+
+def test_transcript_model() -> None:
+    model = TranscriptModel(mutalyzer)
+    exons = mutalyzer["exon"]["g"]
+    cds = mutalyzer["cds"]["g"][0]
+    assert model.exons == exons_to_ranges(exons, cds)
+    assert model.cds == cds_to_ranges(exons, cds)
+    assert not model.reverse
+
+
+def test_transcript_model_reverse() -> None:
+    payload = {
+        "exon": {"g": [["349", "300"], ["199", "100"]]},
+        "cds": {"g": [["320", "150"]]},
+    }
+    model = TranscriptModel(payload)
+    assert model.reverse
+    assert model.exons == [(0, 50), (50, 150)]
+    assert model.cds == (29, 100)
+
+
+@pytest.mark.parametrize(
+    "variant, expected",
+    [("-35del", 0), ("52del", 86), ("52+15del", None), ("*824del", 1338)],
+)
+def test_transcript_model_position(variant: str, expected: int | None) -> None:
+    """The model gives the same positions as cdot_to_position"""
+    model = TranscriptModel(SDHD)
+    assert model.position(variant) == expected
+    assert model.position(variant) == cdot_to_position(model.exons, model.cds, variant)
+
+
+def test_transcript_model_cache() -> None:
+    model = transcript_model("NM_003002.4", SDHD)
+    assert transcript_model("NM_003002.4", SDHD) is model
+    # A copy of the payload is the same transcript
+    assert transcript_model("NM_003002.4", json.loads(json.dumps(SDHD))) is model
+
+    # A different payload for the same transcript replaces the model
+    other = transcript_model("NM_003002.4", mutalyzer)
+    assert other is not model
+    assert other.exons == TranscriptModel(mutalyzer).exons
+
+
+def test_build_exons_reuses_model() -> None:
+    """Different variants on the same transcript share the model"""
+    exons, dropped = build_exons("NM_003002.4:c.[274G>T;300del]", SDHD, config)
+    model = transcript_model("NM_003002.4", SDHD)
+    build_exons("NM_003002.4:c.53del", SDHD, config)
+    assert transcript_model("NM_003002.4", SDHD) is model
+
+    assert dropped == list()
+    assert [v.name for e in exons for v in e.variants] == ["c.274G>T", "c.300del"]
+
+
+SDHD_VARIANTS = "NM_003002.4:c.[*824del;-35del;52del;52+15del;53del;169del;200del]"
+
+
+@pytest.mark.parametrize("noncoding", [True, False])
+@pytest.mark.parametrize("first, last", [(1, 4), (2, 3), (3, 4), (4, 4), (3, 2)])
+def test_build_exons_selection(first: int, last: int, noncoding: bool) -> None:
+    """Selecting exons gives the same exons as slicing all exons"""
+    full = config | {"variantcolors": ["a", "b", "c"], "noncoding": noncoding}
+    exons, _ = build_exons(SDHD_VARIANTS, SDHD, full)
+
+    selection = full | {"firstexon": first, "lastexon": last}
+    selected, dropped = build_exons(SDHD_VARIANTS, SDHD, selection)
+    assert selected == exons[first - 1 : last]
+
+    drawn = [v.name[2:] for e in selected for v in e.variants]
+    assert sorted(drawn + dropped) == sorted(variants_from_hgvs(SDHD_VARIANTS))
+
+
+def test_build_exons_dropped() -> None:
+    selection = config | {"firstexon": 2, "lastexon": 3, "exonnumber": True}
+    exons, dropped = build_exons(SDHD_VARIANTS, SDHD, selection)
+    assert [e.name for e in exons] == ["2", "3"]
+    assert [v.name for e in exons for v in e.variants] == [
+        "c.53del",
+        "c.169del",
+        "c.200del",
+    ]
+    # In the order of the description
+    assert dropped == ["*824del", "-35del", "52del", "52+15del"]
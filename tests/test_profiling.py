@@ -0,0 +1,120 @@
+import json
+import pstats
+import pytest
+import tracemalloc
+
+from pathlib import Path
+
+from exonviz import cli, metrics
+from exonviz.draw import config, draw_exons
+from exonviz.profiling import memprofile, profile
+
+from payloads import SDHD
+
+
+def test_profile() -> None:
+    with profile() as profiler:
+        for _ in range(2):
+            with metrics.stage("parse"):
+                pass
+        with metrics.stage("build"):
+            pass
+
+    assert list(profiler.stages) == ["parse", "build"]
+    assert profiler.stages["parse"].calls == 2
+    assert profiler.stages["build"].wall >= 0
+    assert profiler.table().splitlines()[-1].startswith("total")
+
+
+def test_profile_context() -> None:
+    """Stages outside the context are not recorded"""
+    with profile() as profiler:
+        pass
+    with metrics.stage("parse"):
+        pass
+    assert profiler.stages == dict()
+
+
+def test_profile_nested() -> None:
+    with profile() as outer, profile() as inner:
+        with metrics.stage("parse"):
+            pass
+    assert outer.stages["parse"].calls == inner.stages["parse"].calls == 1
+
+
+def test_profile_cprofile(tmp_path: Path) -> None:
+    (exon,) = cli.exons_from_tsv_file(str(write_tsv(tmp_path)))
+    with profile("layout") as profiler:
+        draw_exons([exon], config)
+    profiler.dump_stats(str(tmp_path / "layout.prof"))
+    stats = pstats.Stats(str(tmp_path / "layout.prof"))
+    assert "group_exons" in [func for _, _, func in stats.stats]  # type: ignore
+
+
+def test_profile_no_cprofile() -> None:
+    with profile() as profiler:
+        pass
+    with pytest.raises(RuntimeError):
+        profiler.dump_stats("layout.prof")
+
+
+def write_tsv(tmp_path: Path) -> Path:
+    fname = tmp_path / "exons.tsv"
+    fname.write_text(
+        "size\tname\tcolor\tcoding_start\tcoding_end\tstart_phase\tend_phase\n"
+        "100\t\t#4C72B7\t0\t100\t0\t1\n"
+    )
+    return fname
+
+
+def test_cli_profile(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    monkeypatch.setattr(cli, "fetch_exons", lambda transcript: SDHD)
+    cli.main(["--transcript", "NM_003002.4:c.274G>T", "--profile", "json"])
+
+    captured = capsys.readouterr()
+    assert captured.out.startswith("<svg")
+    stages = json.loads(captured.err)
+    assert list(stages) == [
+        "mane",
+        "parse",
+        "fetch",
+        "build",
+        "layout",
+        "draw",
+        "serialise",
+    ]
+
+
+def test_memprofile() -> None:
+    with memprofile(top=2) as profiler:
+        with metrics.stage("build"):
+            retained = [bytearray(1_000_000)]
+            with metrics.stage("draw"):
+                bytearray(2_000_000)
+
+    assert list(profiler.stages) == ["draw", "build"]
+    draw, build = profiler.stages["draw"], profiler.stages["build"]
+    # The peak of the inner stage also counts for the outer stage
+    assert draw.peak > 1_900_000
+    assert build.peak > 1_900_000
+    # Only the memory of the outer stage is retained
+    assert draw.retained < 100_000
+    assert build.retained > 900_000
+    assert len(build.sites) <= 2
+    assert "test_profiling.py" in build.sites[0][0]
+    assert retained
+
+
+def test_memprofile_stops_tracing() -> None:
+    with memprofile():
+        assert tracemalloc.is_tracing()
+    assert not tracemalloc.is_tracing()
+
+
+def test_cli_memprofile(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    cli.main(["--exon-tsv", str(write_tsv(tmp_path)), "--memprofile", "json"])
+    stages = json.loads(capsys.readouterr().err)
+    assert list(stages) == ["layout", "draw", "serialise"]
+    assert stages["draw"]["peak"] > 0
@@ -1,6 +1,7 @@
 import pytest
 
 from exonviz.range import Range, intersect, overlap, subtract
+from exonviz.synthetic import make_ranges
 
 # fmt: off
 range_overlap = [
@@ -214,3 +215,20 @@ range_subtract = [
 @pytest.mark.parametrize("a, b, expected", range_subtract)
 def test_subtract_ranges(a: list[Range], b: list[Range], expected: list[Range]) -> None:
     assert subtract(a, b) == expected
+
+
+def positions(ranges: list[Range]) -> set[int]:
+    return {pos for start, end in ranges for pos in range(start, end)}
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_subtract_fuzz(seed: int) -> None:
+    """Subtract synthetic ranges, and compare to subtracting the positions"""
+    a = make_ranges(seed % 7, seed, max_size=10)
+    b = make_ranges(seed // 7 % 7, seed + 1000, max_size=10)
+    result = list(subtract(a, b))
+
+    assert positions(result) == positions(a) - positions(b)
+    # The result is sorted, and does not contain empty ranges
+    assert all(start < end for start, end in result)
+    assert all(x[1] <= y[0] for x, y in zip(result, result[1:]))
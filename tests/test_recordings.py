@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from exonviz.recordings import fixture_path, fixtures, load_fixture, save_fixture
+
+from payloads import SDHD
+
+
+def test_fixture_path(tmp_path: Path) -> None:
+    path = fixture_path(tmp_path, "NM_003002.4:c.[274G>T;300del]")
+    assert path.parent == tmp_path
+    assert "/" not in path.name
+
+
+def test_save_fixture(tmp_path: Path) -> None:
+    save_fixture(tmp_path, "NM_003002.4:c.=", {"selector_short": SDHD})
+    save_fixture(tmp_path, "NM_BAD.1:c.=", "Invalid", status=422)
+
+    fixture = load_fixture(tmp_path, "NM_003002.4:c.=")
+    assert fixture == {
+        "transcript": "NM_003002.4:c.=",
+        "status": 200,
+        "body": {"selector_short": SDHD},
+    }
+    assert load_fixture(tmp_path, "NM_000000.1:c.=") is None
+    assert fixtures(tmp_path) == ["NM_003002.4:c.=", "NM_BAD.1:c.="]
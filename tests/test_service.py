@@ -0,0 +1,247 @@
+import gc
+import pytest
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator
+
+from payloads import SDHD, offline_mutalyzer
+
+from exonviz import config, mutalyzer, service
+from exonviz.cli import get_MANE
+from exonviz.mutalyzer import MutalyzerError
+from exonviz.service import (
+    config_from_json,
+    config_from_query,
+    fetch_payload,
+    get_figure,
+    preload,
+    render,
+)
+from exonviz.recordings import save_fixture
+from exonviz.testing import replay
+from mutalyzer_hgvs_parser.hgvs_parser import get_parser
+
+
+def test_config_from_query_defaults() -> None:
+    """Missing values are taken from the default configuration"""
+    assert config_from_query(dict(), list()) == config
+
+
+def test_config_from_query_cast() -> None:
+    """Values are cast to the type of the default configuration"""
+    args = {"width": "1024", "scale": "0.5", "noncoding": "True", "color": "red"}
+    colors = ["red", "blue"]
+
+    figure_config = config_from_query(args, colors)
+
+    assert figure_config["width"] == 1024
+    assert figure_config["scale"] == 0.5
+    assert figure_config["noncoding"] is True
+    assert figure_config["exonnumber"] is False
+    assert figure_config["color"] == "red"
+    assert figure_config["variantcolors"] == colors
+
+
+def test_fetch_payload_cached(offline_mutalyzer: list[str]) -> None:
+    """Variants on the same transcript share a single call to mutalyzer"""
+    fetch_payload("NM_003002.4:c.274G>T")
+    fetch_payload("NM_003002.4:c.[274G>T;300del]")
+    assert offline_mutalyzer == ["NM_003002.4:c.="]
+
+
+def test_fetch_payload_concurrent(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Concurrent requests for the same transcript share a single fetch"""
+    requested: list[str] = list()
+
+    def fetch_exons(transcript: str) -> dict[str, Any]:
+        requested.append(transcript)
+        time.sleep(0.2)
+        return SDHD
+
+    monkeypatch.setattr(mutalyzer, "fetch_exons", fetch_exons)
+    service._payloads.clear()
+    descriptions = [f"NM_003002.4:c.{i}del" for i in range(1, 9)]
+    with ThreadPoolExecutor(8) as pool:
+        payloads = list(pool.map(fetch_payload, descriptions))
+    service._payloads.clear()
+
+    assert requested == ["NM_003002.4:c.="]
+    assert all(payload == SDHD for payload in payloads)
+    assert not service._inflight
+
+
+def test_fetch_payload_concurrent_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Concurrent requests share the error of a failed fetch"""
+    requested: list[str] = list()
+
+    def fetch_exons(transcript: str) -> dict[str, Any]:
+        requested.append(transcript)
+        time.sleep(0.2)
+        raise RuntimeError("Mutalyzer is down")
+
+    monkeypatch.setattr(mutalyzer, "fetch_exons", fetch_exons)
+    service._payloads.clear()
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(fetch_payload, "NM_003002.4:c.=") for _ in range(4)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="Mutalyzer is down"):
+            future.result()
+    assert requested == ["NM_003002.4:c.="]
+
+
+def test_fetch_payload_copy(offline_mutalyzer: list[str]) -> None:
+    """Modifying the payload does not change the cached value"""
+    payload = fetch_payload("NM_003002.4:c.=")
+    payload["exon"]["g"].clear()
+    assert fetch_payload("NM_003002.4:c.=")["exon"]["g"]
+
+
+def test_fetch_payload_bounded(
+    offline_mutalyzer: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Only the payloads that were used most recently are kept in memory"""
+    monkeypatch.setattr(service, "MAX_PAYLOADS", 2)
+    fetch_payload("NM_003002.4:c.=")
+    fetch_payload("NM_003002.4:r.=")
+    fetch_payload("NM_003002.4:c.=")
+    fetch_payload("NM_003002.4:n.=")
+    assert list(service._payloads) == ["NM_003002.4:c.=", "NM_003002.4:n.="]
+
+    fetch_payload("NM_003002.4:r.=")
+    assert offline_mutalyzer == [
+        "NM_003002.4:c.=",
+        "NM_003002.4:r.=",
+        "NM_003002.4:n.=",
+        "NM_003002.4:r.=",
+    ]
+
+
+@pytest.fixture
+def stub(tmp_path: Path) -> Iterator[list[str]]:
+    """Replay a transcript and an error, and yield the requests to the stub"""
+    save_fixture(tmp_path, "NM_003002.4:c.=", {"selector_short": SDHD})
+    errors = {"custom": {"errors": [{"details": "Invalid transcript"}]}}
+    save_fixture(tmp_path, "NM_BAD.1:c.=", errors, status=422)
+    service._payloads.clear()
+    service._errors.clear()
+    with replay(tmp_path) as server:
+        yield server.requests
+    service._errors.clear()
+
+
+def test_fetch_payload_error_cached(stub: list[str]) -> None:
+    """Mutalyzer is only asked once for a transcript it rejected"""
+    for _ in range(3):
+        with pytest.raises(MutalyzerError, match="Invalid transcript") as e:
+            fetch_payload("NM_BAD.1:c.100del")
+        assert e.value.status == 422
+    assert stub == ["NM_BAD.1:c.="]
+
+
+def test_fetch_payload_error_expired(stub: list[str]) -> None:
+    with pytest.raises(MutalyzerError):
+        fetch_payload("NM_BAD.1:c.=")
+    # Let the error expire
+    expires, message, status = service._errors["NM_BAD.1:c.="]
+    service._errors["NM_BAD.1:c.="] = (expires - service.ERROR_TTL, message, status)
+    with pytest.raises(MutalyzerError):
+        fetch_payload("NM_BAD.1:c.=")
+    assert stub == ["NM_BAD.1:c.=", "NM_BAD.1:c.="]
+
+
+def test_fetch_payload_error_disabled(
+    stub: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(service, "ERROR_TTL", 0)
+    for _ in range(2):
+        with pytest.raises(MutalyzerError):
+            fetch_payload("NM_BAD.1:c.=")
+    assert stub == ["NM_BAD.1:c.=", "NM_BAD.1:c.="]
+
+
+def test_fetch_payload_error_temporary(tmp_path: Path) -> None:
+    """Server errors are not cached"""
+    service._payloads.clear()
+    service._errors.clear()
+    with replay(tmp_path, error_rate=1) as server:
+        for _ in range(2):
+            with pytest.raises(MutalyzerError, match="503"):
+                fetch_payload("NM_003002.4:c.=")
+    assert len(server.requests) == 2
+    assert not service._errors
+
+
+@pytest.mark.parametrize("budget", [{"maxtime": 0}, {"maxrows": 1}])
+def test_render_truncated_not_cached(
+    tmp_path: Path, offline_mutalyzer: list[str], budget: dict[str, Any]
+) -> None:
+    """Figures that were cut off by a budget are not stored in the cache"""
+    service.set_cache_dir(tmp_path)
+    try:
+        truncated = service.web_config | {"width": 100} | budget
+        figure, _ = render("NM_003002.4:c.=", truncated)
+        assert "Figure truncated" in figure
+        assert get_figure("NM_003002.4:c.=", truncated) is None
+
+        # Complete figures are cached
+        render("NM_003002.4:c.=", service.web_config)
+        assert get_figure("NM_003002.4:c.=", service.web_config) is not None
+    finally:
+        service.set_cache_dir(None)
+
+
+BUDGETS = {"maxelements": "10000000", "maxrows": "100000", "maxtime": "1e9"}
+
+
+def test_config_from_query_budgets() -> None:
+    """A query can lower the render budgets, but not raise them"""
+    figure_config = config_from_query(BUDGETS, list())
+    assert {key: figure_config[key] for key in BUDGETS} == service.budgets
+
+    figure_config = config_from_query({"maxrows": "2", "maxtime": "nan"}, list())
+    assert figure_config["maxrows"] == 2
+    assert figure_config["maxtime"] == service.budgets["maxtime"]
+
+
+def test_config_from_json_budgets() -> None:
+    figure_config = config_from_json(
+        {key: float(value) for key, value in BUDGETS.items()}
+    )
+    assert {key: figure_config[key] for key in BUDGETS} == service.budgets
+    assert config_from_json({"maxelements": 10})["maxelements"] == 10
+
+
+def test_config_from_json() -> None:
+    figure_config = config_from_json({"width": 500, "variantcolors": ["red"]})
+    assert figure_config["width"] == 500
+    assert figure_config["variantcolors"] == ["red"]
+    # Missing values are taken from the website configuration
+    assert figure_config["exonnumber"] is True
+
+
+@pytest.mark.parametrize(
+    "values", [{"unknown": 1}, {"noncoding": "yes"}, {"variantcolors": "red"}]
+)
+def test_config_from_json_invalid(values: dict[str, Any]) -> None:
+    with pytest.raises(ValueError):
+        config_from_json(values)
+
+
+@pytest.fixture
+def unfreeze() -> Iterator[None]:
+    yield
+    gc.unfreeze()
+
+
+def test_preload(unfreeze: None) -> None:
+    """Preloading compiles the grammars and freezes the heap"""
+    preload()
+    # Both the description and the variant grammar are compiled
+    assert get_parser.cache_info().currsize >= 2
+    assert gc.get_freeze_count() > 0
+
+
+def test_get_MANE_cached() -> None:
+    assert get_MANE() is get_MANE()
@@ -0,0 +1,240 @@
+import pytest
+import subprocess
+import sys
+
+from pathlib import Path
+from typing import Any, Iterator
+
+from exonviz import metrics, service
+from exonviz.cache import DiskCache
+from exonviz.cli import make_exons
+from exonviz.draw import config
+from exonviz.sources import (
+    CachedSource,
+    DatabaseSource,
+    FixtureSource,
+    MemorySource,
+    MutalyzerSource,
+    SourceChain,
+    TranscriptSource,
+    fetch_exons,
+    get_source,
+    main,
+    parse_source,
+    parse_sources,
+    set_source,
+)
+from exonviz.recordings import save_fixture
+
+from payloads import SDHD, offline_mutalyzer
+
+
+class CountingSource(TranscriptSource):
+    """Count how often every transcript is fetched"""
+
+    name = "counting"
+
+    def __init__(self, payloads: dict[str, Any]) -> None:
+        self.payloads = payloads
+        self.requests: list[str] = list()
+
+    def fetch(self, transcript: str) -> dict[str, Any] | None:
+        self.requests.append(transcript)
+        return self.payloads.get(transcript)
+
+
+@pytest.fixture
+def source() -> Iterator[None]:
+    """Reset the source, and the payloads it cached, after the test"""
+    yield
+    set_source(None)
+    service._payloads.clear()
+
+
+def test_memory_source() -> None:
+    source = MemorySource({"NM_003002.4:c.=": SDHD})
+    assert source.get("NM_003002.4:c.=") == SDHD
+    assert source.fetch("NM_000000.1:c.=") is None
+    with pytest.raises(RuntimeError, match="NM_000000.1:c.= was not found"):
+        source.get("NM_000000.1:c.=")
+
+
+def test_database_source(tmp_path: Path) -> None:
+    source = DatabaseSource(tmp_path / "exons.sqlite")
+    assert source.fetch("NM_003002.4:c.=") is None
+    source.add([("NM_003002.4:c.=", SDHD)])
+    # The transcripts are stored in the database
+    assert DatabaseSource(tmp_path / "exons.sqlite").fetch("NM_003002.4:c.=") == SDHD
+
+
+def test_fixture_source(tmp_path: Path) -> None:
+    save_fixture(tmp_path, "NM_003002.4:c.=", {"selector_short": SDHD})
+    save_fixture(tmp_path, "NM_BAD.1:c.=", "Invalid", status=422)
+    source = FixtureSource(tmp_path)
+    assert source.fetch("NM_003002.4:c.=") == SDHD
+    assert source.fetch("NM_BAD.1:c.=") is None
+    assert source.fetch("NM_000000.1:c.=") is None
+
+
+def test_mutalyzer_source(offline_mutalyzer: list[str]) -> None:
+    assert MutalyzerSource().fetch("NM_003002.4:c.=") == SDHD
+    with pytest.raises(RuntimeError, match="Unknown transcript"):
+        MutalyzerSource().fetch("NM_000000.1:c.=")
+
+
+def test_chain() -> None:
+    first = CountingSource({"NM_003002.4:c.=": SDHD})
+    second = CountingSource({"NM_000546.6:c.=": SDHD})
+    chain = SourceChain([first, second])
+
+    assert chain.fetch("NM_003002.4:c.=") == SDHD
+    # The second source is only used for transcripts the first does not know
+    assert second.requests == []
+    assert chain.fetch("NM_000546.6:c.=") == SDHD
+    assert chain.fetch("NM_000000.1:c.=") is None
+    assert second.requests == ["NM_000546.6:c.=", "NM_000000.1:c.="]
+
+
+def test_chain_metrics() -> None:
+    before = metrics.SOURCE_REQUESTS.values.get(("memory", "missing"), 0)
+    SourceChain([MemorySource()]).fetch("NM_003002.4:c.=")
+    assert metrics.SOURCE_REQUESTS.values[("memory", "missing")] == before + 1
+
+
+def test_cached_source(tmp_path: Path) -> None:
+    counting = CountingSource({"NM_003002.4:c.=": SDHD})
+    source = CachedSource(counting, DiskCache(tmp_path), maxsize=1)
+    for _ in range(3):
+        assert source.fetch("NM_003002.4:c.=") == SDHD
+        assert source.fetch("NM_000000.1:c.=") is None
+    # Only found transcripts are cached
+    assert counting.requests.count("NM_003002.4:c.=") == 1
+    assert counting.requests.count("NM_000000.1:c.=") == 3
+
+    # A new source uses the payloads on disk
+    counting.requests.clear()
+    assert CachedSource(counting, DiskCache(tmp_path)).fetch("NM_003002.4:c.=")
+    assert counting.requests == []
+
+
+def test_cached_source_maxsize() -> None:
+    counting = CountingSource({"A": SDHD, "B": SDHD})
+    source = CachedSource(counting, maxsize=1)
+    for transcript in ["A", "B", "A"]:
+        source.fetch(transcript)
+    assert counting.requests == ["A", "B", "A"]
+    assert list(source.memory) == ["A"]
+
+
+def test_parse_sources(tmp_path: Path) -> None:
+    chain = parse_sources(
+        f"db:{tmp_path / 'exons.sqlite'}, fixtures:{tmp_path},"
+        "mutalyzer:http://localhost:8001/api"
+    )
+    assert [type(source) for source in chain.sources] == [
+        DatabaseSource,
+        FixtureSource,
+        MutalyzerSource,
+    ]
+    assert isinstance(chain.sources[-1], MutalyzerSource)
+    assert chain.sources[-1].base_url == "http://localhost:8001/api"
+
+
+def test_parse_sources_cached(tmp_path: Path) -> None:
+    database = DatabaseSource(tmp_path / "exons.sqlite")
+    database.add([("NM_003002.4:c.=", SDHD)])
+    chain = parse_sources(f"cached:db:{tmp_path / 'exons.sqlite'},cached:mutalyzer")
+
+    cached = chain.sources[0]
+    assert isinstance(cached, CachedSource)
+    assert isinstance(cached.source, DatabaseSource)
+    assert cached.name == "db"
+    assert cached.fetch("NM_003002.4:c.=") == SDHD
+    assert list(cached.memory) == ["NM_003002.4:c.="]
+
+    assert isinstance(chain.sources[1], CachedSource)
+    assert isinstance(chain.sources[1].source, MutalyzerSource)
+
+
+def test_parse_sources_cached_disk(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Cached sources store their transcripts under EXONVIZ_CACHE_DIR"""
+    save_fixture(tmp_path / "fixtures", "NM_003002.4:c.=", {"selector_short": SDHD})
+    monkeypatch.setenv("EXONVIZ_CACHE_DIR", str(tmp_path / "cache"))
+    spec = f"cached:fixtures:{tmp_path / 'fixtures'}"
+
+    cached = parse_source(spec)
+    assert isinstance(cached, CachedSource)
+    assert cached.cache is not None
+    assert cached.cache.directory.parent == tmp_path / "cache" / "sources"
+    assert cached.fetch("NM_003002.4:c.=") == SDHD
+
+    # A new process finds the transcript on disk, even if the source is gone
+    for path in (tmp_path / "fixtures").iterdir():
+        path.unlink()
+    assert parse_source(spec).fetch("NM_003002.4:c.=") == SDHD
+    assert parse_source(f"cached:fixtures:{tmp_path}").fetch("NM_003002.4:c.=") is None
+
+    monkeypatch.delenv("EXONVIZ_CACHE_DIR")
+    uncached = parse_source(spec)
+    assert isinstance(uncached, CachedSource)
+    assert uncached.cache is None
+
+
+def test_sources_without_testing() -> None:
+    """The sources do not import the stub server"""
+    code = "import sys, exonviz.sources; print('exonviz.testing' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
+
+
+@pytest.mark.parametrize("spec", ["", "db", "fixtures:", "ensembl", "cached:"])
+def test_parse_sources_invalid(spec: str) -> None:
+    with pytest.raises(ValueError, match="Invalid transcript source"):
+        parse_sources(spec)
+
+
+def test_get_source(
+    source: None, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    set_source(None)
+    monkeypatch.setenv("EXONVIZ_SOURCES", f"fixtures:{tmp_path}")
+    assert repr(get_source()) == f"SourceChain([FixtureSource('{tmp_path}')])"
+
+
+def test_get_source_default(source: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Only Mutalyzer is used until the MANE exon models are shipped"""
+    set_source(None)
+    monkeypatch.delenv("EXONVIZ_SOURCES", raising=False)
+    assert repr(get_source()) == "SourceChain([MutalyzerSource(None)])"
+
+
+def test_make_exons(source: None, offline_mutalyzer: list[str]) -> None:
+    """Local sources are used before Mutalyzer"""
+    set_source(
+        SourceChain([MemorySource({"NM_000546.6:c.=": SDHD}), MutalyzerSource()])
+    )
+    assert make_exons("NM_000546.6:c.274G>T", config) == make_exons(
+        "NM_003002.4:c.274G>T", config
+    )
+    assert offline_mutalyzer == ["NM_003002.4:c.="]
+
+
+def test_service(source: None, offline_mutalyzer: list[str]) -> None:
+    set_source(MemorySource({"NM_000546.6:c.=": SDHD}))
+    assert service.fetch_payload("NM_000546.6:c.274G>T") == SDHD
+    assert fetch_exons("NM_000546.6:c.=") == SDHD
+    assert offline_mutalyzer == []
+
+
+def test_main(tmp_path: Path) -> None:
+    save_fixture(tmp_path / "fixtures", "NM_003002.4:c.=", {"selector_short": SDHD})
+    save_fixture(tmp_path / "fixtures", "NM_BAD.1:c.=", "Invalid", status=422)
+    main([str(tmp_path / "exons.sqlite"), str(tmp_path / "fixtures")])
+
+    source = DatabaseSource(tmp_path / "exons.sqlite")
+    assert source.fetch("NM_003002.4:c.=") == SDHD
+    assert source.fetch("NM_BAD.1:c.=") is None
@@ -0,0 +1,65 @@
+import io
+import json
+import pytest
+
+from typing import Any
+
+from exonviz.draw import config
+from exonviz.stream import parse_line, stream
+
+from payloads import offline_mutalyzer
+
+MANE = {"SDHD": "NM_003002.4"}
+
+
+def run(lines: list[str], exons: bool = False) -> list[dict[str, Any]]:
+    fout = io.StringIO()
+    stream(lines, fout, config, MANE, exons)
+    return [json.loads(line) for line in fout.getvalue().splitlines()]
+
+
+def test_stream(offline_mutalyzer: list[str]) -> None:
+    records = run(["SDHD\n", "\n", "NM_003002.4:c.274G>T\n"])
+    # Empty lines are skipped
+    assert len(records) == 2
+    assert records[0]["transcript"] == "NM_003002.4:c.="
+    assert records[1]["figure"].startswith("<svg")
+    assert records[1]["error"] is None
+
+
+def test_stream_timings(offline_mutalyzer: list[str]) -> None:
+    (record,) = run(["NM_003002.4:c.274G>T"])
+    for stage in ["mane", "parse", "fetch", "build", "layout", "draw", "total"]:
+        assert stage in record["timings"]
+
+
+def test_stream_error(offline_mutalyzer: list[str]) -> None:
+    records = run(["NM_000000.1", "NM_003002.4"])
+    assert "Unknown transcript" in records[0]["error"]
+    assert records[1]["error"] is None
+
+
+def test_stream_exons(offline_mutalyzer: list[str]) -> None:
+    (record,) = run(["NM_003002.4:c.274G>T"], exons=True)
+    assert "figure" not in record
+    assert len(record["exons"]) == 4
+    assert record["exons"][2]["variants"][0]["name"] == "c.274G>T"
+
+
+def test_stream_json_config(offline_mutalyzer: list[str]) -> None:
+    line = json.dumps({"description": "SDHD", "config": {"noncoding": False}})
+    (record,) = run([line], exons=True)
+    assert record["description"] == "SDHD"
+    assert record["exons"][0]["size"] < 87
+
+
+def test_parse_line() -> None:
+    assert parse_line("SDHD", config) == ("SDHD", config)
+
+
+@pytest.mark.parametrize(
+    "line", ['{"config": {}}', '{"description": "SDHD", "config": {"unknown": 1}}']
+)
+def test_parse_line_invalid(line: str) -> None:
+    with pytest.raises(ValueError):
+        parse_line(line, config)
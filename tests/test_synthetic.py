@@ -0,0 +1,93 @@
+import json
+import pytest
+
+from pathlib import Path
+
+from exonviz import mutalyzer
+from exonviz.cli import exons_from_tsv_file, variants_from_tsv_file
+from exonviz.draw import config
+from exonviz.exon import Exon
+from exonviz.synthetic import (
+    TINY_SIZES,
+    coding_size,
+    main,
+    make_exons,
+    make_hgvs,
+    make_payload,
+    make_ranges,
+)
+from exonviz.recordings import load_fixture
+
+
+def test_make_exons_seed() -> None:
+    assert make_exons(50, 100, seed=1) == make_exons(50, 100, seed=1)
+    assert make_exons(50, 100, seed=1) != make_exons(50, 100, seed=2)
+
+
+def test_make_exons_phase() -> None:
+    """The phase of every exon continues from the previous exon"""
+    exons = make_exons(100, seed=3, tiny=0.3)
+    for before, after in zip(exons, exons[1:]):
+        assert before.coding.end_phase == after.coding.start_phase
+    assert {exon.coding.start_phase for exon in exons} == {0, 1, 2}
+
+
+def test_make_exons_tiny() -> None:
+    exons = make_exons(100, tiny=0.5)
+    tiny = [e for e in exons if TINY_SIZES[0] <= e.size <= TINY_SIZES[1]]
+    assert 30 < len(tiny) < 70
+    # The tiny exons determine the scale of the figure
+    assert max(e.min_scale(20) for e in exons) > 1
+
+
+def test_make_exons_clusters() -> None:
+    exons = make_exons(100, 1000, clusters=2)
+    assert sum(len(e.variants) for e in exons) == 1000
+    assert len([e for e in exons if e.variants]) <= 2
+    for exon in exons:
+        positions = [v.position for v in exon.variants]
+        assert positions == sorted(positions)
+        assert all(0 <= pos < exon.size for pos in positions)
+
+
+def test_make_payload() -> None:
+    payload = make_payload(20, tiny=0.5)
+    hgvs = make_hgvs("NM_SYNTH.1", payload, 10)
+    exons, dropped = mutalyzer.build_exons(hgvs, payload, config)
+    assert len(exons) == 20
+    assert sum(len(e.variants) for e in exons) == 10
+    assert not dropped
+    assert sum(e.coding.size for e in exons) == coding_size(payload)
+
+
+def test_make_ranges() -> None:
+    ranges = make_ranges(100, max_size=5)
+    assert len(ranges) == 100
+    assert all(start <= end for start, end in ranges)
+    assert all(x[1] <= y[0] for x, y in zip(ranges, ranges[1:]))
+
+
+def test_main(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    exon_tsv, variant_tsv = tmp_path / "exons.tsv", tmp_path / "variants.tsv"
+    payload = tmp_path / "payload.json"
+    # fmt: off
+    main([
+        "--exons", "10", "--variants", "5", "--seed", "7",
+        "--exon-tsv", str(exon_tsv), "--variant-tsv", str(variant_tsv),
+        "--payload", str(payload), "--fixtures", str(tmp_path / "fixtures"),
+    ])
+    # fmt: on
+    exons = make_exons(10, 5, seed=7)
+    assert exons_from_tsv_file(str(exon_tsv)) == [
+        Exon(e.size, e.coding, name=e.name) for e in exons
+    ]
+    variants = variants_from_tsv_file(str(variant_tsv))
+    assert sum(len(v) for v in variants.values()) == 5
+
+    assert json.loads(payload.read_text()) == make_payload(10, seed=7)
+    fixture = load_fixture(tmp_path / "fixtures", "NM_SYNTH.1:c.=")
+    assert fixture is not None
+    assert fixture["body"]["selector_short"] == make_payload(10, seed=7)
+
+    hgvs = capsys.readouterr().out.strip()
+    assert hgvs == make_hgvs("NM_SYNTH.1", make_payload(10, seed=7), 5, seed=7)
@@ -0,0 +1,79 @@
+import pytest
+import time
+
+from pathlib import Path
+
+from exonviz import cli, mutalyzer
+from exonviz.recordings import save_fixture
+from exonviz.testing import record, replay
+
+from payloads import SDHD
+
+
+@pytest.fixture
+def fixtures(tmp_path: Path) -> Path:
+    save_fixture(tmp_path, "NM_003002.4:c.=", {"selector_short": SDHD})
+    errors = {"custom": {"errors": [{"details": "Invalid transcript"}]}}
+    save_fixture(tmp_path, "NM_BAD.1:c.=", errors, status=422)
+    return tmp_path
+
+
+def test_replay(fixtures: Path) -> None:
+    with replay(fixtures) as server:
+        assert mutalyzer.fetch_exons("NM_003002.4:c.=") == SDHD
+        assert server.requests == ["NM_003002.4:c.="]
+    # The real Mutalyzer is used again outside the context
+    assert mutalyzer.MUTALYZER_URL != server.url
+
+
+def test_replay_error(fixtures: Path) -> None:
+    with replay(fixtures):
+        with pytest.raises(mutalyzer.MutalyzerError, match="Invalid transcript") as e:
+            mutalyzer.fetch_exons("NM_BAD.1:c.=")
+    assert e.value.status == 422
+    assert e.value.permanent
+
+
+def test_replay_missing(fixtures: Path) -> None:
+    with replay(fixtures):
+        with pytest.raises(RuntimeError, match="No fixture for NM_000000.1:c.="):
+            mutalyzer.fetch_exons("NM_000000.1:c.=")
+
+
+def test_replay_injected_error(fixtures: Path) -> None:
+    with replay(fixtures, error_rate=1):
+        with pytest.raises(mutalyzer.MutalyzerError, match="503") as e:
+            mutalyzer.fetch_exons("NM_003002.4:c.=")
+    assert not e.value.permanent
+
+
+def test_replay_latency(fixtures: Path) -> None:
+    with replay(fixtures, latency=0.1):
+        start = time.monotonic()
+        mutalyzer.fetch_exons("NM_003002.4:c.=")
+        assert time.monotonic() - start >= 0.1
+
+
+def test_record(fixtures: Path, tmp_path: Path) -> None:
+    """Record from a stub server, and replay the recording"""
+    recorded = tmp_path / "recorded"
+    with replay(fixtures) as server:
+        record(["NM_003002.4:c.=", "NM_BAD.1:c.="], recorded, server.url)
+
+    with replay(recorded):
+        assert mutalyzer.fetch_exons("NM_003002.4:c.=") == SDHD
+        with pytest.raises(RuntimeError, match="Invalid transcript"):
+            mutalyzer.fetch_exons("NM_BAD.1:c.=")
+
+
+def test_base_url(fixtures: Path) -> None:
+    with replay(fixtures) as server:
+        url = server.url
+        mutalyzer.MUTALYZER_URL = "http://invalid.invalid/api"
+        assert mutalyzer.fetch_exons("NM_003002.4:c.=", base_url=url) == SDHD
+
+
+def test_cli(fixtures: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    with replay(fixtures):
+        cli.main(["--transcript", "NM_003002.4:c.274G>T"])
+    assert capsys.readouterr().out.startswith("<svg")
@@ -0,0 +1,80 @@
+import io
+import pytest
+
+from pathlib import Path
+
+from exonviz.exon import Coding, Exon, Variant
+from exonviz.tsv import HEADER, open_tsv, read_transcripts, write_transcripts
+
+TRANSCRIPTS = [
+    (
+        "NM_003002.4",
+        [
+            Exon(87, Coding(35, 87, 0, 1), name="1"),
+            Exon(117, Coding(0, 117, 1, 2), [Variant(10, "c.62A>T", "red")], "2"),
+        ],
+    ),
+    (
+        "NM_000000.1",
+        [
+            Exon(
+                20,
+                variants=[Variant(1, "c.1A>T", "red"), Variant(5, "c.5del", "blue")],
+                color="#000000",
+            )
+        ],
+    ),
+]
+
+
+def test_roundtrip() -> None:
+    fout = io.StringIO()
+    write_transcripts(fout, TRANSCRIPTS)
+    fout.seek(0)
+    assert list(read_transcripts(fout)) == TRANSCRIPTS
+
+
+def test_read_grouped() -> None:
+    """Consecutive lines of the same transcript are grouped together"""
+    fout = io.StringIO()
+    write_transcripts(fout, TRANSCRIPTS)
+    lines = fout.getvalue().splitlines(keepends=True)
+    assert len(lines) == 4
+    transcripts = [t for t, _ in read_transcripts(lines)]
+    assert transcripts == ["NM_003002.4", "NM_000000.1"]
+
+
+def test_read_default_color() -> None:
+    line = "NM_1\t10\t\t\t0\t0\t0\t0\t\t\t\n"
+    ((_, [exon]),) = read_transcripts(["\t".join(HEADER) + "\n", line])
+    assert exon == Exon(10)
+
+
+def test_read_invalid_header() -> None:
+    with pytest.raises(RuntimeError):
+        list(read_transcripts(["size\tname\n"]))
+
+
+def test_read_invalid_variants() -> None:
+    line = "NM_1\t10\t\t\t0\t0\t0\t0\t1,2\tc.1A>T\tred\n"
+    with pytest.raises(ValueError):
+        list(read_transcripts(["\t".join(HEADER) + "\n", line]))
+
+
+def test_write_comma() -> None:
+    exon = Exon(10, variants=[Variant(1, "a,b", "red")])
+    with pytest.raises(ValueError):
+        write_transcripts(io.StringIO(), [("NM_1", [exon])])
+
+
+@pytest.mark.parametrize("fname", ["exons.tsv", "exons.tsv.gz"])
+def test_open_tsv(tmp_path: Path, fname: str) -> None:
+    with open_tsv(tmp_path / fname, "wt") as fout:
+        write_transcripts(fout, TRANSCRIPTS)
+    with open_tsv(tmp_path / fname) as fin:
+        assert list(read_transcripts(fin)) == TRANSCRIPTS
+
+
+def test_open_tsv_zstd(tmp_path: Path) -> None:
+    pytest.importorskip("zstandard")
+    test_open_tsv(tmp_path, "exons.tsv.zst")
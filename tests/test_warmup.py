@@ -0,0 +1,53 @@
+import pytest
+import time
+
+from pathlib import Path
+from typing import Iterator
+
+from exonviz import service
+from exonviz.warmup import RateLimiter, warm_cache
+
+from payloads import offline_mutalyzer
+
+MANE = {"SDHD": "NM_003002.4", "NOPE": "NM_000000.1"}
+
+
+@pytest.fixture
+def cache_dir(tmp_path: Path) -> Iterator[Path]:
+    service.set_cache_dir(tmp_path)
+    yield tmp_path
+    service.set_cache_dir(None)
+
+
+def test_warm_cache(cache_dir: Path, offline_mutalyzer: list[str]) -> None:
+    counts = warm_cache(["SDHD", "NOPE"], MANE, service.web_config)
+    assert counts == {"rendered": 1, "failed": 1}
+
+    # The figure is in the cache, with the default configuration of the website
+    assert service.get_figure("NM_003002.4:c.=", service.web_config) is not None
+
+
+def test_warm_cache_twice(cache_dir: Path, offline_mutalyzer: list[str]) -> None:
+    """The second time, the figure is taken from the cache"""
+    warm_cache(["SDHD"], MANE, service.web_config)
+    counts = warm_cache(["SDHD"], MANE, service.web_config)
+    assert counts == {"cached": 1}
+    assert offline_mutalyzer == ["NM_003002.4:c.="]
+
+
+def test_payload_cache_shared(cache_dir: Path, offline_mutalyzer: list[str]) -> None:
+    """The payloads are stored on disk, so other processes can use them"""
+    warm_cache(["SDHD"], MANE, service.web_config)
+    # Clear the cache in memory, but keep the cache on disk
+    service._payloads.clear()
+    service.fetch_payload("NM_003002.4:c.274G>T")
+    assert offline_mutalyzer == ["NM_003002.4:c.="]
+
+
+def test_rate_limiter() -> None:
+    """Three calls at 20 per second take at least two intervals"""
+    limiter = RateLimiter(rate=20)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.wait()
+    assert time.monotonic() - start >= 0.1